@@ -0,0 +1,104 @@
+import constants
+import database.sql_helper_v2 as sql_helper
+from bandits.bandit_arm import BanditArm
+
+
+def consolidate_arms(connection, bandit_arms, arm_query_ids, arm_store):
+    """
+    Merges the near duplicate arms of a table. An arm is merged into a broader arm when its key is a prefix of the
+    broader key (or the same key), the include columns of the two are unioned. Arms are only merged while the merged
+    arm has at most CONSOLIDATION_MAX_COLUMNS key and include columns. Arms are merged into the arms with the longest
+    keys first, so the merge does not depend on the order of the given arms. Filtered index, columnstore, view and
+    compressed arms are kept as they are, they already cover their queries or are variants of another arm.
+
+    :param connection: SQL connection
+    :param bandit_arms: dictionary of bandit arms with arm id as the key
+    :param arm_query_ids: dictionary of arm id to the ids of the queries the arm was generated for
+    :param arm_store: arm store, merged arms are taken from and added to it
+    :return: dictionary of consolidated arms, dictionary of arm id to the query ids of the consolidated arms and
+        dictionary of arm id to the ids of the original arms each consolidated arm serves
+    """
+    consolidated_arms = {}
+    consolidated_query_ids = {}
+    served_arm_ids = {}
+    table_arms = {}
+    for arm_id, bandit_arm in bandit_arms.items():
+        if (bandit_arm.filter_predicate or bandit_arm.index_type != constants.INDEX_TYPE_ROWSTORE or
+                bandit_arm.compression):
+            consolidated_arms[arm_id] = bandit_arm
+            consolidated_query_ids.setdefault(arm_id, set()).update(arm_query_ids[arm_id])
+            served_arm_ids.setdefault(arm_id, set()).add(arm_id)
+        else:
+            table_arms.setdefault(bandit_arm.table_name, []).append(bandit_arm)
+
+    for table_name, arms in table_arms.items():
+        # [key columns, include columns, served arms]
+        merged_arms = []
+        for bandit_arm in sorted(arms, key=lambda arm: (-len(arm.index_cols), -len(arm.include_cols),
+                                                        arm.index_name)):
+            merged_arm = get_merge_target(merged_arms, bandit_arm)
+            if merged_arm is None:
+                merged_arms.append([tuple(bandit_arm.index_cols), set(bandit_arm.include_cols), [bandit_arm]])
+            else:
+                merged_arm[1] |= set(bandit_arm.include_cols) - set(merged_arm[0])
+                merged_arm[2].append(bandit_arm)
+
+        for index_cols, include_cols, served_arms in merged_arms:
+            consolidated_arm = get_merged_arm(connection, index_cols, tuple(sorted(include_cols)), served_arms,
+                                              arm_store)
+            consolidated_arms[consolidated_arm.arm_id] = consolidated_arm
+            for served_arm in served_arms:
+                consolidated_query_ids.setdefault(consolidated_arm.arm_id, set()).update(
+                    arm_query_ids[served_arm.arm_id])
+                served_arm_ids.setdefault(consolidated_arm.arm_id, set()).add(served_arm.arm_id)
+    return consolidated_arms, consolidated_query_ids, served_arm_ids
+
+
+def get_merge_target(merged_arms, bandit_arm):
+    """
+    :param merged_arms: list of [key columns, include columns, served arms] of the table
+    :param bandit_arm: arm to merge
+    :return: first merged arm the given arm can be merged into, None if there is no such arm
+    """
+    index_cols = tuple(bandit_arm.index_cols)
+    for merged_arm in merged_arms:
+        if merged_arm[0][:len(index_cols)] != index_cols:
+            continue
+        include_cols = (merged_arm[1] | set(bandit_arm.include_cols)) - set(merged_arm[0])
+        if len(merged_arm[0]) + len(include_cols) <= constants.CONSOLIDATION_MAX_COLUMNS:
+            return merged_arm
+    return None
+
+
+def get_merged_arm(connection, index_cols, include_cols, served_arms, arm_store):
+    """
+    Returns the arm for the merged key and include columns, this is one of the served arms when the merge didn't add
+    any columns to it. The values of the served arms for their queries are carried over to the merged arm.
+
+    :param connection: SQL connection
+    :param index_cols: key columns
+    :param include_cols: include columns
+    :param served_arms: arms merged into this arm
+    :param arm_store: arm store
+    :return: bandit arm
+    """
+    table_name = served_arms[0].table_name
+    arm_id = BanditArm.find_arm_id(index_cols, table_name, include_cols)
+    served_arm = next((served_arm for served_arm in served_arms if served_arm.arm_id == arm_id), None)
+    if served_arm is not None:
+        merged_arm = served_arm
+    elif arm_id in arm_store:
+        merged_arm = arm_store[arm_id]
+    else:
+        size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME, table_name,
+                                                         index_cols + include_cols)
+        merged_arm = BanditArm(index_cols, table_name, size, served_arms[0].table_row_count, include_cols)
+        clusters = {served_arm.cluster for served_arm in served_arms}
+        merged_arm.cluster = clusters.pop() if len(clusters) == 1 else None
+        merged_arm.is_include = int(len(include_cols) > 0 or any(served_arm.is_include for served_arm in served_arms))
+        arm_store[merged_arm.arm_id] = merged_arm
+    for served_arm in served_arms:
+        merged_arm.query_id = served_arm.query_id
+        for query_id, arm_value in served_arm.arm_value.items():
+            merged_arm.arm_value[query_id] = max(merged_arm.arm_value.get(query_id, 0), arm_value)
+    return merged_arm
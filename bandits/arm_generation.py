@@ -0,0 +1,170 @@
+import concurrent.futures
+import itertools
+import logging
+from collections import namedtuple
+
+import constants
+
+# Parts of a query that are needed to generate its arms, this is what is sent to the worker processes
+ArmQuery = namedtuple('ArmQuery', ['id', 'predicates', 'payload', 'selectivity'])
+
+
+def get_arm_specs_v3(arm_query, table_row_counts, column_selectivities):
+    """
+    Arms of gen_arms_from_predicates_v3 for a query, as arm specs. This doesn't touch the database or the arm store,
+    so it can run in the worker processes.
+
+    :param arm_query: ArmQuery (or Query object)
+    :param table_row_counts: dictionary of table name to row count
+    :param column_selectivities: dictionary of (table name, column name) to selectivity, for the predicate columns
+    :return: list of (table name, key columns, arm value, include columns, cluster, is include)
+    """
+    arm_specs = []
+    predicates = arm_query.predicates
+    payloads = arm_query.payload
+    query_id = arm_query.id
+    for table_name, table_predicates in predicates.items():
+        table_row_count = table_row_counts[table_name]
+        if table_row_count < constants.SMALL_TABLE_IGNORE:
+            continue
+        includes = []
+        if table_name in payloads:
+            includes = sorted(list(set(payloads[table_name]) - set(table_predicates)))
+        ranked_columns = get_ranked_predicate_columns(table_name, table_predicates, column_selectivities)
+        full_key = get_ranked_key(ranked_columns)
+        # predicate columns left out of the ranked key are included as well, so that the index covers the query
+        covering_includes = sorted(list((set(payloads.get(table_name, [])) | set(table_predicates)) - set(full_key)))
+        if not (arm_query.selectivity[table_name] > constants.TABLE_MIN_SELECTIVITY and len(includes) > 0):
+            col_permutations = get_key_permutations(ranked_columns)
+            if len(full_key) > constants.MAX_PERMUTATION_LENGTH:
+                col_permutations.append(full_key)
+            for col_permutation in col_permutations:
+                arm_value = (1 - arm_query.selectivity[table_name]) * (
+                        len(col_permutation) / len(table_predicates)) * table_row_count
+                if col_permutation == full_key:
+                    arm_specs.append((table_name, col_permutation, arm_value, (),
+                                      table_name + '_' + str(query_id) + '_all', int(len(covering_includes) == 0)))
+                else:
+                    arm_specs.append((table_name, col_permutation, arm_value, (), None, 0))
+
+        if constants.INDEX_INCLUDES and full_key and covering_includes:
+            arm_value = (1 - arm_query.selectivity[table_name]) * table_row_count
+            arm_specs.append((table_name, full_key, arm_value, tuple(covering_includes),
+                              table_name + '_' + str(query_id) + '_all', 1))
+
+    for table_name, table_payloads in payloads.items():
+        if table_name not in predicates:
+            table_row_count = table_row_counts[table_name]
+            if table_row_count < constants.SMALL_TABLE_IGNORE:
+                continue
+            arm_value = 0.001 * table_row_count
+            arm_specs.append((table_name, tuple(table_payloads), arm_value, (),
+                              table_name + '_' + str(query_id) + '_all', 1))
+    return arm_specs
+
+
+def get_ranked_predicate_columns(table_name, table_predicates, column_selectivities):
+    """
+    Ranks the predicate columns of a table, equality columns come first, then join columns and then range columns.
+    Within each group the more selective columns come first. Predicates can be a list of columns or a dictionary of
+    column to predicate type ('e' equality, 'j'/'jpk'/'jpk2' join, 'r' range and 'c' other comparisons, which are
+    ranked as range columns). Columns without a type are ranked with the join columns.
+
+    :param table_name: table name
+    :param table_predicates: predicate columns of the table
+    :param column_selectivities: dictionary of (table name, column name) to selectivity
+    :return: list of (column, is range, selectivity)
+    """
+    ranked_columns = []
+    predicate_ranks = {}
+    for column_name in table_predicates:
+        predicate_type = table_predicates[column_name] if isinstance(table_predicates, dict) else None
+        is_range = predicate_type in ('r', 'c')
+        predicate_ranks[column_name] = 0 if predicate_type == 'e' else 2 if is_range else 1
+        ranked_columns.append((column_name, is_range, column_selectivities[(table_name, column_name)]))
+    ranked_columns.sort(key=lambda ranked_column: (predicate_ranks[ranked_column[0]], ranked_column[2]))
+    return ranked_columns
+
+
+def is_useful_key(key_columns):
+    """
+    A range column can only be the last column of a key, and there is no point in extending a prefix that is already
+    more selective than PREDICATE_MIN_SELECTIVITY
+
+    :param key_columns: list of (column, is range, selectivity)
+    :return: True if the key should be generated
+    """
+    prefix_selectivity = 1
+    for column_name, is_range, selectivity in key_columns[:-1]:
+        prefix_selectivity *= selectivity
+        if is_range or prefix_selectivity < constants.PREDICATE_MIN_SELECTIVITY:
+            return False
+    return True
+
+
+def get_key_permutations(ranked_columns):
+    """
+    Keys of up to MAX_PERMUTATION_LENGTH columns, in the order of the ranking
+
+    :param ranked_columns: list of (column, is range, selectivity)
+    :return: list of column tuples
+    """
+    col_permutations = []
+    for j in range(1, min(len(ranked_columns), constants.MAX_PERMUTATION_LENGTH) + 1):
+        for key_columns in itertools.permutations(ranked_columns, j):
+            if is_useful_key(key_columns):
+                col_permutations.append(tuple(column_name for column_name, _, _ in key_columns))
+    return col_permutations
+
+
+def get_ranked_key(ranked_columns):
+    """
+    Key with the ranked columns, equality columns are added until the key is selective enough followed by the most
+    selective range column
+
+    :param ranked_columns: list of (column, is range, selectivity)
+    :return: column tuple
+    """
+    key_columns = []
+    for ranked_column in ranked_columns:
+        if len(key_columns) == constants.MAX_KEY_COLUMNS or not is_useful_key(key_columns + [ranked_column]):
+            break
+        key_columns.append(ranked_column)
+    return tuple(column_name for column_name, _, _ in key_columns)
+
+
+class ArmGenerationPool:
+    """
+    Generates the arm specs of a batch of queries in a process pool. With 0 workers (or a single query) the specs are
+    generated in the calling process, which gives the same results as the pool.
+    """
+
+    def __init__(self, workers):
+        """
+        :param workers: number of worker processes, 0 to generate in the calling process
+        """
+        self.workers = workers
+        self.executor = None
+
+    def map(self, arm_queries, table_row_counts, column_selectivities):
+        """
+        Arm specs of a batch of queries, results are in the same order as the queries
+
+        :param arm_queries: list of ArmQuery
+        :param table_row_counts: dictionary of table name to row count
+        :param column_selectivities: dictionary of (table name, column name) to selectivity
+        :return: list of arm spec lists
+        """
+        if self.workers <= 0 or len(arm_queries) <= 1:
+            return [get_arm_specs_v3(arm_query, table_row_counts, column_selectivities) for arm_query in arm_queries]
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            logging.info(f"Started arm generation pool with {self.workers} workers")
+        return list(self.executor.map(get_arm_specs_v3, arm_queries, itertools.repeat(table_row_counts),
+                                      itertools.repeat(column_selectivities),
+                                      chunksize=max(1, len(arm_queries) // (self.workers * 4))))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
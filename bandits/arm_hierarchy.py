@@ -0,0 +1,109 @@
+import logging
+import math
+
+import constants
+
+
+class ArmHierarchy:
+    """
+    First level of the two level arm hierarchy. Learns the utility of the columns of each table with a UCB over the
+    rewards of the played arms, an arm's gain is credited to its leading column. Single column arms are always given to
+    the bandit, composite and covering arms only when their leading column is one of the top_columns columns of the
+    table. As the composite arms are name encoded with their columns, the C3UCB weights learned on the single column
+    arms carry over to them. Columnstore arms have no leading column and are always given to the bandit.
+    """
+
+    def __init__(self, top_columns, hyper_alpha):
+        """
+        :param top_columns: number of promising columns per table, arms are expanded under these columns
+        :param hyper_alpha: exploration weight of the column UCB
+        """
+        self.top_columns = top_columns
+        self.hyper_alpha = hyper_alpha
+        # (table name, column name) -> [number of plays, sum of the gains]
+        self.column_stats = {}
+        self.plays = 0
+
+    def get_upper_bounds(self, column_keys):
+        """
+        :param column_keys: list of (table name, column name)
+        :return: dictionary of (table name, column name) to the upper confidence bound of its utility
+        """
+        means = {}
+        for column_key in column_keys:
+            plays, gain_sum = self.column_stats.get(column_key, (0, 0))
+            means[column_key] = gain_sum / plays if plays > 0 else 0
+        # exploration is scaled with the largest mean gain so the UCB does not depend on the unit of the rewards
+        scale = max((abs(mean) for mean in means.values()), default=0) or 1
+        upper_bounds = {}
+        for column_key in column_keys:
+            plays = self.column_stats.get(column_key, (0, 0))[0]
+            upper_bounds[column_key] = means[column_key] + self.hyper_alpha * scale * math.sqrt(
+                math.log(self.plays + 1) / (plays + 1))
+        return upper_bounds
+
+    def get_expanded_arms(self, bandit_arms):
+        """
+        Returns the single column arms and the arms that are expanded under the promising columns of each table.
+        Columns without plays are ranked by the value of their single column arms.
+
+        :param bandit_arms: dictionary of bandit arms
+        :return: dictionary of bandit arms
+        """
+        column_values = {}
+        for bandit_arm in bandit_arms.values():
+            if bandit_arm.index_type != constants.INDEX_TYPE_ROWSTORE:
+                continue
+            column_key = (bandit_arm.table_name, bandit_arm.index_cols[0])
+            arm_value = sum(bandit_arm.arm_value.values()) if len(bandit_arm.index_cols) == 1 else 0
+            column_values[column_key] = max(column_values.get(column_key, 0), arm_value)
+        upper_bounds = self.get_upper_bounds(list(column_values.keys()))
+        table_columns = {}
+        for column_key in column_values:
+            table_columns.setdefault(column_key[0], []).append(column_key)
+        promising_columns = set()
+        for table_name, column_keys in table_columns.items():
+            column_keys.sort(key=lambda column_key: (-upper_bounds[column_key], -column_values[column_key],
+                                                     column_key[1]))
+            promising_columns.update(column_keys[:self.top_columns])
+
+        expanded_arms = {}
+        for arm_id, bandit_arm in bandit_arms.items():
+            if bandit_arm.index_type != constants.INDEX_TYPE_ROWSTORE or (
+                    len(bandit_arm.index_cols) == 1 and not bandit_arm.include_cols) or (
+                    bandit_arm.table_name, bandit_arm.index_cols[0]) in promising_columns:
+                expanded_arms[arm_id] = bandit_arm
+        logging.debug(f"Promising columns: {sorted(promising_columns)}")
+        return expanded_arms
+
+    def update(self, played_arms, arm_rewards):
+        """
+        Credits the gains of the played arms to their leading columns
+
+        :param played_arms: list of played bandit arms
+        :param arm_rewards: dictionary of arm id to (gain, creation cost)
+        """
+        for bandit_arm in played_arms:
+            if bandit_arm.index_type != constants.INDEX_TYPE_ROWSTORE:
+                continue
+            gain = arm_rewards[bandit_arm.arm_id][0] if bandit_arm.arm_id in arm_rewards else 0
+            column_stats = self.column_stats.setdefault((bandit_arm.table_name, bandit_arm.index_cols[0]), [0, 0])
+            column_stats[0] += 1
+            column_stats[1] += gain
+            self.plays += 1
+
+    def workload_change_trigger(self, workload_change):
+        """
+        Forgets the column statistics the same way as C3UCB.workload_change_trigger
+
+        :param workload_change: Percentage of new query templates added (0-1) 0: no workload change, 1: 100% shift
+        """
+        if workload_change > 0.5:
+            self.column_stats = {}
+            self.plays = 0
+        else:
+            forget_factor = 1 - workload_change * 2
+            for column_stats in self.column_stats.values():
+                column_stats[0] *= forget_factor
+                column_stats[1] *= forget_factor
+            self.plays *= forget_factor
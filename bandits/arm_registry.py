@@ -0,0 +1,138 @@
+import zlib
+
+import constants
+
+
+class ArmRegistry:
+    """
+    Interns arms to dense integer ids. Arms are identified by (table, key columns, include columns, filter, index
+    type, compression), the index name is built once when the arm is registered and is only needed for DDL, plans and
+    logs. Arms that get the same index name share the id, as the name is what identifies the index in the database.
+    Only created arms are registered, and an arm is released when the arm store evicts it, so the registry is bounded
+    like the store. Ids are not reused, an evicted arm that is generated again gets a new id.
+    """
+
+    def __init__(self):
+        # (table, key columns, include columns, filter predicate, index type, compression) -> arm id
+        self.arm_ids = {}
+        # arm id -> arm keys of the id
+        self.arm_keys = {}
+        # index name -> arm id
+        self.name_ids = {}
+        # arm id -> index name
+        self.names = {}
+        self.next_id = 0
+
+    def get_id(self, table_name, index_cols, include_cols=(), filter_predicate='',
+               index_type=constants.INDEX_TYPE_ROWSTORE, compression=''):
+        """
+        Returns the id of the arm, the arm is registered if it is not known yet
+
+        :param table_name: table name, the view name for an indexed view
+        :param index_cols: key columns, the columns of a columnstore index
+        :param include_cols: include columns
+        :param filter_predicate: filter of a filtered index, empty for a full index
+        :param index_type: INDEX_TYPE_ROWSTORE, INDEX_TYPE_COLUMNSTORE or INDEX_TYPE_VIEW
+        :param compression: data compression of a rowstore index (ROW or PAGE), empty for no compression
+        :return: integer arm id
+        """
+        arm_key = (table_name, tuple(index_cols), tuple(include_cols), filter_predicate, index_type, compression)
+        arm_id = self.arm_ids.get(arm_key)
+        if arm_id is None:
+            name = get_arm_name(index_cols, table_name, include_cols, filter_predicate, index_type, compression)
+            arm_id = self.name_ids.get(name)
+            if arm_id is None:
+                arm_id = self.next_id
+                self.next_id += 1
+                self.names[arm_id] = name
+                self.name_ids[name] = arm_id
+            self.arm_ids[arm_key] = arm_id
+            self.arm_keys.setdefault(arm_id, []).append(arm_key)
+        return arm_id
+
+    def find_id(self, table_name, index_cols, include_cols=(), filter_predicate='',
+                index_type=constants.INDEX_TYPE_ROWSTORE, compression=''):
+        """
+        Same as get_id, without registering the arm
+
+        :return: integer arm id, None if the arm is not registered
+        """
+        return self.arm_ids.get(
+            (table_name, tuple(index_cols), tuple(include_cols), filter_predicate, index_type, compression))
+
+    def release(self, arm_id):
+        """
+        Forget an arm that is no longer used
+
+        :param arm_id: integer arm id
+        """
+        for arm_key in self.arm_keys.pop(arm_id, []):
+            del self.arm_ids[arm_key]
+        name = self.names.pop(arm_id, None)
+        if name is not None:
+            del self.name_ids[name]
+
+    def get_name(self, arm_id):
+        """
+        :param arm_id: integer arm id
+        :return: index name of the arm
+        """
+        return self.names[arm_id]
+
+    def get_id_by_name(self, name):
+        """
+        Id of an index found in a plan
+
+        :param name: index name
+        :return: integer arm id, None if the index is not a registered arm
+        """
+        return self.name_ids.get(name)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def get_arm_name(index_cols, table_name, include_cols=(), filter_predicate='',
+                 index_type=constants.INDEX_TYPE_ROWSTORE, compression=''):
+    """
+    Index name of an arm. Filtered indexes get the checksum of their filter as the filter does not fit in the name,
+    columnstore indexes the checksum of their columns as the column list is often cut off. The clustered index of an
+    indexed view is named after the view, the view name already identifies its definition. Compressed indexes end
+    with their compression.
+
+    :param index_cols: key columns, the columns of a columnstore index
+    :param table_name: table name, the view name for an indexed view
+    :param include_cols: include columns
+    :param filter_predicate: filter of a filtered index, empty for a full index
+    :param index_type: INDEX_TYPE_ROWSTORE, INDEX_TYPE_COLUMNSTORE or INDEX_TYPE_VIEW
+    :param compression: data compression of a rowstore index (ROW or PAGE), empty for no compression
+    :return: index name
+    """
+    if compression:
+        arm_name = get_arm_name(index_cols, table_name, include_cols, filter_predicate, index_type)
+        return arm_name[:127 - len(compression) - 1] + '_' + compression.lower()
+    if index_type == constants.INDEX_TYPE_VIEW:
+        return 'IXV_' + table_name
+    if index_type == constants.INDEX_TYPE_COLUMNSTORE:
+        arm_name = 'IXC_' + table_name + '_' + '_'.join(index_cols).lower()
+        return arm_name[:118] + '_' + get_checksum(','.join(index_cols))
+    if filter_predicate:
+        arm_name = 'IXF_' + table_name + '_' + '_'.join(index_cols).lower()
+        return arm_name[:118] + '_' + get_checksum(filter_predicate)
+    if include_cols:
+        include_col_names = '_'.join(tuple(map(lambda x: x[0:4], include_cols))).lower()
+        arm_name = 'IXN_' + table_name + '_' + '_'.join(index_cols).lower() + '_' + include_col_names
+    else:
+        arm_name = 'IX_' + table_name + '_' + '_'.join(index_cols).lower()
+    return arm_name[:127]
+
+
+def get_checksum(text):
+    """
+    :param text: text
+    :return: crc32 of the text as 8 hex digits, the same in every process
+    """
+    return format(zlib.crc32(text.encode()), '08x')
+
+
+arm_registry = ArmRegistry()
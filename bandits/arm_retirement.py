@@ -0,0 +1,109 @@
+import logging
+
+
+class ArmRetirement:
+    """
+    Retires the arms that are not worth offering to the bandit any more, so the active arm set stays small over long
+    runs. An arm is retired when it was not used in any plan after unused_plays plays, or when it is dominated by a
+    played arm that was used: the other arm is of the same index type and compression, has the key of this arm as a
+    prefix, has all its include columns, has no filter or the same filter and serves all its queries. An arm only
+    counts as used when it has a positive gain, an arm that only adds maintenance cost to the DML statements is not
+    used. Retired arms are revived only on evidence, when they are generated for a query they were not generated for
+    at the retirement, or when the arm that dominated them is no longer active.
+    """
+
+    def __init__(self, unused_plays):
+        """
+        :param unused_plays: number of plays without use after which an arm is retired
+        """
+        self.unused_plays = unused_plays
+        # arm id -> [plays, uses]
+        self.arm_usage = {}
+        # arm id -> (query ids at the retirement, id of the dominating arm or None)
+        self.retired_arms = {}
+        self.retirements = 0
+        self.revivals = 0
+
+    def get_active_arms(self, bandit_arms, arm_query_ids):
+        """
+        Removes the retired arms, retired arms with new evidence are revived
+
+        :param bandit_arms: dictionary of bandit arms with arm id as the key
+        :param arm_query_ids: dictionary of arm id to the ids of the queries the arm was generated for
+        :return: dictionary of bandit arms that are not retired
+        """
+        active_arms = {}
+        for arm_id, bandit_arm in bandit_arms.items():
+            if arm_id in self.retired_arms:
+                query_ids, dominating_arm_id = self.retired_arms[arm_id]
+                if arm_query_ids[arm_id] <= query_ids and (
+                        dominating_arm_id is None or dominating_arm_id in bandit_arms):
+                    continue
+                self.revive(arm_id)
+            active_arms[arm_id] = bandit_arm
+        return active_arms
+
+    def update(self, played_arms, arm_rewards, bandit_arms):
+        """
+        Updates the usage of the played arms and retires the unused and the dominated arms
+
+        :param played_arms: list of played bandit arms
+        :param arm_rewards: dictionary of arm id to (gain, creation cost), arms used in the plans have a positive gain
+        :param bandit_arms: dictionary of the bandit arms of this round
+        """
+        used_arms = []
+        for bandit_arm in played_arms:
+            arm_usage = self.arm_usage.setdefault(bandit_arm.arm_id, [0, 0])
+            arm_usage[0] += 1
+            if bandit_arm.arm_id in arm_rewards and arm_rewards[bandit_arm.arm_id][0] > 0:
+                arm_usage[1] += 1
+                used_arms.append(bandit_arm)
+            elif arm_usage[0] >= self.unused_plays and arm_usage[1] == 0:
+                self.retire(bandit_arm, None)
+
+        used_arm_ids = {bandit_arm.arm_id for bandit_arm in used_arms}
+        for bandit_arm in bandit_arms.values():
+            if bandit_arm.arm_id in used_arm_ids or bandit_arm.arm_id in self.retired_arms:
+                continue
+            for used_arm in used_arms:
+                if is_dominated(bandit_arm, used_arm):
+                    self.retire(bandit_arm, used_arm)
+                    break
+
+    def retire(self, bandit_arm, dominating_arm):
+        """
+        :param bandit_arm: arm to retire
+        :param dominating_arm: arm that dominates the retired arm, None if it is retired for not being used
+        """
+        dominating_arm_id = dominating_arm.arm_id if dominating_arm is not None else None
+        self.retired_arms[bandit_arm.arm_id] = (frozenset(bandit_arm.query_ids_backup), dominating_arm_id)
+        self.retirements += 1
+        if dominating_arm is None:
+            logging.debug(f"Retired {bandit_arm.index_name}, not used in {self.arm_usage[bandit_arm.arm_id][0]} plays")
+        else:
+            logging.debug(f"Retired {bandit_arm.index_name}, dominated by {dominating_arm.index_name}")
+
+    def revive(self, arm_id):
+        del self.retired_arms[arm_id]
+        # a revived arm gets a new set of plays to be used
+        self.arm_usage.pop(arm_id, None)
+        self.revivals += 1
+
+    def get_stats(self):
+        return {'retired': len(self.retired_arms), 'retirements': self.retirements, 'revivals': self.revivals}
+
+    def log_stats(self):
+        logging.info(f"Arm retirement: {self.get_stats()}")
+
+
+def is_dominated(bandit_arm, other_arm):
+    """
+    :param bandit_arm: bandit arm
+    :param other_arm: bandit arm
+    :return: True if the other arm can do everything the given arm can do
+    """
+    return (bandit_arm.arm_id != other_arm.arm_id and bandit_arm.table_name == other_arm.table_name and
+            bandit_arm.index_type == other_arm.index_type and bandit_arm.compression == other_arm.compression and
+            bandit_arm <= other_arm and other_arm.filter_predicate in ('', bandit_arm.filter_predicate) and
+            set(bandit_arm.include_cols) <= set(other_arm.index_cols) | set(other_arm.include_cols) and
+            bandit_arm.query_ids_backup <= other_arm.query_ids_backup)
@@ -1,19 +1,35 @@
+import constants
+from bandits.arm_registry import arm_registry, get_arm_name
+
+
 class BanditArm:
-    def __init__(self, index_cols, table_name, memory, table_row_count, include_cols=()):
+    __slots__ = ('schema_name', 'table_name', 'index_cols', 'include_cols', 'filter_predicate', 'index_type',
+                 'compression', 'arm_id', 'memory', 'estimated_memory', 'is_memory_measured', 'table_row_count',
+                 'name_encoded_context', 'index_usage_last_batch', 'cluster', 'query_id', 'query_ids',
+                 'query_ids_backup', 'is_include', 'arm_value', 'clustered_index_time', 'view_tables',
+                 'view_definition')
+
+    def __init__(self, index_cols, table_name, memory, table_row_count, include_cols=(), filter_predicate='',
+                 index_type=constants.INDEX_TYPE_ROWSTORE, compression=''):
         self.schema_name = 'dbo'
         self.table_name = table_name
+        # key columns, for a columnstore index the columns of the index and for an indexed view its group by columns
         self.index_cols = index_cols
         self.include_cols = include_cols
-        if self.include_cols:
-            # include_col_hash = hashlib.sha1('_'.join(include_cols).lower().encode()).hexdigest()
-            include_col_names = '_'.join(tuple(map(lambda x: x[0:4], include_cols))).lower()
-            self.index_name = 'IXN_' + table_name + '_' + '_'.join(index_cols).lower() + '_' + include_col_names
-        else:
-            self.index_name = 'IX_' + table_name + '_' + '_'.join(index_cols).lower()
-        self.index_name = self.index_name[:127]
+        # WHERE clause of a filtered index, empty for a full index
+        self.filter_predicate = filter_predicate
+        self.index_type = index_type
+        # DATA_COMPRESSION of a rowstore index (ROW or PAGE), empty for no compression
+        self.compression = compression
+        self.arm_id = arm_registry.get_id(table_name, index_cols, include_cols, filter_predicate, index_type,
+                                          compression)
         self.memory = memory
+        # size estimate before the calibration, memory is replaced with the measured size once the index is built
+        self.estimated_memory = memory
+        self.is_memory_measured = False
         self.table_row_count = table_row_count
-        self.name_encoded_context = []
+        # SparseContext of the name encoding, the dense vector is built from it when the context is requested
+        self.name_encoded_context = None
         self.index_usage_last_batch = 0
         self.cluster = None
         self.query_id = None
@@ -22,12 +38,23 @@ class BanditArm:
         self.is_include = 0
         self.arm_value = {}
         self.clustered_index_time = 0
+        # base tables and select statement of an indexed view, the table name of a view arm is the view name
+        self.view_tables = ()
+        self.view_definition = ''
+
+    @property
+    def base_tables(self):
+        return self.view_tables if self.index_type == constants.INDEX_TYPE_VIEW else (self.table_name,)
+
+    @property
+    def index_name(self):
+        return arm_registry.get_name(self.arm_id)
 
     def __eq__(self, other):
-        return self.index_name == other.index_name
+        return self.arm_id == other.arm_id
 
     def __hash__(self):
-        return hash(self.index_name)
+        return self.arm_id
 
     def __le__(self, other):
         if len(self.index_cols) > len(other.index_cols):
@@ -42,11 +69,21 @@ class BanditArm:
         return self.index_name
 
     @staticmethod
-    def get_arm_id(index_cols, table_name, include_cols=()) -> str:
-        if include_cols:
-            include_col_names = '_'.join(tuple(map(lambda x: x[0:4], include_cols))).lower()
-            arm_id = 'IXN_' + table_name + '_' + '_'.join(index_cols).lower() + '_' + include_col_names
-        else:
-            arm_id = 'IX_' + table_name + '_' + '_'.join(index_cols).lower()
-        arm_id = arm_id[:127]
-        return arm_id
+    def get_arm_id(index_cols, table_name, include_cols=(), filter_predicate='',
+                   index_type=constants.INDEX_TYPE_ROWSTORE, compression='') -> int:
+        return arm_registry.get_id(table_name, index_cols, include_cols, filter_predicate, index_type, compression)
+
+    @staticmethod
+    def find_arm_id(index_cols, table_name, include_cols=(), filter_predicate='',
+                    index_type=constants.INDEX_TYPE_ROWSTORE, compression=''):
+        """
+        Id of an arm that is already created, the arm is not registered
+
+        :return: arm id, None if the arm was not created
+        """
+        return arm_registry.find_id(table_name, index_cols, include_cols, filter_predicate, index_type, compression)
+
+    @staticmethod
+    def get_arm_name(index_cols, table_name, include_cols=(), filter_predicate='',
+                     index_type=constants.INDEX_TYPE_ROWSTORE, compression='') -> str:
+        return get_arm_name(index_cols, table_name, include_cols, filter_predicate, index_type, compression)
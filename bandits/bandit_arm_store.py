@@ -0,0 +1,138 @@
+import itertools
+import logging
+import sys
+from collections import OrderedDict
+
+import numpy
+
+from bandits.arm_registry import arm_registry
+from bandits.bandit_arm import BanditArm
+
+
+class BanditArmStore:
+    """
+    Store of the generated bandit arms with the arm id as the key. At most capacity arms are kept, when the store is
+    full the least valuable of the eviction_sample least recently used arms is evicted. Arms that have learned usage
+    are valued above the ones that don't, so the statistics of hot arms are kept. Evicted arms are released from the
+    arm registry.
+
+    Arms that are still in use are never evicted: the arms read or added since the start of the round (start_round),
+    which are the arms generated, consolidated or selected in the round, and the pinned arms, which are the arms built
+    in the database. When all arms are in use the store stays above its capacity until the next round.
+    """
+
+    def __init__(self, capacity, eviction_sample):
+        """
+        :param capacity: maximum number of arms in the store, 0 for no limit
+        :param eviction_sample: number of least recently used arms considered for the eviction
+        """
+        self.capacity = capacity
+        self.eviction_sample = eviction_sample
+        self.arms = OrderedDict()
+        self.evictions = 0
+        # ids of the arms in use, arms read or added in this round and the pinned arms
+        self.arms_in_use = set()
+
+    def __contains__(self, arm_id):
+        return arm_id in self.arms
+
+    def __getitem__(self, arm_id):
+        bandit_arm = self.arms[arm_id]
+        self.arms.move_to_end(arm_id)
+        self.arms_in_use.add(arm_id)
+        return bandit_arm
+
+    def __setitem__(self, arm_id, bandit_arm):
+        self.arms[arm_id] = bandit_arm
+        self.arms.move_to_end(arm_id)
+        self.arms_in_use.add(arm_id)
+        while 0 < self.capacity < len(self.arms) and self.evict():
+            pass
+
+    def __len__(self):
+        return len(self.arms)
+
+    def touch(self, arm_ids):
+        """
+        Mark the given arms as recently used
+
+        :param arm_ids: ids of the arms
+        """
+        for arm_id in arm_ids:
+            if arm_id in self.arms:
+                self.arms.move_to_end(arm_id)
+                self.arms_in_use.add(arm_id)
+
+    def start_round(self, pinned_arm_ids):
+        """
+        Starts a new round, only the pinned arms stay in use. Arms that are not used in the round can be evicted.
+
+        :param pinned_arm_ids: ids of the arms that must be kept, the arms built in the database
+        """
+        self.arms_in_use = {arm_id for arm_id in pinned_arm_ids if arm_id in self.arms}
+        while 0 < self.capacity < len(self.arms) and self.evict():
+            pass
+
+    def evict(self):
+        """
+        :return: True if an arm was evicted, False if all the arms are in use
+        """
+        if len(self.arms_in_use) >= len(self.arms):
+            return False
+        candidates = itertools.islice(((arm_id, bandit_arm) for arm_id, bandit_arm in self.arms.items()
+                                       if arm_id not in self.arms_in_use), self.eviction_sample)
+        arm_id, bandit_arm = min(candidates, key=lambda candidate: get_arm_value(candidate[1]))
+        del self.arms[arm_id]
+        # the id of an evicted arm is released, nothing refers to it any more. The arm is created with a new id if it
+        # is generated again.
+        arm_registry.release(arm_id)
+        self.evictions += 1
+        return True
+
+    def get_stats(self):
+        """
+        :return: dictionary with the size, evictions and the (approximate) memory used by the arms in bytes
+        """
+        memory = sum(get_arm_memory(bandit_arm) for bandit_arm in self.arms.values())
+        return {'size': len(self.arms), 'capacity': self.capacity, 'evictions': self.evictions, 'memory': memory,
+                'memory_per_arm': memory / len(self.arms) if self.arms else 0}
+
+    def clear(self):
+        for arm_id in self.arms:
+            arm_registry.release(arm_id)
+        self.arms.clear()
+        self.arms_in_use = set()
+        self.evictions = 0
+
+    def log_stats(self):
+        logging.info(f"Bandit arm store: {self.get_stats()}")
+
+
+def get_arm_value(bandit_arm):
+    """
+    Value used to pick the arm to evict, arms with learned usage come first and then the arm value
+
+    :param bandit_arm: bandit arm
+    :return: comparable value
+    """
+    return bandit_arm.index_usage_last_batch != 0, max(bandit_arm.arm_value.values(), default=0)
+
+
+def get_arm_memory(bandit_arm):
+    """
+    Approximate memory used by an arm, the arm with its containers and their items
+
+    :param bandit_arm: bandit arm
+    :return: size in bytes
+    """
+    size = sys.getsizeof(bandit_arm)
+    for attribute in BanditArm.__slots__:
+        value = getattr(bandit_arm, attribute, None)
+        size += sys.getsizeof(value)
+        if isinstance(value, (list, tuple, set, frozenset)):
+            size += sum(sys.getsizeof(item) for item in value)
+        elif isinstance(value, dict):
+            size += sum(sys.getsizeof(key) + sys.getsizeof(item) for key, item in value.items())
+        elif isinstance(value, numpy.ndarray) and value.base is not None:
+            size += value.nbytes
+    return size
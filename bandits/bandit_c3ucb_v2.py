@@ -71,8 +71,8 @@ class C3UCB(C3UCBBaseBandit):
         :param arm_rewards: tuple (gains, creation cost) reward got form playing each arm
         """
         for i in played_arms:
-            if self.arms[i].index_name in arm_rewards:
-                arm_reward = arm_rewards[self.arms[i].index_name]
+            if self.arms[i].arm_id in arm_rewards:
+                arm_reward = arm_rewards[self.arms[i].arm_id]
             else:
                 arm_reward = (0, 0)
             logging.info(f"reward for {self.arms[i].index_name}, {self.arms[i].query_ids_backup} is {arm_reward}")
@@ -5,9 +5,20 @@ import numpy
 
 import constants as constants
 import database.sql_helper_v2 as sql_helper
+from bandits.arm_generation import ArmGenerationPool, ArmQuery, get_ranked_key, get_ranked_predicate_columns
 from bandits.bandit_arm import BanditArm
+from bandits.bandit_arm_store import BanditArmStore
+from bandits.filtered_arms import get_filter_predicate
+from bandits.sparse_context import get_column_positions, get_dense_context, get_sparse_context
+from bandits.view_arms import get_view_definition, get_view_name, get_view_pattern
+from bandits.workload_sketch import get_predicate_key, get_sketch_query_id
+from database.index_size import OVERSIZED_INDEX_SIZE, columnstore_size_estimator, get_size_estimator, \
+    view_size_estimator
 
-bandit_arm_store = {}
+bandit_arm_store = BanditArmStore(constants.ARM_STORE_CAPACITY, constants.ARM_STORE_EVICTION_SAMPLE)
+arm_generation_pool = ArmGenerationPool(constants.ARM_GENERATION_WORKERS)
+# query id -> ViewPattern of the query, None if the query does not fit an indexed view
+view_pattern_store = {}
 
 
 def gen_arms_from_predicates_v2(connection, query_obj):
@@ -38,7 +49,7 @@ def gen_arms_from_predicates_v2(connection, query_obj):
         for j in range(1, (len(table_predicates) + 1)):
             col_permutations = col_permutations + list(itertools.permutations(table_predicates, j))
         for col_permutation in col_permutations:
-            arm_id = BanditArm.get_arm_id(col_permutation, table_name)
+            arm_id = BanditArm.find_arm_id(col_permutation, table_name)
             table_row_count = table.table_row_count
             arm_value = (1 - query_obj.selectivity[table_name]) * (
                         len(col_permutation) / len(table_predicates)) * table_row_count
@@ -51,7 +62,7 @@ def gen_arms_from_predicates_v2(connection, query_obj):
                 else:
                     bandit_arm.arm_value[query_id] = arm_value
             else:
-                size = sql_helper.get_estimated_size_of_index_v1(connection, constants.SCHEMA_NAME,
+                size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME,
                                                                  table_name, col_permutation)
                 bandit_arm = BanditArm(col_permutation, table_name, size, table_row_count)
                 bandit_arm.query_id = query_id
@@ -60,9 +71,9 @@ def gen_arms_from_predicates_v2(connection, query_obj):
                     if len(includes) == 0:
                         bandit_arm.is_include = 1
                 bandit_arm.arm_value[query_id] = arm_value
-                bandit_arm_store[arm_id] = bandit_arm
-            if bandit_arm not in bandit_arms:
-                bandit_arms[arm_id] = bandit_arm
+                bandit_arm_store[bandit_arm.arm_id] = bandit_arm
+            if bandit_arm.arm_id not in bandit_arms:
+                bandit_arms[bandit_arm.arm_id] = bandit_arm
 
     for table_name, table_payloads in payloads.items():
         if table_name not in predicates:
@@ -70,7 +81,7 @@ def gen_arms_from_predicates_v2(connection, query_obj):
             if table.table_row_count < constants.SMALL_TABLE_IGNORE:
                 continue
             col_permutation = table_payloads
-            arm_id = BanditArm.get_arm_id(col_permutation, table_name)
+            arm_id = BanditArm.find_arm_id(col_permutation, table_name)
             table_row_count = table.table_row_count
             arm_value = 0.001 * table_row_count
             if arm_id in bandit_arm_store:
@@ -82,16 +93,16 @@ def gen_arms_from_predicates_v2(connection, query_obj):
                 else:
                     bandit_arm.arm_value[query_id] = arm_value
             else:
-                size = sql_helper.get_estimated_size_of_index_v1(connection, constants.SCHEMA_NAME,
+                size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME,
                                                                  table_name, col_permutation)
                 bandit_arm = BanditArm(col_permutation, table_name, size, table_row_count)
                 bandit_arm.query_id = query_id
                 bandit_arm.cluster = table_name + '_' + str(query_id) + '_all'
                 bandit_arm.is_include = 1
                 bandit_arm.arm_value[query_id] = arm_value
-                bandit_arm_store[arm_id] = bandit_arm
-            if bandit_arm not in bandit_arms:
-                bandit_arms[arm_id] = bandit_arm
+                bandit_arm_store[bandit_arm.arm_id] = bandit_arm
+            if bandit_arm.arm_id not in bandit_arms:
+                bandit_arms[bandit_arm.arm_id] = bandit_arm
 
     if constants.INDEX_INCLUDES:
         for table_name, table_predicates in predicates.items():
@@ -104,11 +115,11 @@ def gen_arms_from_predicates_v2(connection, query_obj):
             if includes:
                 col_permutations = list(itertools.permutations(table_predicates, len(table_predicates)))
                 for col_permutation in col_permutations:
-                    arm_id_with_include = BanditArm.get_arm_id(col_permutation, table_name, includes)
+                    arm_id_with_include = BanditArm.find_arm_id(col_permutation, table_name, includes)
                     table_row_count = table.table_row_count
                     arm_value = (1 - query_obj.selectivity[table_name]) * table_row_count
                     if arm_id_with_include not in bandit_arm_store:
-                        size_with_includes = sql_helper.get_estimated_size_of_index_v1(connection,
+                        size_with_includes = sql_helper.get_estimated_size_of_index_v2(connection,
                                                                                        constants.SCHEMA_NAME,
                                                                                        table_name,
                                                                                        col_permutation + tuple(
@@ -119,18 +130,413 @@ def gen_arms_from_predicates_v2(connection, query_obj):
                         bandit_arm.query_id = query_id
                         bandit_arm.cluster = table_name + '_' + str(query_id) + '_all'
                         bandit_arm.arm_value[query_id] = arm_value
-                        bandit_arm_store[arm_id_with_include] = bandit_arm
+                        bandit_arm_store[bandit_arm.arm_id] = bandit_arm
                     else:
-                        bandit_arm_store[arm_id_with_include].query_id = query_id
-                        if query_id in bandit_arm_store[arm_id_with_include].arm_value:
-                            bandit_arm_store[arm_id_with_include].arm_value[query_id] += arm_value
-                            bandit_arm_store[arm_id_with_include].arm_value[query_id] /= 2
+                        bandit_arm = bandit_arm_store[arm_id_with_include]
+                        bandit_arm.query_id = query_id
+                        if query_id in bandit_arm.arm_value:
+                            bandit_arm.arm_value[query_id] += arm_value
+                            bandit_arm.arm_value[query_id] /= 2
                         else:
-                            bandit_arm_store[arm_id_with_include].arm_value[query_id] = arm_value
-                    bandit_arms[arm_id_with_include] = bandit_arm_store[arm_id_with_include]
+                            bandit_arm.arm_value[query_id] = arm_value
+                    bandit_arms[bandit_arm.arm_id] = bandit_arm
+    return bandit_arms
+
+
+def gen_arms_from_predicates_v3(connection, query_obj):
+    """
+    Pruned version of gen_arms_from_predicates_v2. Predicate columns are ranked with equality columns before range
+    columns and then by their selectivity. Keys of up to MAX_PERMUTATION_LENGTH columns are generated, where a range
+    column can only be the last key column and a key is not extended past a prefix more selective than
+    PREDICATE_MIN_SELECTIVITY. The ranked key over all the useful columns (capped at MAX_KEY_COLUMNS) is added as well,
+    with and without the includes (the predicate columns left out of the key are included too).
+
+    :param connection: SQL connection
+    :param query_obj: Query object
+    :return: list of bandit arms
+    """
+    return get_bandit_arms(connection, query_obj.id, get_arm_specs_batch(connection, [query_obj])[0])
+
+
+def get_arm_specs_batch(connection, query_obj_list):
+    """
+    Arm specs of gen_arms_from_predicates_v3 for a batch of queries. The column selectivities are read here, the arm
+    specs are generated in the arm generation pool.
+
+    :param connection: SQL connection
+    :param query_obj_list: list of Query objects
+    :return: list of arm spec lists, in the same order as the queries
+    """
+    tables = sql_helper.get_tables(connection)
+    table_row_counts = {table_name: table.table_row_count for table_name, table in tables.items()}
+    column_selectivities = {}
+    arm_queries = []
+    for query_obj in query_obj_list:
+        for table_name, table_predicates in query_obj.predicates.items():
+            if table_row_counts[table_name] < constants.SMALL_TABLE_IGNORE:
+                continue
+            for column_name in table_predicates:
+                if (table_name, column_name) not in column_selectivities:
+                    column_selectivities[(table_name, column_name)] = sql_helper.get_column_selectivity(
+                        connection, constants.SCHEMA_NAME, table_name, column_name)
+        arm_queries.append(ArmQuery(query_obj.id, query_obj.predicates, query_obj.payload, query_obj.selectivity))
+    return arm_generation_pool.map(arm_queries, table_row_counts, column_selectivities)
+
+
+def gen_arms_from_sketch(connection, workload_sketch):
+    """
+    Generates arms for the heavy hitter predicate sets of a workload sketch. Each heavy predicate set is treated as a
+    query on its table (with the most frequent heavy payload of the table), and the values of its arms are weighted
+    with the estimated frequency of the predicate set. The table selectivity of these queries is estimated from the
+    density of the equality columns.
+
+    :param connection: SQL connection
+    :param workload_sketch: WorkloadSketch
+    :return: dictionary of bandit arms with arm id as the key
+    """
+    heavy_payloads = workload_sketch.get_heavy_payloads(constants.SKETCH_MIN_SHARE)
+    arm_queries = []
+    frequencies = []
+    for (table_name, table_predicates), frequency in workload_sketch.get_heavy_predicates(constants.SKETCH_MIN_SHARE):
+        selectivity = 1
+        for column_name, predicate_type in table_predicates.items():
+            if predicate_type in ('e', None):
+                selectivity *= sql_helper.get_column_selectivity(connection, constants.SCHEMA_NAME, table_name,
+                                                                 column_name)
+        payload = {table_name: heavy_payloads[table_name]} if table_name in heavy_payloads else {}
+        query_id = get_sketch_query_id(get_predicate_key(table_name, table_predicates))
+        arm_queries.append(ArmQuery(query_id, {table_name: table_predicates}, payload, {table_name: selectivity}))
+        frequencies.append(frequency)
+
+    bandit_arms = {}
+    for arm_query, arm_specs, frequency in zip(arm_queries, get_arm_specs_batch(connection, arm_queries), frequencies):
+        arm_specs = [(table_name, index_cols, arm_value * frequency, include_cols, cluster, is_include)
+                     for table_name, index_cols, arm_value, include_cols, cluster, is_include in arm_specs]
+        bandit_arms.update(get_bandit_arms(connection, arm_query.id, arm_specs))
+    return bandit_arms
+
+
+def get_sketch_arm_query_ids(bandit_arms, query_obj_list):
+    """
+    Sketch arms are generated for predicate sets, not for queries. An arm serves the queries that have all its key
+    columns as predicates on its table, the same queries per query arm generation would generate it for. Queries are
+    indexed by their predicate columns, so each set of key columns is only matched once.
+
+    :param bandit_arms: dictionary of bandit arms from gen_arms_from_sketch
+    :param query_obj_list: list of Query objects
+    :return: dictionary of the arms that serve a query with arm id as the key and dictionary of arm id to the ids of
+        the queries the arm serves
+    """
+    # (table name, predicate column) -> ids of the queries with a predicate on the column
+    column_query_ids = {}
+    for query_obj in query_obj_list:
+        for table_name, table_predicates in query_obj.predicates.items():
+            for column_name in table_predicates:
+                column_query_ids.setdefault((table_name, column_name), set()).add(query_obj.id)
+    # (table name, key columns) -> ids of the queries with all the key columns as predicates
+    key_query_ids = {}
+    served_arms = {}
+    arm_query_ids = {}
+    for arm_id, bandit_arm in bandit_arms.items():
+        key = (bandit_arm.table_name, frozenset(bandit_arm.index_cols))
+        if key not in key_query_ids:
+            column_sets = sorted((column_query_ids.get((bandit_arm.table_name, column_name), set())
+                                  for column_name in key[1]), key=len)
+            key_query_ids[key] = set(column_sets[0]).intersection(*column_sets[1:]) if column_sets else set()
+        if key_query_ids[key]:
+            served_arms[arm_id] = bandit_arm
+            arm_query_ids[arm_id] = set(key_query_ids[key])
+    return served_arms, arm_query_ids
+
+
+def get_bandit_arms(connection, query_id, arm_specs):
+    """
+    Returns the arms for the given arm specs. The arms that are not in the bandit arm store yet are sized in one batch
+    per table.
+
+    :param connection: SQL connection
+    :param query_id: id of the query the arms are generated for
+    :param arm_specs: list of (table name, key columns, arm value, include columns, cluster, is include)
+    :return: dictionary of bandit arms with arm id as the key
+    """
+    tables = sql_helper.get_tables(connection)
+    # table name -> ((key columns, include columns) -> columns of the new arm)
+    new_arm_columns = {}
+    for table_name, index_cols, _, include_cols, _, _ in arm_specs:
+        if BanditArm.find_arm_id(index_cols, table_name, include_cols) not in bandit_arm_store:
+            new_arm_columns.setdefault(table_name, {})[(tuple(index_cols), tuple(include_cols))] = tuple(
+                index_cols) + tuple(include_cols)
+    # (table name, key columns, include columns) -> estimated size of the new arm
+    sizes = {}
+    for table_name, table_arms in new_arm_columns.items():
+        table_sizes = sql_helper.get_estimated_sizes_of_indexes(connection, constants.SCHEMA_NAME, table_name,
+                                                                list(table_arms.values()))
+        sizes.update(((table_name,) + arm_columns, size) for arm_columns, size in zip(table_arms.keys(),
+                                                                                      table_sizes.tolist()))
+
+    bandit_arms: Dict[int, BanditArm] = {}
+    for table_name, index_cols, arm_value, include_cols, cluster, is_include in arm_specs:
+        size = sizes.get((table_name, tuple(index_cols), tuple(include_cols)))
+        bandit_arm = get_bandit_arm(connection, tables[table_name], index_cols, query_id, arm_value, include_cols,
+                                    cluster, is_include, size)
+        bandit_arms[bandit_arm.arm_id] = bandit_arm
     return bandit_arms
 
 
+def get_bandit_arm(connection, table, index_cols, query_id, arm_value, include_cols=(), cluster=None, is_include=0,
+                   size=None, filter_predicate='', index_type=constants.INDEX_TYPE_ROWSTORE):
+    """
+    Returns the arm from the bandit arm store, the arm is created (with its estimated size) if it is not there yet.
+    cluster and is_include are only set on creation, same as in gen_arms_from_predicates_v2.
+
+    :param connection: SQL connection
+    :param table: Table object
+    :param index_cols: key columns
+    :param query_id: id of the query the arm is generated for
+    :param arm_value: value of the arm for the query
+    :param include_cols: include columns
+    :param cluster: cluster of the arm
+    :param is_include: is include feature of the arm
+    :param size: estimated size of the arm, estimated here if not given
+    :param filter_predicate: filter of a filtered index arm
+    :param index_type: INDEX_TYPE_ROWSTORE or INDEX_TYPE_COLUMNSTORE
+    :return: bandit arm
+    """
+    arm_id = BanditArm.find_arm_id(index_cols, table.table_name, include_cols, filter_predicate, index_type)
+    if arm_id in bandit_arm_store:
+        bandit_arm = bandit_arm_store[arm_id]
+        bandit_arm.query_id = query_id
+        if query_id in bandit_arm.arm_value:
+            bandit_arm.arm_value[query_id] += arm_value
+            bandit_arm.arm_value[query_id] /= 2
+        else:
+            bandit_arm.arm_value[query_id] = arm_value
+    else:
+        if size is None:
+            size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME, table.table_name,
+                                                             tuple(index_cols) + tuple(include_cols))
+        bandit_arm = BanditArm(index_cols, table.table_name, size, table.table_row_count, include_cols,
+                               filter_predicate, index_type)
+        bandit_arm.query_id = query_id
+        bandit_arm.cluster = cluster
+        bandit_arm.is_include = is_include
+        bandit_arm.arm_value[query_id] = arm_value
+        bandit_arm_store[bandit_arm.arm_id] = bandit_arm
+    return bandit_arm
+
+
+def gen_filtered_arms(connection, query_obj_list, literal_stats):
+    """
+    Generates filtered covering index arms for the frequent literal predicates of the queries. For each query and table
+    with a frequent filter, the key is the ranked key of the predicate columns that are not fixed by an equality in the
+    filter, the other predicate and payload columns are included. The size is the estimated size of the full index
+    scaled with the histogram selectivity of the filter, and the value is weighted with the share of the query
+    instances the filter matches. The arm is in the cluster of the covering arm of the query.
+
+    :param connection: SQL connection
+    :param query_obj_list: list of Query objects
+    :param literal_stats: LiteralStats of the workload
+    :return: dictionary of bandit arms with arm id as the key and dictionary of arm id to the ids of the queries the
+        arm was generated for
+    """
+    tables = sql_helper.get_tables(connection)
+    bandit_arms = {}
+    arm_query_ids = {}
+    for query_obj in query_obj_list:
+        table_filters = literal_stats.get_frequent_filters(query_obj.id, constants.FILTERED_INDEX_MIN_COUNT,
+                                                           constants.FILTERED_INDEX_MIN_SHARE)
+        for table_name, (filter_terms, share) in table_filters.items():
+            table = tables[table_name]
+            if table.table_row_count < constants.SMALL_TABLE_IGNORE:
+                continue
+            table_predicates = query_obj.predicates[table_name]
+            column_selectivities = {(table_name, column_name): sql_helper.get_column_selectivity(
+                connection, constants.SCHEMA_NAME, table_name, column_name) for column_name in table_predicates}
+            ranked_columns = get_ranked_predicate_columns(table_name, table_predicates, column_selectivities)
+            fixed_columns = {column_name for column_name, operator, _ in filter_terms if operator == '='}
+            index_cols = get_ranked_key([ranked_column for ranked_column in ranked_columns
+                                         if ranked_column[0] not in fixed_columns]) or (ranked_columns[0][0],)
+            include_cols = tuple(sorted((set(query_obj.payload.get(table_name, [])) | set(table_predicates)) -
+                                        set(index_cols)))
+            filter_predicate = get_filter_predicate(filter_terms)
+            size = None
+            if BanditArm.find_arm_id(index_cols, table_name, include_cols, filter_predicate) not in bandit_arm_store:
+                size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME, table_name,
+                                                                 index_cols + include_cols)
+                if size != OVERSIZED_INDEX_SIZE:
+                    size *= sql_helper.get_filter_selectivity(connection, constants.SCHEMA_NAME, table_name,
+                                                              filter_terms)
+            arm_value = (1 - query_obj.selectivity[table_name]) * table.table_row_count * share
+            bandit_arm = get_bandit_arm(connection, table, index_cols, query_obj.id, arm_value, include_cols,
+                                        table_name + '_' + str(query_obj.id) + '_all', 1, size, filter_predicate)
+            bandit_arms[bandit_arm.arm_id] = bandit_arm
+            arm_query_ids.setdefault(bandit_arm.arm_id, set()).add(query_obj.id)
+    return bandit_arms, arm_query_ids
+
+
+def gen_columnstore_arms(connection, query_obj_list):
+    """
+    Generates a nonclustered columnstore index arm per table with at least COLUMNSTORE_MIN_ROWS rows, over all the
+    predicate and payload columns the queries read from the table. The value for a query grows with the share of the
+    table it reads, as scans gain the most from a columnstore. A table can have a single nonclustered columnstore
+    index, so the arms are in a cluster of their own table. They are not marked as covering, as the seeks of the
+    queries can still use the rowstore arms.
+
+    :param connection: SQL connection
+    :param query_obj_list: list of Query objects
+    :return: dictionary of bandit arms with arm id as the key and dictionary of arm id to the ids of the queries the
+        arm was generated for
+    """
+    tables = sql_helper.get_tables(connection)
+    table_columns = {}
+    table_queries = {}
+    for query_obj in query_obj_list:
+        for table_name in set(query_obj.predicates) | set(query_obj.payload):
+            if tables[table_name].table_row_count < constants.COLUMNSTORE_MIN_ROWS:
+                continue
+            table_columns.setdefault(table_name, set()).update(query_obj.predicates.get(table_name, []))
+            table_columns[table_name].update(query_obj.payload.get(table_name, []))
+            table_queries.setdefault(table_name, []).append(query_obj)
+
+    bandit_arms = {}
+    arm_query_ids = {}
+    for table_name, column_names in table_columns.items():
+        table = tables[table_name]
+        index_cols = tuple(sorted(column_names))
+        size = None
+        arm_id = BanditArm.find_arm_id(index_cols, table_name, (), '', constants.INDEX_TYPE_COLUMNSTORE)
+        if arm_id not in bandit_arm_store:
+            size = columnstore_size_estimator.get_estimated_sizes(table, [index_cols])[0]
+        for query_obj in table_queries[table_name]:
+            arm_value = query_obj.selectivity.get(table_name, 1) * table.table_row_count
+            bandit_arm = get_bandit_arm(connection, table, index_cols, query_obj.id, arm_value, (),
+                                        table_name + '_columnstore', 0, size, '', constants.INDEX_TYPE_COLUMNSTORE)
+            bandit_arms[bandit_arm.arm_id] = bandit_arm
+            arm_query_ids.setdefault(bandit_arm.arm_id, set()).add(query_obj.id)
+    return bandit_arms, arm_query_ids
+
+
+def gen_view_arms(connection, query_obj_list):
+    """
+    Generates an indexed view arm for the join-aggregate queries that were run at least VIEW_MIN_FREQUENCY times. The
+    view pre-joins the tables of the query and pre-aggregates its sums and averages, grouped on the group by and filter
+    columns of the query. The number of groups is estimated from the densities of the group by columns, views with
+    more than VIEW_MAX_ROW_SHARE of the rows of their largest table save too little and are skipped. The value for a
+    query is the rows of the base tables the view saves reading.
+
+    :param connection: SQL connection
+    :param query_obj_list: list of Query objects
+    :return: dictionary of bandit arms with arm id as the key and dictionary of arm id to the ids of the queries the
+        arm was generated for
+    """
+    tables = sql_helper.get_tables(connection)
+    table_names = {table_name.upper(): table_name for table_name in tables}
+    column_tables = {}
+    for table_name, table in tables.items():
+        for column_name in table.get_columns():
+            column_key = column_name.upper()
+            column_tables[column_key] = (table_name, column_name) if column_key not in column_tables else None
+    column_tables = {column_key: column for column_key, column in column_tables.items() if column is not None}
+
+    bandit_arms = {}
+    arm_query_ids = {}
+    for query_obj in query_obj_list:
+        if query_obj.frequency < constants.VIEW_MIN_FREQUENCY:
+            continue
+        if query_obj.id not in view_pattern_store:
+            view_pattern_store[query_obj.id] = get_view_pattern(query_obj.query_string, table_names, column_tables)
+        view_pattern = view_pattern_store[query_obj.id]
+        if view_pattern is None:
+            continue
+        main_table = max(view_pattern.tables, key=lambda table_name: (tables[table_name].table_row_count, table_name))
+        main_row_count = tables[main_table].table_row_count
+        view_name = get_view_name(view_pattern, main_table)
+        index_cols = tuple(column_name for _, column_name in view_pattern.group_cols)
+        view_row_count = 1
+        for table_name, column_name in view_pattern.group_cols:
+            selectivity = sql_helper.get_column_selectivity(connection, constants.SCHEMA_NAME, table_name, column_name)
+            view_row_count *= 1 / selectivity if selectivity < 1 else tables[table_name].table_row_count
+        view_row_count = min(view_row_count, main_row_count)
+        if view_row_count > constants.VIEW_MAX_ROW_SHARE * main_row_count:
+            continue
+        arm_id = BanditArm.find_arm_id(index_cols, view_name, (), '', constants.INDEX_TYPE_VIEW)
+        arm_value = sum(tables[table_name].table_row_count for table_name in view_pattern.tables) - view_row_count
+        if arm_id in bandit_arm_store:
+            bandit_arm = bandit_arm_store[arm_id]
+            bandit_arm.query_id = query_obj.id
+            bandit_arm.arm_value[query_obj.id] = arm_value
+        else:
+            size = view_size_estimator.get_estimated_view_size(tables, view_pattern.group_cols,
+                                                               len(view_pattern.aggregates), view_row_count)
+            if size == OVERSIZED_INDEX_SIZE:
+                continue
+            bandit_arm = BanditArm(index_cols, view_name, size, main_row_count, (), '', constants.INDEX_TYPE_VIEW)
+            bandit_arm.view_tables = view_pattern.tables
+            bandit_arm.view_definition = get_view_definition(view_pattern, constants.SCHEMA_NAME)
+            bandit_arm.query_id = query_obj.id
+            bandit_arm.arm_value[query_obj.id] = arm_value
+            bandit_arm_store[bandit_arm.arm_id] = bandit_arm
+        bandit_arms[bandit_arm.arm_id] = bandit_arm
+        arm_query_ids.setdefault(bandit_arm.arm_id, set()).add(query_obj.id)
+    return bandit_arms, arm_query_ids
+
+
+def gen_compressed_arms(connection, bandit_arms, arm_query_ids):
+    """
+    Generates the INDEX_COMPRESSION_TYPES compressed variants of the rowstore arms of at least COMPRESSION_MIN_SIZE MB.
+    A variant has the columns, filter, cluster and values of its arm and the estimated size of the arm scaled with the
+    compression ratio of the table. The variants compete with their arm under the memory budget, the bandit learns if
+    the smaller size and I/O of a compressed index pay for the CPU of the compression.
+
+    :param connection: SQL connection
+    :param bandit_arms: dictionary of bandit arms with arm id as the key
+    :param arm_query_ids: dictionary of arm id to the ids of the queries the arm was generated for
+    :return: dictionary of compressed bandit arms with arm id as the key and dictionary of arm id to the ids of the
+        queries the arm was generated for
+    """
+    compressed_arms = {}
+    compressed_query_ids = {}
+    for arm_id, bandit_arm in bandit_arms.items():
+        if (bandit_arm.index_type != constants.INDEX_TYPE_ROWSTORE or bandit_arm.compression or
+                not constants.COMPRESSION_MIN_SIZE <= bandit_arm.estimated_memory < OVERSIZED_INDEX_SIZE):
+            continue
+        for compression in constants.INDEX_COMPRESSION_TYPES:
+            compressed_arm_id = BanditArm.find_arm_id(bandit_arm.index_cols, bandit_arm.table_name,
+                                                     bandit_arm.include_cols, bandit_arm.filter_predicate,
+                                                     bandit_arm.index_type, compression)
+            if compressed_arm_id in bandit_arm_store:
+                compressed_arm = bandit_arm_store[compressed_arm_id]
+            else:
+                size = bandit_arm.estimated_memory * sql_helper.get_compression_ratio(
+                    connection, constants.SCHEMA_NAME, bandit_arm.table_name, compression)
+                compressed_arm = BanditArm(bandit_arm.index_cols, bandit_arm.table_name, size,
+                                           bandit_arm.table_row_count, bandit_arm.include_cols,
+                                           bandit_arm.filter_predicate, bandit_arm.index_type, compression)
+                compressed_arm.cluster = bandit_arm.cluster
+                compressed_arm.is_include = bandit_arm.is_include
+                bandit_arm_store[compressed_arm.arm_id] = compressed_arm
+            compressed_arm.query_id = bandit_arm.query_id
+            compressed_arm.arm_value.update(bandit_arm.arm_value)
+            compressed_arms[compressed_arm.arm_id] = compressed_arm
+            compressed_query_ids[compressed_arm.arm_id] = set(arm_query_ids[arm_id])
+    return compressed_arms, compressed_query_ids
+
+
+def calibrate_arm_sizes(bandit_arms):
+    """
+    Sets the memory of the arms that are not built yet to their estimated size scaled with the correction factor
+    learned from the built indexes of the table, index type and compression
+
+    :param bandit_arms: dictionary of bandit arms
+    """
+    if not constants.SIZE_MODEL_CALIBRATION:
+        return
+    for bandit_arm in bandit_arms.values():
+        if not bandit_arm.is_memory_measured:
+            bandit_arm.memory = get_size_estimator(bandit_arm.index_type, bandit_arm.compression).get_calibrated_size(
+                bandit_arm.table_name, bandit_arm.estimated_memory)
+
+
 def gen_arms_from_predicates_single(connection, query_obj):
     """
     This method take predicates (a dictionary of lists) as input and creates the generate arms for all possible
@@ -155,7 +561,7 @@ def gen_arms_from_predicates_single(connection, query_obj):
             table_predicates = table_predicates[0:6]
         col_permutations = col_permutations + list(itertools.permutations(table_predicates, 1))
         for col_permutation in col_permutations:
-            arm_id = BanditArm.get_arm_id(col_permutation, table_name)
+            arm_id = BanditArm.find_arm_id(col_permutation, table_name)
             table_row_count = table.table_row_count
             arm_value = (1 - query_obj.selectivity[table_name]) * (
                         len(col_permutation) / len(table_predicates)) * table_row_count
@@ -168,7 +574,7 @@ def gen_arms_from_predicates_single(connection, query_obj):
                 else:
                     bandit_arm.arm_value[query_id] = arm_value
             else:
-                size = sql_helper.get_estimated_size_of_index_v1(connection, constants.SCHEMA_NAME,
+                size = sql_helper.get_estimated_size_of_index_v2(connection, constants.SCHEMA_NAME,
                                                                  table_name, col_permutation)
                 bandit_arm = BanditArm(col_permutation, table_name, size, table_row_count)
                 bandit_arm.query_id = query_id
@@ -177,9 +583,9 @@ def gen_arms_from_predicates_single(connection, query_obj):
                     if len(includes) == 0:
                         bandit_arm.is_include = 1
                 bandit_arm.arm_value[query_id] = arm_value
-                bandit_arm_store[arm_id] = bandit_arm
-            if bandit_arm not in bandit_arms:
-                bandit_arms[arm_id] = bandit_arm
+                bandit_arm_store[bandit_arm.arm_id] = bandit_arm
+            if bandit_arm.arm_id not in bandit_arms:
+                bandit_arms[bandit_arm.arm_id] = bandit_arm
                 # print(arm_id)
 
     return bandit_arms
@@ -196,7 +602,7 @@ def get_predicate_position(arm, predicate, table_name):
     :return: float [0, 1]
     """
     for i in range(len(arm.index_cols)):
-        if table_name == arm.table_name and predicate == arm.index_cols[i]:
+        if table_name in arm.base_tables and predicate == arm.index_cols[i]:
             return i
     return -1
 
@@ -213,37 +619,45 @@ def get_context_vector_v2(bandit_arm, all_columns, context_size, uniqueness=0, i
     :param includes: add includes to the arm encode
     :return: a context vector
     """
-    context_vectors = {}
-    for j in range(uniqueness):
-        context_vectors[j] = numpy.zeros((context_size, 1), dtype=float)
-    left_over_context = numpy.zeros((context_size, 1), dtype=float)
-    include_context = numpy.zeros((context_size, 1), dtype=float)
+    if bandit_arm.name_encoded_context is None:
+        bandit_arm.name_encoded_context = get_sparse_context_vector_v2(bandit_arm, all_columns, context_size,
+                                                                       uniqueness, includes)
+    return get_dense_context(bandit_arm.name_encoded_context)
 
-    if len(bandit_arm.name_encoded_context) > 0:
-        context_vector = bandit_arm.name_encoded_context
-    else:
-        i = 0
-        for table_name in all_columns:
-            for k in range(len(all_columns[table_name])):
-                column_position_in_arm = get_predicate_position(bandit_arm, all_columns[table_name][k], table_name)
-                if column_position_in_arm >= 0:
-                    if column_position_in_arm < uniqueness:
-                        context_vectors[column_position_in_arm][i] = 1
-                    else:
-                        left_over_context[i] = 1 / (10 ** column_position_in_arm)
-                elif all_columns[table_name][k] in bandit_arm.include_cols:
-                    include_context[i] = 1
-                i += 1
-
-        full_list = []
-        for j in range(uniqueness):
-            full_list = full_list + list(context_vectors[j])
-        full_list = full_list + list(left_over_context)
-        if includes:
-            full_list = full_list + list(include_context)
-        context_vector = numpy.array(full_list, ndmin=2, dtype=float)
-        bandit_arm.name_encoded_context = context_vector
-    return context_vector
+
+def get_sparse_context_vector_v2(bandit_arm, all_columns, context_size, uniqueness=0, includes=False):
+    """
+    Sparse version of the context vector of get_context_vector_v2. Only the columns of the arm are looked up in the
+    column positions, so the encoding is built in the time of the arm width instead of the number of columns.
+
+    :param bandit_arm: bandit arm
+    :param all_columns: predicate dict(list)
+    :param context_size: size of the context vector
+    :param uniqueness: how many columns in the index to consider when considering the context
+    :param includes: add includes to the arm encode
+    :return: SparseContext
+    """
+    column_positions = get_column_positions(all_columns)
+    left_over_offset = uniqueness * context_size
+    entries = {}
+    key_positions = set()
+    for column_position_in_arm, column_name in enumerate(bandit_arm.index_cols):
+        for table_name in bandit_arm.base_tables:
+            i = column_positions.get((table_name, column_name))
+            if i is None or i in key_positions:
+                continue
+            key_positions.add(i)
+            if column_position_in_arm < uniqueness:
+                entries[column_position_in_arm * context_size + i] = 1
+            else:
+                entries[left_over_offset + i] = 1 / (10 ** column_position_in_arm)
+    if includes:
+        for column_name in bandit_arm.include_cols:
+            for table_name in bandit_arm.base_tables:
+                i = column_positions.get((table_name, column_name))
+                if i is not None and i not in key_positions:
+                    entries[left_over_offset + context_size + i] = 1
+    return get_sparse_context(entries, (uniqueness + 1 + includes) * context_size)
 
 
 def get_name_encode_context_vectors_v2(bandit_arm_dict, all_columns, context_size, uniqueness=0, includes=False):
@@ -279,41 +693,72 @@ def get_derived_value_context_vectors_v3(connection, bandit_arm_dict, query_obj_
     """
     context_vectors = []
     database_size = sql_helper.get_database_size(connection)
+    if constants.CONTEXT_SPILLS:
+        total_spill_pages = sum(sum(query_obj.spill_pages.values()) for query_obj in query_obj_list)
+        total_memory_grant = sum(query_obj.memory_grant for query_obj in query_obj_list)
     for key, bandit_arm in bandit_arm_dict.items():
         keys_last_round = set(chosen_arms_last_round.keys())
-        if bandit_arm.index_name not in keys_last_round:
+        if bandit_arm.arm_id not in keys_last_round:
             index_size = bandit_arm.memory
         else:
             index_size = 0
-        context_vector = numpy.array([
+        context = [
             bandit_arm.index_usage_last_batch,
             index_size/database_size,
             bandit_arm.is_include if with_includes else 0
-        ], ndmin=2).transpose()
+        ]
+        if constants.CONTEXT_SPILLS:
+            spill_pages, memory_grant = get_spill_context(bandit_arm, query_obj_list)
+            context.append(spill_pages/total_spill_pages if total_spill_pages else 0)
+            context.append(memory_grant/total_memory_grant if total_memory_grant else 0)
+        if constants.COLUMNSTORE_INDEXES:
+            context.append(int(bandit_arm.index_type == constants.INDEX_TYPE_COLUMNSTORE))
+        if constants.INDEXED_VIEWS:
+            context.append(int(bandit_arm.index_type == constants.INDEX_TYPE_VIEW))
+        if constants.INDEX_COMPRESSION:
+            context.extend(int(bandit_arm.compression == compression)
+                           for compression in constants.INDEX_COMPRESSION_TYPES)
+        context_vector = numpy.array(context, ndmin=2).transpose()
         context_vectors.append(context_vector)
 
     return context_vectors
 
 
+def get_spill_context(bandit_arm, query_obj_list):
+    """
+    Pages spilled to tempdb on the table of the arm and the memory granted, in the last executions of the queries the
+    arm was generated for. An index that gives the order or reduces the input can remove these spills.
+
+    :param bandit_arm: bandit arm
+    :param query_obj_list: list of queries
+    :return: spilled pages, memory grant (KB)
+    """
+    spill_pages = 0
+    memory_grant = 0
+    for query_obj in query_obj_list:
+        if query_obj.id in bandit_arm.query_ids:
+            spill_pages += query_obj.spill_pages.get(bandit_arm.table_name, 0)
+            memory_grant += query_obj.memory_grant
+    return spill_pages, memory_grant
+
+
 def get_query_context_v1(query_object, all_columns, context_size):
     """
-    Return the context vectors for a given query.
+    Return the context vector for a given query, as a SparseContext (get_dense_context gives the vector).
     each entry is 1 if the column in indexable otherwise 0
 
     :param query_object: query object
     :param all_columns: columns in database
     :param context_size: size of the context
-    :return: list of context vectors
+    :return: SparseContext
     """
-    context_vector = numpy.zeros((context_size, 1), dtype=float)
-    if query_object.context is not None:
-        context_vector = query_object.context
-    else:
-        i = 0
-        for table_name in all_columns:
-            for k in range(len(all_columns[table_name])):
-                context_vector[i] = 1 if table_name in query_object.predicates and all_columns[table_name][k] in \
-                                         query_object.predicates[table_name] else 0
-                i += 1
-        query_object.context = context_vector
-    return context_vector
+    if query_object.context is None:
+        column_positions = get_column_positions(all_columns)
+        entries = {}
+        for table_name, table_predicates in query_object.predicates.items():
+            for column_name in table_predicates:
+                i = column_positions.get((table_name, column_name))
+                if i is not None:
+                    entries[i] = 1
+        query_object.context = get_sparse_context(entries, context_size)
+    return query_object.context
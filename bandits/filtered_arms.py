@@ -0,0 +1,126 @@
+import re
+from collections import Counter, deque
+
+# literal: CAST('...' AS type), a quoted string or a number, not followed by arithmetic. A number is matched as a
+# whole, so it can't backtrack to a shorter number that isn't followed by the arithmetic.
+LITERAL = (r"(?:CAST\s*\(\s*'([^']*)'\s+AS\s+\w+(?:\s*\([^)]*\))?\s*\)|'((?:[^']|'')*)'|(-?\d+(?:\.\d+)?)(?![\d.]))"
+           r"(?!\s*[-+*/%])")
+COMPARISON_PATTERN = re.compile(r"(?<![\w.'])(?:\w+\.)?(\w+)\s*(<=|>=|<>|!=|=|<|>)\s*" + LITERAL, re.IGNORECASE)
+BETWEEN_PATTERN = re.compile(r"(?<![\w.'])(?:\w+\.)?(\w+)\s+BETWEEN\s+" + LITERAL + r"\s+AND\s+" + LITERAL,
+                             re.IGNORECASE)
+OR_PATTERN = re.compile(r"\bOR\b", re.IGNORECASE)
+
+
+class LiteralStats:
+    """
+    Literal predicates of the last instances of each query. The most frequent literal predicates of a query on a
+    column give the filters of the filtered index arms.
+    """
+
+    def __init__(self, history_length):
+        """
+        :param history_length: number of instances of a query that are kept
+        """
+        self.history_length = history_length
+        # query id -> last instances of the query, each a dictionary of (table, column) -> literal terms
+        self.query_instances = {}
+
+    def add_query(self, query_id, query_string, predicates):
+        """
+        :param query_id: query id
+        :param query_string: query string of this instance of the query
+        :param predicates: predicates of the query, dictionary of table name to predicate columns
+        """
+        instances = self.query_instances.get(query_id)
+        if instances is None:
+            instances = deque(maxlen=self.history_length)
+            self.query_instances[query_id] = instances
+        instances.append(get_literal_terms(query_string, predicates))
+
+    def get_frequent_filters(self, query_id, min_count, min_share):
+        """
+        Most frequent literal terms of the query per table. The terms of all the columns of a table in an instance are
+        counted together, so the share is the share of the instances that have all the terms of the filter.
+
+        :param query_id: query id
+        :param min_count: minimum number of instances with the same terms
+        :param min_share: minimum share of the instances with the same terms
+        :return: dictionary of table name to (filter terms, share of the instances with these terms), filter terms
+            are a tuple of (column, operator, literal)
+        """
+        instances = self.query_instances.get(query_id)
+        if not instances:
+            return {}
+        table_terms = {}
+        for instance in instances:
+            instance_table_terms = {}
+            for (table_name, _), terms in sorted(instance.items()):
+                instance_table_terms[table_name] = instance_table_terms.get(table_name, ()) + terms
+            for table_name, terms in instance_table_terms.items():
+                table_terms.setdefault(table_name, Counter())[terms] += 1
+        table_filters = {}
+        for table_name, term_counts in sorted(table_terms.items()):
+            terms, count = max(term_counts.items(), key=lambda term_count: (term_count[1], term_count[0]))
+            if count >= min_count and count / len(instances) >= min_share:
+                table_filters[table_name] = (terms, count / len(instances))
+        return table_filters
+
+def get_literal_terms(query_string, predicates):
+    """
+    Comparisons of the predicate columns with literals in a query. Only a single comparison or a lower and an upper
+    bound are kept for a column, and queries with OR are skipped, as their terms can not be used as a conjunction.
+
+    :param query_string: query string
+    :param predicates: predicates of the query, dictionary of table name to predicate columns
+    :return: dictionary of (table name, column name) to a sorted tuple of (column, operator, literal) terms, the
+        literal is the SQL text of the constant
+    """
+    if OR_PATTERN.search(query_string):
+        return {}
+    column_tables = {}
+    for table_name, table_predicates in predicates.items():
+        for column_name in table_predicates:
+            column_tables[column_name.upper()] = (table_name, column_name)
+    literal_terms = {}
+    for match in COMPARISON_PATTERN.finditer(query_string):
+        column_key = column_tables.get(match.group(1).upper())
+        if column_key is not None:
+            operator = '<>' if match.group(2) == '!=' else match.group(2)
+            literal_terms.setdefault(column_key, set()).add((column_key[1], operator, get_literal(match.groups()[2:])))
+    for match in BETWEEN_PATTERN.finditer(query_string):
+        column_key = column_tables.get(match.group(1).upper())
+        if column_key is not None:
+            literal_terms.setdefault(column_key, set()).update(
+                [(column_key[1], '>=', get_literal(match.groups()[1:4])),
+                 (column_key[1], '<=', get_literal(match.groups()[4:7]))])
+    return {column_key: tuple(sorted(terms)) for column_key, terms in literal_terms.items() if is_range(terms)}
+
+
+def is_range(terms):
+    """
+    :param terms: set of (column, operator, literal) on a column
+    :return: True if the terms are a single comparison or a lower and an upper bound
+    """
+    if len(terms) == 1:
+        return True
+    operators = {operator for _, operator, _ in terms}
+    return len(terms) == 2 and len(operators & {'<', '<='}) == 1 and len(operators & {'>', '>='}) == 1
+
+
+def get_literal(literal_groups):
+    """
+    :param literal_groups: (cast string, string, number) groups of the LITERAL pattern
+    :return: SQL text of the literal, strings are quoted
+    """
+    cast_string, string, number = literal_groups
+    if number is not None:
+        return number
+    return "'" + (cast_string if cast_string is not None else string) + "'"
+
+
+def get_filter_predicate(filter_terms):
+    """
+    :param filter_terms: tuple of (column, operator, literal)
+    :return: filter predicate of the index
+    """
+    return ' AND '.join(f"{column_name} {operator} {literal}" for column_name, operator, literal in filter_terms)
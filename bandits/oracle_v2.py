@@ -41,10 +41,28 @@ class BaseOracle:
         """
         reduced_arm_ucb_dict = {}
         for arm_id in arm_ucb_dict:
-            if not (bandit_arms[arm_id] <= bandit_arms[chosen_id] or bandit_arms[arm_id].memory > remaining_memory):
+            if not (BaseOracle.is_covered(bandit_arms[arm_id], bandit_arms[chosen_id]) or
+                    bandit_arms[arm_id].memory > remaining_memory):
                 reduced_arm_ucb_dict[arm_id] = arm_ucb_dict[arm_id]
         return reduced_arm_ucb_dict
 
+    @staticmethod
+    def is_covered(arm, chosen_arm):
+        """
+        Rowstore arms are covered by a rowstore arm with their key as a prefix. The columns of a columnstore arm are not
+        ordered, so a columnstore arm is covered by a columnstore arm of the same table with all its columns.
+
+        :param arm: bandit arm
+        :param chosen_arm: chosen bandit arm
+        :return: boolean
+        """
+        if arm.index_type == constants.INDEX_TYPE_ROWSTORE and chosen_arm.index_type == constants.INDEX_TYPE_ROWSTORE:
+            return arm <= chosen_arm
+        if (arm.index_type == constants.INDEX_TYPE_COLUMNSTORE and
+                chosen_arm.index_type == constants.INDEX_TYPE_COLUMNSTORE):
+            return arm.table_name == chosen_arm.table_name and set(arm.index_cols) <= set(chosen_arm.index_cols)
+        return False
+
     @staticmethod
     def removed_covered_tables(arm_ucb_dict, chosen_id, bandit_arms, table_count):
         """
@@ -116,7 +134,7 @@ class BaseOracle:
     @staticmethod
     def removed_same_prefix(arm_ucb_dict, chosen_id, bandit_arms, prefix_length):
         """
-        One index for one query for table
+        One index for one query for table, only rowstore arms are compared as the other arms have no key order
         :param arm_ucb_dict: dictionary of arms and upper confidence bounds
         :param chosen_id: chosen arm in this round
         :param bandit_arms: Bandit arm list
@@ -124,11 +142,13 @@ class BaseOracle:
         :return: reduced arm list
         """
         reduced_arm_ucb_dict = {}
-        if len(bandit_arms[chosen_id].index_cols) < prefix_length:
+        if (len(bandit_arms[chosen_id].index_cols) < prefix_length or
+                bandit_arms[chosen_id].index_type != constants.INDEX_TYPE_ROWSTORE):
             return arm_ucb_dict
         else:
             for arm_id in arm_ucb_dict:
                 if (bandit_arms[arm_id].table_name == bandit_arms[chosen_id].table_name and
+                        bandit_arms[arm_id].index_type == constants.INDEX_TYPE_ROWSTORE and
                         len(bandit_arms[arm_id].index_cols) > prefix_length):
                     for i in range(prefix_length):
                         if bandit_arms[arm_id].index_cols[i] != bandit_arms[chosen_id].index_cols[i]:
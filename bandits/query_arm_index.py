@@ -0,0 +1,122 @@
+class QueryArmIndex:
+    """
+    Keeps the arms generated for each query across rounds. Arms of a query are generated again only when its
+    predicates or payload change (or one of its arms was evicted from the arm store), and the set of active arms is
+    updated as queries enter or leave the query window.
+    """
+
+    def __init__(self, arm_generator, arm_store, arm_spec_generator=None):
+        """
+        :param arm_generator: arm generation method, e.g. gen_arms_from_predicates_v3. When arm_spec_generator is given,
+            this is the method that builds the arms from the arm specs of a query, e.g. get_bandit_arms
+        :param arm_store: arm store used by the arm generator
+        :param arm_spec_generator: optional method that gives the arm specs of a batch of queries, e.g.
+            get_arm_specs_batch. The specs of all the queries that need new arms are generated together.
+        """
+        self.arm_generator = arm_generator
+        self.arm_store = arm_store
+        self.arm_spec_generator = arm_spec_generator
+        # query id -> (predicate/payload signature, ids of the generated arms)
+        self.query_arms = {}
+        # active queries with query id as the key
+        self.active_queries = {}
+        # arm id -> arm, for the arms of the active queries
+        self.active_arms = {}
+        # arm id -> ids of the active queries that generated the arm
+        self.arm_query_ids = {}
+
+    def has_arms(self, query_obj):
+        """
+        :param query_obj: Query object
+        :return: True if the arms of the query don't need to be generated again
+        """
+        query_arms = self.query_arms.get(query_obj.id)
+        return query_arms is not None and query_arms[0] == get_query_signature(query_obj) and all(
+            arm_id in self.arm_store for arm_id in query_arms[1])
+
+    def get_arms(self, connection, query_obj, arm_specs=None):
+        """
+        Returns the arms of the query, arms are generated only for new or changed queries
+
+        :param connection: SQL connection
+        :param query_obj: Query object
+        :param arm_specs: arm specs of the query if they are already generated
+        :return: dictionary of bandit arms with arm id as the key
+        """
+        if self.has_arms(query_obj):
+            return {arm_id: self.arm_store[arm_id] for arm_id in self.query_arms[query_obj.id][1]}
+        if self.arm_spec_generator is None:
+            bandit_arms = self.arm_generator(connection, query_obj)
+        else:
+            if arm_specs is None:
+                arm_specs = self.arm_spec_generator(connection, [query_obj])[0]
+            bandit_arms = self.arm_generator(connection, query_obj.id, arm_specs)
+        self.query_arms[query_obj.id] = (get_query_signature(query_obj), tuple(bandit_arms.keys()))
+        return bandit_arms
+
+    def set_active_queries(self, connection, query_obj_list):
+        """
+        Updates the active arms for the given set of queries. Only the queries that entered or left the set (or
+        changed) are processed.
+
+        :param connection: SQL connection
+        :param query_obj_list: queries in the current query window
+        """
+        query_objs = {query_obj.id: query_obj for query_obj in query_obj_list}
+        for query_id in list(self.active_queries.keys()):
+            if query_id not in query_objs or self.query_arms[query_id][0] != get_query_signature(
+                    query_objs[query_id]):
+                self.remove_query(query_id)
+        arm_specs = {}
+        if self.arm_spec_generator is not None:
+            new_query_objs = [query_obj for query_id, query_obj in query_objs.items()
+                              if query_id not in self.active_queries and not self.has_arms(query_obj)]
+            if new_query_objs:
+                arm_specs = dict(zip((query_obj.id for query_obj in new_query_objs),
+                                     self.arm_spec_generator(connection, new_query_objs)))
+        for query_id, query_obj in query_objs.items():
+            if query_id not in self.active_queries:
+                self.add_query(connection, query_obj, arm_specs.get(query_id))
+            self.active_queries[query_id] = query_obj
+        # active arms should not be evicted from the arm store
+        self.arm_store.touch(self.active_arms)
+
+    def add_query(self, connection, query_obj, arm_specs=None):
+        """
+        :param connection: SQL connection
+        :param query_obj: query that entered the query window
+        :param arm_specs: arm specs of the query if they are already generated
+        """
+        self.active_queries[query_obj.id] = query_obj
+        for arm_id, bandit_arm in self.get_arms(connection, query_obj, arm_specs).items():
+            if arm_id not in self.active_arms:
+                self.active_arms[arm_id] = bandit_arm
+                self.arm_query_ids[arm_id] = set()
+            self.arm_query_ids[arm_id].add(query_obj.id)
+
+    def remove_query(self, query_id):
+        """
+        Arms that are not used by any other active query are removed from the active arms. Arms stay in the arm store
+        for when the query comes back.
+
+        :param query_id: id of the query that left the query window
+        """
+        del self.active_queries[query_id]
+        for arm_id in self.query_arms[query_id][1]:
+            self.arm_query_ids[arm_id].discard(query_id)
+            if not self.arm_query_ids[arm_id]:
+                del self.arm_query_ids[arm_id]
+                del self.active_arms[arm_id]
+
+
+def get_query_signature(query_obj):
+    """
+    Signature of the predicates and payload of a query, arms are generated again when this changes
+
+    :param query_obj: Query object
+    :return: hashable signature
+    """
+    return (tuple((table_name, tuple(table_predicates.items()) if isinstance(table_predicates, dict) else tuple(
+        table_predicates)) for table_name, table_predicates in sorted(query_obj.predicates.items())),
+            tuple((table_name, tuple(table_payloads)) for table_name, table_payloads in sorted(
+                query_obj.payload.items())))
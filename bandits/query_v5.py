@@ -24,6 +24,14 @@ class Query:
         self.index_scan_times = sql_helper.get_table_scan_times_structure()
         self.table_scan_times_hyp = sql_helper.get_table_scan_times_structure()
         self.index_scan_times_hyp = sql_helper.get_table_scan_times_structure()
+        self.sort_times = sql_helper.get_table_scan_times_structure()
+        # tempdb spills (pages per table) and memory grant (KB) of the last execution
+        self.spill_pages = {}
+        self.memory_grant = 0
+        # plan of the last execution and the measured costs of that plan, used to skip executions
+        self.last_plan = None
+        self.last_plan_costs = []
+        self.skipped_executions = 0
         self.context = None
 
     def __hash__(self):
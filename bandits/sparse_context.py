@@ -0,0 +1,49 @@
+from collections import namedtuple
+
+import numpy
+
+# Context vector of the given size with only the non zero entries, indices and values are numpy arrays
+SparseContext = namedtuple('SparseContext', ['indices', 'values', 'size'])
+
+# id of all_columns -> (all_columns, dictionary of (table name, column name) to the position of the column)
+column_position_store = {}
+
+
+def get_column_positions(all_columns):
+    """
+    Position of each column in the name encoded contexts, columns are numbered in the order of all_columns. The
+    positions are built once for the columns of the database.
+
+    :param all_columns: dictionary of table name to the list of its columns (from get_all_columns)
+    :return: dictionary of (table name, column name) to position
+    """
+    stored = column_position_store.get(id(all_columns))
+    if stored is not None and stored[0] is all_columns:
+        return stored[1]
+    column_positions = {}
+    for table_name in all_columns:
+        for column_name in all_columns[table_name]:
+            column_positions[(table_name, column_name)] = len(column_positions)
+    column_position_store[id(all_columns)] = (all_columns, column_positions)
+    return column_positions
+
+
+def get_sparse_context(entries, size):
+    """
+    :param entries: dictionary of position to value
+    :param size: size of the context vector
+    :return: SparseContext with the entries in the order of their positions
+    """
+    indices = numpy.array(sorted(entries), dtype=numpy.int64)
+    values = numpy.array([entries[index] for index in indices], dtype=float)
+    return SparseContext(indices, values, size)
+
+
+def get_dense_context(sparse_context):
+    """
+    :param sparse_context: SparseContext
+    :return: (size, 1) context vector
+    """
+    context_vector = numpy.zeros((sparse_context.size, 1), dtype=float)
+    context_vector[sparse_context.indices, 0] = sparse_context.values
+    return context_vector
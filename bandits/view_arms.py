@@ -0,0 +1,199 @@
+import re
+from collections import namedtuple
+
+from bandits.arm_registry import get_checksum
+
+# Join-aggregate pattern of a query: base tables, join column pairs, group by columns of the view (the group by
+# columns of the query and the columns the query filters on) and the expressions the query sums or averages
+ViewPattern = namedtuple('ViewPattern', ['tables', 'joins', 'group_cols', 'aggregates'])
+
+QUERY_PATTERN = re.compile(r'^select (?P<select>.*?) from (?P<from>.*?)(?: where (?P<where>.*?))?'
+                           r'(?: group by (?P<group>.*?))?(?: order by (?P<order>.*))?$')
+# constructs that can not be in an indexed view, or that would change the result of the view
+UNSUPPORTED_PATTERN = re.compile(r'\b(?:join|union|exists|distinct|top|with|having|over|min|max|stdev|var|'
+                                 r'count_big)\b')
+AGGREGATE_PATTERN = re.compile(r'\b(sum|avg|count)\s*\(')
+JOIN_PATTERN = re.compile(r'^(?:\w+\.)?(\w+)\s*=\s*(?:\w+\.)?(\w+)$')
+IDENTIFIER_PATTERN = re.compile(r'(?<![\w.])(?:\w+\.)?([a-z_][a-z0-9_]*)\b')
+STRING_PATTERN = re.compile(r"'(?:[^']|'')*'")
+
+
+def get_view_pattern(query_string, table_names, column_tables):
+    """
+    Join-aggregate pattern of a query, for queries that an indexed view can answer: a single aggregating SELECT over a
+    comma separated list of distinct tables connected by equi-joins, aggregating with SUM, AVG and COUNT(*) only.
+
+    :param query_string: query string
+    :param table_names: dictionary of upper case table name to table name
+    :param column_tables: dictionary of upper case column name to (table name, column name), for the column names
+        that are unique in the database
+    :return: ViewPattern, None if the query does not fit an indexed view
+    """
+    query = ' '.join(query_string.split()).lower().rstrip(';').strip()
+    if query.count('select') != 1 or UNSUPPORTED_PATTERN.search(query):
+        return None
+    match = QUERY_PATTERN.match(query)
+    if match is None:
+        return None
+
+    tables = set()
+    for table_reference in match.group('from').split(','):
+        table_name = table_names.get(table_reference.split()[0].upper()) if table_reference.split() else None
+        if table_name is None or table_name in tables:
+            return None
+        tables.add(table_name)
+
+    joins = set()
+    view_columns = set()
+    for conjunct in get_conjuncts(match.group('where') or ''):
+        join_match = JOIN_PATTERN.match(conjunct)
+        if join_match is not None:
+            join_columns = [column_tables.get(column_name.upper()) for column_name in join_match.groups()]
+            if None not in join_columns and join_columns[0][0] != join_columns[1][0]:
+                joins.add(tuple(sorted(join_columns)))
+                continue
+        # the view keeps the filter columns as group by columns, so the filters of the query can be applied to it
+        view_columns.update(get_columns(conjunct, column_tables))
+    group_by = match.group('group')
+    for group_column in group_by.split(',') if group_by else []:
+        column_match = IDENTIFIER_PATTERN.fullmatch(group_column.strip())
+        if column_match is None or column_match.group(1).upper() not in column_tables:
+            return None
+        view_columns.add(column_tables[column_match.group(1).upper()])
+
+    aggregates = set()
+    select = match.group('select')
+    if group_by is None and not AGGREGATE_PATTERN.search(select):
+        return None
+    for aggregate_match in AGGREGATE_PATTERN.finditer(select):
+        expression = get_parenthesized(select, aggregate_match.end() - 1)
+        if expression is None:
+            return None
+        if aggregate_match.group(1) == 'count':
+            if expression.strip() != '*':
+                return None
+            continue
+        aggregate = get_aggregate_expression(expression, column_tables)
+        if aggregate is None:
+            return None
+        aggregates.add(aggregate)
+
+    if not view_columns or any(table_name not in tables for table_name, _ in view_columns) or not is_connected(
+            tables, joins):
+        return None
+    return ViewPattern(tuple(sorted(tables)), tuple(sorted(joins)), tuple(sorted(view_columns)),
+                       tuple(sorted(aggregates)))
+
+
+def get_conjuncts(where_clause):
+    """
+    :param where_clause: WHERE clause of a query
+    :return: list of the top level AND terms, BETWEEN ... AND ... is kept in one term
+    """
+    conjuncts = []
+    depth = 0
+    is_between = False
+    start = 0
+    for token in re.finditer(r"\(|\)|\bbetween\b|\band\b|'(?:[^']|'')*'", where_clause):
+        if token.group() == '(':
+            depth += 1
+        elif token.group() == ')':
+            depth -= 1
+        elif token.group() == 'between' and depth == 0:
+            is_between = True
+        elif token.group() == 'and' and depth == 0:
+            if is_between:
+                is_between = False
+            else:
+                conjuncts.append(where_clause[start:token.start()].strip())
+                start = token.end()
+    conjuncts.append(where_clause[start:].strip())
+    return [conjunct for conjunct in conjuncts if conjunct]
+
+
+def get_columns(expression, column_tables):
+    """
+    :param expression: SQL expression
+    :param column_tables: dictionary of upper case column name to (table name, column name)
+    :return: set of (table name, column name) of the columns in the expression
+    """
+    expression = STRING_PATTERN.sub("''", expression)
+    return {column_tables[identifier.upper()] for identifier in IDENTIFIER_PATTERN.findall(expression)
+            if identifier.upper() in column_tables}
+
+
+def get_parenthesized(text, position):
+    """
+    :param text: text
+    :param position: position of an opening parenthesis
+    :return: text between the parenthesis and its matching closing parenthesis, None if it is not closed
+    """
+    depth = 0
+    for i in range(position, len(text)):
+        if text[i] == '(':
+            depth += 1
+        elif text[i] == ')':
+            depth -= 1
+            if depth == 0:
+                return text[position + 1:i]
+    return None
+
+
+def get_aggregate_expression(expression, column_tables):
+    """
+    :param expression: expression of a SUM or AVG
+    :param column_tables: dictionary of upper case column name to (table name, column name)
+    :return: expression with the database column names, None if it has anything but columns, numbers and arithmetic
+    """
+    if not re.fullmatch(r'[\w\s.+\-*/()]+', expression):
+        return None
+    identifiers = IDENTIFIER_PATTERN.findall(expression)
+    if not identifiers or any(identifier.upper() not in column_tables for identifier in identifiers):
+        return None
+    return ' '.join(IDENTIFIER_PATTERN.sub(lambda column_match: column_tables[column_match.group(1).upper()][1],
+                                           expression).split())
+
+
+def is_connected(tables, joins):
+    """
+    :param tables: set of table names
+    :param joins: set of ((table name, column name), (table name, column name)) join pairs
+    :return: True if the joins connect all the tables
+    """
+    connected = {next(iter(tables))}
+    is_extended = True
+    while is_extended:
+        is_extended = False
+        for (left_table, _), (right_table, _) in joins:
+            if (left_table in connected) != (right_table in connected):
+                connected.update((left_table, right_table))
+                is_extended = True
+    return connected == tables
+
+
+def get_view_name(view_pattern, main_table):
+    """
+    :param view_pattern: ViewPattern
+    :param main_table: largest table of the view, used to make the name readable
+    :return: view name, the same in every process
+    """
+    return 'VW_' + main_table + '_' + get_checksum(repr(view_pattern))
+
+
+def get_view_definition(view_pattern, schema_name):
+    """
+    Select statement of the indexed view, the unique clustered index of the view is on the group by columns
+
+    :param view_pattern: ViewPattern
+    :param schema_name: schema of the base tables
+    :return: select statement
+    """
+    group_cols = ', '.join(f"{table_name}.{column_name}" for table_name, column_name in view_pattern.group_cols)
+    aggregates = ''.join(f"SUM({aggregate}) AS AGG_{i}, " for i, aggregate in enumerate(view_pattern.aggregates))
+    tables = ', '.join(f"{schema_name}.{table_name}" for table_name in view_pattern.tables)
+    definition = f"SELECT {group_cols}, {aggregates}COUNT_BIG(*) AS ROW_COUNT FROM {tables}"
+    if view_pattern.joins:
+        definition += " WHERE " + ' AND '.join(f"{left_table}.{left_column} = {right_table}.{right_column}"
+                                                for (left_table, left_column), (right_table, right_column) in
+                                                view_pattern.joins)
+    return definition + f" GROUP BY {group_cols}"
@@ -0,0 +1,217 @@
+import heapq
+import itertools
+import logging
+import zlib
+
+import numpy
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch, the estimate of a key is never below its count and is above it by at most 2 * total / width with
+    probability 1 - 1 / 2 ^ depth. Keys are hashed with crc32 so the sketch gives the same result in every process.
+    """
+
+    def __init__(self, width, depth):
+        """
+        :param width: number of counters per row
+        :param depth: number of rows (hash functions)
+        """
+        self.width = width
+        self.depth = depth
+        self.counts = numpy.zeros((depth, width), dtype=numpy.float64)
+        self.total = 0
+        self.seeds = [row * 0x9E3779B1 & 0xFFFFFFFF for row in range(depth)]
+
+    def get_positions(self, key):
+        """
+        :param key: hashable key with a deterministic repr
+        :return: counter of the key in each row
+        """
+        key_bytes = repr(key).encode()
+        return [zlib.crc32(key_bytes, seed) % self.width for seed in self.seeds]
+
+    def add(self, key, count=1):
+        """
+        :param key: hashable key with a deterministic repr
+        :param count: count to add
+        :return: estimated count of the key after the addition
+        """
+        estimate = None
+        for row, position in enumerate(self.get_positions(key)):
+            row_counts = self.counts[row]
+            row_counts[position] += count
+            if estimate is None or row_counts[position] < estimate:
+                estimate = row_counts[position]
+        self.total += count
+        return float(estimate)
+
+    def estimate(self, key):
+        return float(min(self.counts[row][position] for row, position in enumerate(self.get_positions(key))))
+
+    def decay(self, factor):
+        self.counts *= factor
+        self.total *= factor
+
+
+class HeavyHitterSketch:
+    """
+    Count-Min sketch with the keys of the capacity highest estimated counts. The heavy hitters are kept in a min heap,
+    an update pushes the new count of the key and the entries with an outdated count are dropped when they reach the
+    top of the heap.
+    """
+
+    def __init__(self, width, depth, capacity):
+        """
+        :param width: width of the Count-Min sketch
+        :param depth: depth of the Count-Min sketch
+        :param capacity: number of heavy hitter keys that are kept
+        """
+        self.sketch = CountMinSketch(width, depth)
+        self.capacity = capacity
+        # key -> estimated count
+        self.heavy_hitters = {}
+        # (estimated count, insertion order, key), entries are outdated if the key has another count in heavy_hitters
+        self.heap = []
+        self.insertion_order = itertools.count()
+
+    def add(self, key, count=1):
+        estimate = self.sketch.add(key, count)
+        if key not in self.heavy_hitters and len(self.heavy_hitters) >= self.capacity:
+            if self.capacity <= 0 or estimate <= self.get_min_count():
+                return
+            _, _, min_key = heapq.heappop(self.heap)
+            del self.heavy_hitters[min_key]
+        self.heavy_hitters[key] = estimate
+        heapq.heappush(self.heap, (estimate, next(self.insertion_order), key))
+        if len(self.heap) > 2 * self.capacity:
+            self.rebuild_heap()
+
+    def get_min_count(self):
+        """
+        :return: lowest estimated count of the heavy hitters, the top of the heap is a current entry after the call
+        """
+        while self.heap and self.heavy_hitters.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else 0
+
+    def rebuild_heap(self):
+        """
+        Drops the outdated entries of the heap
+        """
+        self.heap = [(estimate, next(self.insertion_order), key) for key, estimate in self.heavy_hitters.items()]
+        heapq.heapify(self.heap)
+
+    def get_heavy_hitters(self, min_share):
+        """
+        :param min_share: minimum estimated share of the stream
+        :return: list of (key, estimated count) with the highest counts first
+        """
+        min_count = min_share * self.sketch.total
+        return sorted(((key, count) for key, count in self.heavy_hitters.items() if count >= min_count),
+                      key=lambda heavy_hitter: (-heavy_hitter[1], repr(heavy_hitter[0])))
+
+    def decay(self, factor):
+        self.sketch.decay(factor)
+        for key in self.heavy_hitters:
+            self.heavy_hitters[key] *= factor
+        self.rebuild_heap()
+
+    def get_memory(self):
+        return self.sketch.counts.nbytes + sum(len(repr(key)) for key in self.heavy_hitters)
+
+
+class WorkloadSketch:
+    """
+    Streaming summary of a workload. Keeps Count-Min heavy hitter sketches of the predicate column sets and the payload
+    column sets per table and of the tables that are queried together, so the memory does not grow with the number
+    of queries. Arms are generated for the heavy predicate sets only (see bandit_helper.gen_arms_from_sketch).
+    """
+
+    def __init__(self, width, depth, capacity):
+        """
+        :param width: width of the Count-Min sketches
+        :param depth: depth of the Count-Min sketches
+        :param capacity: number of heavy hitters kept per sketch
+        """
+        self.predicate_sketch = HeavyHitterSketch(width, depth, capacity)
+        self.payload_sketch = HeavyHitterSketch(width, depth, capacity)
+        self.table_sketch = HeavyHitterSketch(width, depth, capacity)
+        self.query_count = 0
+
+    def add_query(self, predicates, payload):
+        """
+        :param predicates: predicates of the query, dictionary of table name to predicate columns
+        :param payload: payload of the query, dictionary of table name to payload columns
+        """
+        self.query_count += 1
+        for table_name, table_predicates in predicates.items():
+            self.predicate_sketch.add(get_predicate_key(table_name, table_predicates))
+        for table_name, table_payloads in payload.items():
+            self.payload_sketch.add((table_name, tuple(sorted(table_payloads))))
+        self.table_sketch.add(tuple(sorted(set(predicates) | set(payload))))
+
+    def get_heavy_predicates(self, min_share):
+        """
+        :param min_share: minimum estimated share of the queries
+        :return: list of ((table name, predicates), estimated count)
+        """
+        return [((table_name, dict(predicates)), count) for (table_name, predicates), count in
+                self.predicate_sketch.get_heavy_hitters(min_share)]
+
+    def get_heavy_payloads(self, min_share):
+        """
+        :param min_share: minimum estimated share of the queries
+        :return: dictionary of table name to its most frequent heavy payload columns
+        """
+        heavy_payloads = {}
+        for (table_name, payload_columns), _ in self.payload_sketch.get_heavy_hitters(min_share):
+            heavy_payloads.setdefault(table_name, list(payload_columns))
+        return heavy_payloads
+
+    def get_heavy_table_sets(self, min_share):
+        """
+        :param min_share: minimum estimated share of the queries
+        :return: list of (tables queried together, estimated count)
+        """
+        return self.table_sketch.get_heavy_hitters(min_share)
+
+    def decay(self, factor):
+        """
+        Ages the counts, called at the end of an interval so the heavy hitters follow the workload
+
+        :param factor: factor between 0 and 1 the counts are multiplied with
+        """
+        for sketch in (self.predicate_sketch, self.payload_sketch, self.table_sketch):
+            sketch.decay(factor)
+
+    def get_stats(self):
+        return {'queries': self.query_count, 'heavy_predicates': len(self.predicate_sketch.heavy_hitters),
+                'heavy_payloads': len(self.payload_sketch.heavy_hitters),
+                'heavy_table_sets': len(self.table_sketch.heavy_hitters),
+                'memory': sum(sketch.get_memory() for sketch in (self.predicate_sketch, self.payload_sketch,
+                                                                 self.table_sketch))}
+
+    def log_stats(self):
+        logging.info(f"Workload sketch: {self.get_stats()}")
+
+
+def get_predicate_key(table_name, table_predicates):
+    """
+    :param table_name: table name
+    :param table_predicates: list of predicate columns or dictionary of column to predicate type
+    :return: hashable key of the predicate column set of the table
+    """
+    if isinstance(table_predicates, dict):
+        return table_name, tuple(sorted(table_predicates.items()))
+    return table_name, tuple((column_name, None) for column_name in sorted(table_predicates))
+
+
+def get_sketch_query_id(predicate_key):
+    """
+    Id of the pseudo query of a heavy predicate set, negative so it does not collide with the workload query ids
+
+    :param predicate_key: key from get_predicate_key
+    :return: integer id, the same in every process
+    """
+    return -(zlib.crc32(repr(predicate_key).encode()) + 1)
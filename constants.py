@@ -6,19 +6,90 @@ DB_CONFIG = '/config/db.conf'
 # DB_CONFIG = '/config/tpch_db.conf'
 EXPERIMENT_FOLDER = '/experiments'
 WORKLOADS_FOLDER = '/resources/workloads'
+PLAN_CORPUS_FOLDER = '/resources/plans'
 # EXPERIMENT_CONFIG = '\config\exp.conf'
 EXPERIMENT_CONFIG = '/config/exp.conf'
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGGING_LEVEL = logging.INFO
 
 TABLE_SCAN_TIME_LENGTH = 1000
+PLAN_CACHE_SIZE = 2000
+PLAN_PARSE_WORKERS = 0
+# Reuse the last measured plan of a query when its estimated plan hash didn't change since the last execution
+EXECUTION_SKIPPING = False
+# measured costs of the same plan needed before skipping, and their max coefficient of variation
+EXECUTION_HISTORY_LENGTH = 3
+EXECUTION_VARIANCE_BOUND = 0.1
+# a query is executed again after this many consecutive skips
+EXECUTION_REFRESH_ROUNDS = 5
 
 # ===============================  Database / Workload  ===============================
 SCHEMA_NAME = 'dbo'
+# INSERT, UPDATE, DELETE and MERGE statements of the workload are rolled back after their plan is read, so each round
+# runs on the same data. The cost of maintaining an index in the DML plans is taken off the reward of its arm
+DML_ROLLBACK = True
+DML_MAINTENANCE_COST = False
 
 # ===============================  Arm Generation Heuristics  ===============================
 INDEX_INCLUDES = 1
 MAX_PERMUTATION_LENGTH = 2
+MAX_KEY_COLUMNS = 6
+# Max number of arms kept in the arm store (0 for no limit), the least valuable of the ARM_STORE_EVICTION_SAMPLE least
+# recently used arms is evicted
+ARM_STORE_CAPACITY = 20000
+ARM_STORE_EVICTION_SAMPLE = 8
+# Worker processes that generate the arms of new queries, 0 to generate them in the main process
+ARM_GENERATION_WORKERS = 0
+# Scale the estimated index sizes by per-table correction factors learned from the sizes of the built indexes, tables
+# with few builds lean on the factor of all tables (SIZE_MODEL_PRIOR_WEIGHT is the weight of that factor)
+SIZE_MODEL_CALIBRATION = False
+SIZE_MODEL_PRIOR_WEIGHT = 2
+# Merge arms with prefix compatible keys on the same table (with the union of their includes) before they are given
+# to the bandit, merged arms have at most CONSOLIDATION_MAX_COLUMNS key and include columns
+ARM_CONSOLIDATION = False
+CONSOLIDATION_MAX_COLUMNS = 16
+# Workload sketch for high volume query streams, arms are generated for the heavy hitters of the sketch instead of per
+# query: Count-Min width and depth, heavy hitters kept per sketch, the share of the stream a predicate set needs to get
+# arms, and the decay of the counts at the end of each round
+WORKLOAD_SKETCH = False
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+SKETCH_HEAVY_HITTERS = 500
+SKETCH_MIN_SHARE = 0.005
+SKETCH_DECAY = 0.5
+# Two level arm hierarchy, composite and covering arms are only given to the bandit under the HIERARCHY_TOP_COLUMNS
+# most promising columns of each table (column UCB with HIERARCHY_ALPHA exploration)
+ARM_HIERARCHY = False
+HIERARCHY_TOP_COLUMNS = 2
+HIERARCHY_ALPHA = 1
+# Retire arms that were not used in a plan after RETIREMENT_UNUSED_PLAYS plays or are dominated by a used arm
+ARM_RETIREMENT = False
+RETIREMENT_UNUSED_PLAYS = 3
+# Filtered index arms for the literal predicates seen in at least FILTERED_INDEX_MIN_COUNT and FILTERED_INDEX_MIN_SHARE
+# of the last FILTERED_INDEX_HISTORY instances of a query
+FILTERED_INDEXES = False
+FILTERED_INDEX_HISTORY = 20
+FILTERED_INDEX_MIN_COUNT = 3
+FILTERED_INDEX_MIN_SHARE = 0.25
+# Nonclustered columnstore arms over the columns the queries read, on tables with at least COLUMNSTORE_MIN_ROWS rows.
+# Their size is the data width of the columns over COLUMNSTORE_COMPRESSION_RATIO
+COLUMNSTORE_INDEXES = False
+COLUMNSTORE_MIN_ROWS = 1000000
+COLUMNSTORE_COMPRESSION_RATIO = 5
+# Indexed view arms for the join-aggregate queries run at least VIEW_MIN_FREQUENCY times in a round, views estimated
+# to have more than VIEW_MAX_ROW_SHARE of the rows of their largest table are not generated. The optimizer only matches
+# indexed views to queries on its own in the Enterprise and Developer editions
+INDEXED_VIEWS = False
+VIEW_MIN_FREQUENCY = 2
+VIEW_MAX_ROW_SHARE = 0.1
+# ROW and PAGE compressed variants of the rowstore arms of at least COMPRESSION_MIN_SIZE MB, sized with the compression
+# ratio sp_estimate_data_compression_savings gives for their table
+INDEX_COMPRESSION = False
+INDEX_COMPRESSION_TYPES = ('ROW', 'PAGE')
+COMPRESSION_MIN_SIZE = 100
+INDEX_TYPE_ROWSTORE = 'rowstore'
+INDEX_TYPE_COLUMNSTORE = 'columnstore'
+INDEX_TYPE_VIEW = 'view'
 SMALL_TABLE_IGNORE = 10000
 TABLE_MIN_SELECTIVITY = 0.2
 PREDICATE_MIN_SELECTIVITY = 0.01
@@ -33,16 +104,29 @@ STOP_EXPLORATION_ROUND = 500
 UNIFORM_ASSUMPTION_START = 10
 
 # ===============================  Reward Related  ===============================
+# Cost types are also the position of the cost in the plan usage tuples. The time cost types are all in seconds (the
+# CPU time of an operator is its share of the statement CPU time by estimated cost)
 COST_TYPE_ELAPSED_TIME = 1
 COST_TYPE_CPU_TIME = 2
 COST_TYPE_SUB_TREE_COST = 3
+COST_TYPE_LOGICAL_READS = 6
+# ActualCPUms and ActualElapsedms summed over the threads, these account for the cores used by parallel plans
+COST_TYPE_ACTUAL_CPU_TIME = 7
+COST_TYPE_THREAD_ELAPSED_TIME = 8
+# Physical reads (and read-aheads) depend on the cache state, 0 uses the logical reads only
+PHYSICAL_READ_WEIGHT = 0
 COST_TYPE_CURRENT_EXECUTION = COST_TYPE_ELAPSED_TIME
 COST_TYPE_CURRENT_CREATION = COST_TYPE_ELAPSED_TIME
 
 # ===============================  Context Related  ===============================
 CONTEXT_UNIQUENESS = 0
 CONTEXT_INCLUDES = False
-STATIC_CONTEXT_SIZE = 3
+# adds the tempdb spill and memory grant share of the queries of an arm to the derived context
+CONTEXT_SPILLS = False
+# derived context has an is columnstore and an is view feature when there are columnstore and view arms, and a feature
+# per compression type when there are compressed arms
+STATIC_CONTEXT_SIZE = (3 + 2 * CONTEXT_SPILLS + COLUMNSTORE_INDEXES + INDEXED_VIEWS +
+                       INDEX_COMPRESSION * len(INDEX_COMPRESSION_TYPES))
 
 # ===============================  Reporting Related  ===============================
 DF_COL_COMP_ID = "Component"
@@ -0,0 +1,273 @@
+import logging
+
+import numpy
+
+import constants
+
+# Index rows are estimated as header + primary key (row locator) + key columns + nullable bitmap
+INDEX_ROW_HEADER_SIZE = 6
+INDEX_ROW_NULLABLE_BUFFER = 2
+# Index keys can not be wider than this (bytes), indexes past it get a size no memory budget can fit
+MAX_INDEX_KEY_LENGTH = 1700
+OVERSIZED_INDEX_SIZE = 99999999
+# Indexed view rows are header + group by columns + a decimal(38) per SUM + COUNT_BIG(*), the group by columns are the
+# key of the unique clustered index of the view, which can not be wider than this (bytes) or have more columns
+VIEW_AGGREGATE_SIZE = 17
+VIEW_COUNT_SIZE = 8
+MAX_CLUSTERED_KEY_LENGTH = 900
+MAX_KEY_COLUMNS = 32
+
+
+class TableColumnArrays:
+    """
+    Column widths of a table as arrays, in the order of table.columns, so that many indexes of the table can be sized
+    at once
+    """
+
+    def __init__(self, table):
+        """
+        :param table: Table object with the columns set
+        """
+        columns = table.get_columns()
+        self.table_name = table.table_name
+        self.table_row_count = table.table_row_count
+        self.column_positions = {column_name: i for i, column_name in enumerate(columns)}
+        self.column_sizes = numpy.array([column.column_size if column.column_size else 0
+                                         for column in columns.values()], dtype=numpy.float64)
+        self.max_column_sizes = numpy.array([column.max_column_size if column.max_column_size else 0
+                                             for column in columns.values()], dtype=numpy.float64)
+        self.is_varchar = numpy.array([column.column_type == 'varchar' for column in columns.values()],
+                                      dtype=numpy.float64)
+        self.is_primary_key = numpy.zeros(len(columns), dtype=bool)
+        for column_name in table.pk_columns:
+            self.is_primary_key[self.column_positions[column_name]] = True
+        self.primary_key_size = get_key_lengths(self.is_primary_key[numpy.newaxis, :], self.column_sizes,
+                                                self.is_varchar)[0]
+
+    def get_column_counts(self, col_names_list):
+        """
+        :param col_names_list: list of column name tuples, one per index
+        :return: (number of indexes x number of columns) matrix with the count of each column in each index
+        """
+        index_positions = []
+        column_positions = []
+        for i, col_names in enumerate(col_names_list):
+            for column_name in col_names:
+                index_positions.append(i)
+                column_positions.append(self.column_positions[column_name])
+        column_counts = numpy.zeros((len(col_names_list), len(self.column_positions)), dtype=numpy.float64)
+        numpy.add.at(column_counts, (index_positions, column_positions), 1)
+        return column_counts
+
+
+class IndexSizeEstimator:
+    """
+    Estimates index sizes from the column widths of the tables, same estimate as
+    sql_helper.get_estimated_size_of_index_v1 but with the column widths precomputed per table.
+
+    The estimate leaves out the fill factor, page overheads and the non-leaf levels. These are learned from the sizes
+    of the built indexes, as a per-table correction factor (mean ratio of the measured to the estimated size) that is
+    shrunk towards the factor of all tables while a table has few measurements.
+    """
+
+    def __init__(self, prior_weight):
+        """
+        :param prior_weight: weight of the factor of all tables in the correction factor of a table
+        """
+        self.prior_weight = prior_weight
+        # table name -> TableColumnArrays
+        self.table_arrays = {}
+        # table name -> [sum of measured / estimated size ratios, number of measurements]
+        self.size_ratios = {}
+
+    def get_table_arrays(self, table):
+        table_arrays = self.table_arrays.get(table.table_name)
+        if table_arrays is None:
+            table_arrays = TableColumnArrays(table)
+            self.table_arrays[table.table_name] = table_arrays
+        return table_arrays
+
+    def get_estimated_sizes(self, table, col_names_list):
+        """
+        Estimated sizes of a batch of indexes on the same table
+
+        :param table: Table object
+        :param col_names_list: list of column name tuples (key and include columns), one per index
+        :return: numpy array with the estimated size in MB of each index
+        """
+        if not col_names_list:
+            return numpy.zeros(0)
+        table_arrays = self.get_table_arrays(table)
+        column_counts = table_arrays.get_column_counts(col_names_list)
+        # primary key columns are already part of the row locator
+        is_key_column = (column_counts > 0) & ~table_arrays.is_primary_key
+        key_columns_lengths = get_key_lengths(is_key_column, table_arrays.column_sizes, table_arrays.is_varchar)
+        index_row_lengths = (INDEX_ROW_HEADER_SIZE + table_arrays.primary_key_size + key_columns_lengths +
+                             INDEX_ROW_NULLABLE_BUFFER)
+        estimated_sizes = table_arrays.table_row_count * index_row_lengths / float(1024 * 1024)
+        max_column_lengths = column_counts @ table_arrays.max_column_sizes
+        is_oversized = max_column_lengths > MAX_INDEX_KEY_LENGTH
+        if is_oversized.any():
+            logging.debug(f"Indexes going past {MAX_INDEX_KEY_LENGTH}: "
+                          f"{[col_names_list[i] for i in numpy.flatnonzero(is_oversized)]}")
+            estimated_sizes[is_oversized] = OVERSIZED_INDEX_SIZE
+        return estimated_sizes
+
+    def add_measurement(self, table_name, estimated_size, measured_size):
+        """
+        Adds the measured size of a built index to the correction factors
+
+        :param table_name: table of the index
+        :param estimated_size: estimated size of the index (without the correction)
+        :param measured_size: size of the built index
+        """
+        if measured_size is None or not 0 < estimated_size < OVERSIZED_INDEX_SIZE:
+            return
+        size_ratio = self.size_ratios.setdefault(table_name, [0, 0])
+        size_ratio[0] += measured_size / estimated_size
+        size_ratio[1] += 1
+
+    def get_correction_factor(self, table_name):
+        """
+        :param table_name: table name
+        :return: factor to scale the estimated index sizes of the table with
+        """
+        ratio_sum = sum(size_ratio[0] for size_ratio in self.size_ratios.values())
+        count = sum(size_ratio[1] for size_ratio in self.size_ratios.values())
+        prior_factor = ratio_sum / count if count > 0 else 1
+        table_ratio_sum, table_count = self.size_ratios.get(table_name, (0, 0))
+        if table_count == 0:
+            return prior_factor
+        return (table_ratio_sum + self.prior_weight * prior_factor) / (table_count + self.prior_weight)
+
+    def get_calibrated_size(self, table_name, estimated_size):
+        """
+        :param table_name: table of the index
+        :param estimated_size: estimated size of the index (without the correction)
+        :return: estimated size scaled with the correction factor of the table
+        """
+        if estimated_size >= OVERSIZED_INDEX_SIZE:
+            return estimated_size
+        return estimated_size * self.get_correction_factor(table_name)
+
+    def get_stats(self):
+        """
+        :return: dictionary with the number of measurements and the correction factor of each measured table
+        """
+        return {table_name: {'measurements': size_ratio[1],
+                             'correction_factor': self.get_correction_factor(table_name)}
+                for table_name, size_ratio in self.size_ratios.items()}
+
+    def clear(self):
+        self.table_arrays.clear()
+        self.size_ratios.clear()
+
+    def log_stats(self):
+        logging.info(f"Index size model: {self.get_stats()}")
+
+
+class ColumnstoreSizeEstimator(IndexSizeEstimator):
+    """
+    Estimates nonclustered columnstore index sizes as the data width of the columns over the compression ratio. There
+    is no row locator or key length limit. The correction factors are learned separately from the rowstore indexes, as
+    the compression of a table depends on its data.
+    """
+
+    def __init__(self, prior_weight, compression_ratio):
+        """
+        :param prior_weight: weight of the factor of all tables in the correction factor of a table
+        :param compression_ratio: assumed ratio of the data width to the columnstore size
+        """
+        super().__init__(prior_weight)
+        self.compression_ratio = compression_ratio
+
+    def get_estimated_sizes(self, table, col_names_list):
+        """
+        Estimated sizes of a batch of columnstore indexes on the same table
+
+        :param table: Table object
+        :param col_names_list: list of column name tuples, one per index
+        :return: numpy array with the estimated size in MB of each index
+        """
+        if not col_names_list:
+            return numpy.zeros(0)
+        table_arrays = self.get_table_arrays(table)
+        column_counts = table_arrays.get_column_counts(col_names_list)
+        data_widths = (column_counts > 0).astype(numpy.float64) @ table_arrays.column_sizes
+        return table_arrays.table_row_count * data_widths / self.compression_ratio / float(1024 * 1024)
+
+    def log_stats(self):
+        logging.info(f"Columnstore size model: {self.get_stats()}")
+
+
+class ViewSizeEstimator(IndexSizeEstimator):
+    """
+    Estimates indexed view sizes from the estimated number of groups and the widths of the group by columns. Each view
+    is its own table for the correction factors, so the factor of all the measured views does most of the correction.
+    """
+
+    def get_estimated_view_size(self, tables, group_cols, aggregate_count, row_count):
+        """
+        :param tables: dictionary of Table objects with table name as the key
+        :param group_cols: tuple of (table name, column name), the key of the view
+        :param aggregate_count: number of SUM columns of the view
+        :param row_count: estimated number of rows (groups) of the view
+        :return: estimated size in MB
+        """
+        key_length = 0
+        max_key_length = 0
+        varchar_count = 0
+        for table_name, column_name in group_cols:
+            table_arrays = self.get_table_arrays(tables[table_name])
+            position = table_arrays.column_positions[column_name]
+            key_length += table_arrays.column_sizes[position]
+            max_key_length += table_arrays.max_column_sizes[position]
+            varchar_count += table_arrays.is_varchar[position]
+        if max_key_length > MAX_CLUSTERED_KEY_LENGTH or len(group_cols) > MAX_KEY_COLUMNS:
+            logging.debug(f"View key going past {MAX_CLUSTERED_KEY_LENGTH}: {group_cols}")
+            return OVERSIZED_INDEX_SIZE
+        if varchar_count > 0:
+            key_length += 2 + varchar_count * 2
+        row_length = (INDEX_ROW_HEADER_SIZE + key_length + aggregate_count * VIEW_AGGREGATE_SIZE + VIEW_COUNT_SIZE +
+                      INDEX_ROW_NULLABLE_BUFFER)
+        return row_count * row_length / float(1024 * 1024)
+
+    def log_stats(self):
+        logging.info(f"View size model: {self.get_stats()}")
+
+
+def get_size_estimator(index_type, compression=''):
+    """
+    :param index_type: INDEX_TYPE_ROWSTORE, INDEX_TYPE_COLUMNSTORE or INDEX_TYPE_VIEW
+    :param compression: data compression of a rowstore index, compressed indexes have their own correction factors
+    :return: size estimator of the index type
+    """
+    if compression:
+        return compressed_size_estimator
+    if index_type == constants.INDEX_TYPE_COLUMNSTORE:
+        return columnstore_size_estimator
+    if index_type == constants.INDEX_TYPE_VIEW:
+        return view_size_estimator
+    return index_size_estimator
+
+
+def get_key_lengths(is_key_column, column_sizes, is_varchar):
+    """
+    Data length of the key columns, with the variable length overhead if there are varchar columns in the key
+
+    :param is_key_column: (number of indexes x number of columns) boolean matrix
+    :param column_sizes: column widths
+    :param is_varchar: 1 for varchar columns, 0 otherwise
+    :return: numpy array with the key length of each index
+    """
+    is_key_column = is_key_column.astype(numpy.float64)
+    varchar_counts = is_key_column @ is_varchar
+    return is_key_column @ column_sizes + numpy.where(varchar_counts > 0, 2 + varchar_counts * 2, 0)
+
+
+index_size_estimator = IndexSizeEstimator(constants.SIZE_MODEL_PRIOR_WEIGHT)
+# ROW and PAGE compressed rowstore indexes, their estimates are already scaled with the compression ratio of the table
+compressed_size_estimator = IndexSizeEstimator(constants.SIZE_MODEL_PRIOR_WEIGHT)
+columnstore_size_estimator = ColumnstoreSizeEstimator(constants.SIZE_MODEL_PRIOR_WEIGHT,
+                                                      constants.COLUMNSTORE_COMPRESSION_RATIO)
+view_size_estimator = ViewSizeEstimator(constants.SIZE_MODEL_PRIOR_WEIGHT)
@@ -0,0 +1,119 @@
+import logging
+import re
+from collections import OrderedDict
+
+import constants
+from database.query_plan import QueryPlanV2
+
+# Parts of a plan that change from execution to execution, these are removed before fingerprinting a plan
+RUNTIME_ELEMENTS = ('RunTimeInformation|RunTimePartitionSummary|WaitStats|OptimizerHardwareDependentProperties|Warnings|'
+                    'QueryTimeStats|MemoryGrantInfo|ThreadStat')
+# self-closing elements are matched on their own, so an element with content is only matched up to its own end tag
+RUNTIME_ELEMENTS_PATTERN = re.compile(
+    rf'<(?:{RUNTIME_ELEMENTS})\b[^>]*/>|<({RUNTIME_ELEMENTS})\b[^>]*>.*?</\1>', re.DOTALL)
+RUNTIME_ATTRIBUTES_PATTERN = re.compile(
+    r'\s(CompileTime|CompileCPU|CompileMemory|CachedPlanSize|RetrievedFromCache|StatementId|'
+    r'DegreeOfParallelism|GrantedMemory|MaxUsedMemory)="[^"]*"')
+QUERY_PLAN_HASH_PATTERN = re.compile(r'QueryPlanHash="([^"]*)"')
+
+
+class PlanCache:
+    """
+    LRU cache of parsed query plans. Plans are keyed by the QueryPlanHash and a fingerprint of the plan with the
+    runtime counters stripped, so estimated costs are part of the key. For a known plan only the runtime counters are
+    read again, the structural parse is reused.
+    """
+
+    def __init__(self, capacity):
+        """
+        :param capacity: maximum number of plan structures kept in the cache, 0 disables the cache
+        """
+        self.capacity = capacity
+        self.plans = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_plan(self, xml_string):
+        """
+        Returns the parsed plan for the given XML plan
+
+        :param xml_string: XML plan as a string (or bytes)
+        :return: QueryPlanV2
+        """
+        xml_string = get_plan_text(xml_string)
+        if self.capacity <= 0:
+            return QueryPlanV2(xml_string)
+
+        fingerprint = get_plan_fingerprint(xml_string)
+        structure = self.plans.get(fingerprint)
+        if structure is not None:
+            self.hits += 1
+            self.plans.move_to_end(fingerprint)
+            return QueryPlanV2(xml_string, structure)
+
+        self.misses += 1
+        query_plan = QueryPlanV2(xml_string)
+        self.plans[fingerprint] = query_plan
+        if len(self.plans) > self.capacity:
+            self.plans.popitem(last=False)
+            self.evictions += 1
+        return query_plan
+
+    def get_stats(self):
+        """
+        :return: dictionary with the size and the hit / miss counters of the cache
+        """
+        lookups = self.hits + self.misses
+        return {'size': len(self.plans), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hits / lookups if lookups > 0 else 0}
+
+    def clear(self):
+        self.plans.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def log_stats(self):
+        logging.info(f"Plan cache: {self.get_stats()}")
+
+
+def get_plan_text(xml_string):
+    """
+    Plans read from files or passed between processes can be bytes, these are decoded using the BOM (SQL Server
+    writes UTF-16 plans)
+
+    :param xml_string: XML plan as a string or bytes
+    :return: XML plan as a string
+    """
+    if isinstance(xml_string, bytes):
+        if xml_string.startswith((b'\xff\xfe', b'\xfe\xff')):
+            return xml_string.decode('utf-16')
+        return xml_string.decode('utf-8-sig')
+    return xml_string
+
+
+def get_plan_hash(xml_string):
+    """
+    QueryPlanHash of the first statement, read without parsing the plan
+
+    :param xml_string: XML plan as a string or bytes
+    :return: QueryPlanHash, None if the plan doesn't have one
+    """
+    query_plan_hash = QUERY_PLAN_HASH_PATTERN.search(get_plan_text(xml_string))
+    return query_plan_hash.group(1) if query_plan_hash else None
+
+
+def get_plan_fingerprint(xml_string):
+    """
+    Structural fingerprint of a plan, QueryPlanHash with a hash of the plan without the runtime counters
+
+    :param xml_string: XML plan as a string
+    :return: fingerprint tuple
+    """
+    query_plan_hash = QUERY_PLAN_HASH_PATTERN.search(xml_string)
+    structure = RUNTIME_ATTRIBUTES_PATTERN.sub('', RUNTIME_ELEMENTS_PATTERN.sub('', xml_string))
+    return query_plan_hash.group(1) if query_plan_hash else None, hash(structure)
+
+
+query_plan_cache = PlanCache(constants.PLAN_CACHE_SIZE)
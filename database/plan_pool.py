@@ -0,0 +1,76 @@
+import concurrent.futures
+import logging
+from collections import namedtuple
+
+from database.plan_cache import query_plan_cache
+
+# Compact, picklable result of parsing a plan. Has the same fields as QueryPlanV2 that are needed for the rewards
+PlanUsage = namedtuple('PlanUsage', ['estimated_rows', 'est_statement_sub_tree_cost', 'elapsed_time', 'cpu_time',
+                                     'query_plan_hash', 'non_clustered_index_usage', 'clustered_index_usage',
+                                     'lookup_usage', 'sort_usage', 'logical_reads', 'granted_memory', 'spill_usage',
+                                     'degree_of_parallelism', 'thread_skew', 'thread_elapsed_time',
+                                     'maintenance_usage', 'actual_cpu_time'])
+
+
+def parse_plan_usage(xml_string):
+    """
+    Parse a plan and return only the usage information. This runs in the worker processes, each worker keeps its own
+    plan cache.
+
+    :param xml_string: XML plan as a string or bytes
+    :return: PlanUsage
+    """
+    query_plan = query_plan_cache.get_plan(xml_string)
+    return PlanUsage(query_plan.estimated_rows, query_plan.est_statement_sub_tree_cost, query_plan.elapsed_time,
+                     query_plan.cpu_time, query_plan.query_plan_hash, query_plan.non_clustered_index_usage,
+                     query_plan.clustered_index_usage, query_plan.lookup_usage, query_plan.sort_usage,
+                     query_plan.logical_reads, query_plan.granted_memory, query_plan.spill_usage,
+                     query_plan.degree_of_parallelism, query_plan.thread_skew, query_plan.thread_elapsed_time,
+                     query_plan.maintenance_usage, query_plan.actual_cpu_time)
+
+
+class PlanParserPool:
+    """
+    Parses plans in a process pool while the queries are executed. With 0 workers plans are parsed in the calling
+    process, which gives the same results as the pool.
+    """
+
+    def __init__(self, workers):
+        """
+        :param workers: number of worker processes, 0 to parse in the calling process
+        """
+        self.workers = workers
+        self.executor = None
+
+    def submit(self, xml_string):
+        """
+        Hand over a plan for parsing
+
+        :param xml_string: XML plan as a string or bytes
+        :return: future of PlanUsage
+        """
+        if self.workers <= 0:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(parse_plan_usage(xml_string))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self.executor is None:
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            logging.info(f"Started plan parser pool with {self.workers} workers")
+        return self.executor.submit(parse_plan_usage, xml_string)
+
+    def map(self, xml_strings):
+        """
+        Parse a batch of plans, results are in the same order as the plans
+
+        :param xml_strings: list of XML plans
+        :return: list of PlanUsage
+        """
+        return [future.result() for future in [self.submit(xml_string) for xml_string in xml_strings]]
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -1,7 +1,45 @@
+import copy
+import re
 import xml.etree.ElementTree as ET
 
+import constants
+
 ns = {'sp': 'http://schemas.microsoft.com/sqlserver/2004/07/showplan'}
-physical_operations = {'Index Seek', 'Index Scan', "Clustered Index Scan", "Clustered Index Seek"}
+# Columnstore scans of a clustered columnstore index (IndexKind Clustered) are reported as clustered index usage
+physical_operations = {'Index Seek', 'Index Scan', "Clustered Index Scan", "Clustered Index Seek",
+                       'Columnstore Index Scan'}
+non_clustered_operations = {'Index Seek', 'Index Scan', 'Columnstore Index Scan'}
+# Clustered index scans and seeks of an indexed view are reported as index usage, keyed by the index of the view
+VIEW_INDEX_KIND = 'ViewClustered'
+lookup_operations = {'Key Lookup', 'RID Lookup'}
+sort_operations = {'Sort'}
+# Joins are tracked for their spills and their share of the thread elapsed time, they have no usage of their own
+join_operations = {'Hash Match', 'Nested Loops', 'Merge Join', 'Adaptive Join'}
+# Operators that write the rows of a DML statement to the indexes listed in their Update element
+maintenance_operations = {f"{kind}{operation}" for kind in ('Index ', 'Clustered Index ', 'Table ', 'Columnstore Index ')
+                          for operation in ('Insert', 'Update', 'Delete', 'Merge')}
+# Operators that only read a single index or table, runtime counters in their subtree count towards them
+scan_operations = physical_operations | lookup_operations
+tracked_operations = scan_operations | sort_operations | join_operations | maintenance_operations
+
+TAG_STMT_SIMPLE = '{%s}StmtSimple' % ns['sp']
+TAG_QUERY_PLAN = '{%s}QueryPlan' % ns['sp']
+TAG_QUERY_TIME_STATS = '{%s}QueryTimeStats' % ns['sp']
+TAG_REL_OP = '{%s}RelOp' % ns['sp']
+TAG_RUNTIME_COUNTERS = '{%s}RunTimeCountersPerThread' % ns['sp']
+TAG_INDEX_SCAN = '{%s}IndexScan' % ns['sp']
+TAG_TABLE_SCAN = '{%s}TableScan' % ns['sp']
+TAG_OBJECT = '{%s}Object' % ns['sp']
+TAG_UPDATE = '{%s}Update' % ns['sp']
+TAG_MEMORY_GRANT_INFO = '{%s}MemoryGrantInfo' % ns['sp']
+TAG_SPILL_TO_TEMP_DB = '{%s}SpillToTempDb' % ns['sp']
+TAGS_SPILL_DETAILS = {'{%s}%sSpillDetails' % (ns['sp'], operator) for operator in ('Sort', 'Hash', 'Exchange')}
+
+# Used when only the runtime part of a plan with a known structure is read
+RUNTIME_PATTERN = re.compile(r'<RelOp\s[^>]*?NodeId="(\d+)"|<RunTimeCountersPerThread\s([^>]*)>|<QueryTimeStats\s([^>]*)>'
+                             r'|<MemoryGrantInfo\s([^>]*)>|<SpillToTempDb\s([^>]*)>|<(?:Sort|Hash|Exchange)SpillDetails\s([^>]*)>'
+                             r'|<QueryPlan\s[^>]*?DegreeOfParallelism="(\d+)"')
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
 
 
 class QueryPlan:
@@ -60,14 +98,471 @@ class QueryPlan:
             if rel_op.attrib.get('PhysicalOp') in physical_operations:
                 po_subtree_cost = float(rel_op.attrib.get('EstimatedTotalSubtreeCost'))
                 po_elapsed_time = float(self.elapsed_time) * (po_subtree_cost / total_po_sub_tree_cost)
-                po_cpu_time = float(self.cpu_time) * (
+                po_cpu_time = float(self.cpu_time) / 1000 * (
                         po_subtree_cost / float(self.est_statement_sub_tree_cost))
                 po_index_scan = rel_op.find('.//sp:IndexScan', ns)
-                if rel_op.attrib.get('PhysicalOp') in {'Index Seek', 'Index Scan'}:
-                    po_index = po_index_scan.find('.//sp:Object', ns).attrib.get('Index').strip("[]")
+                po_object = po_index_scan.find('.//sp:Object', ns)
+                if (rel_op.attrib.get('PhysicalOp') in non_clustered_operations and po_object.attrib.get(
+                        'IndexKind') != 'Clustered') or po_object.attrib.get('IndexKind') == VIEW_INDEX_KIND:
+                    po_index = po_object.attrib.get('Index').strip("[]")
                     self.non_clustered_index_usage.append(
                         (po_index, act_rel_op_elapsed_time, po_cpu_time, po_subtree_cost, rows_read, rows_output))
-                elif rel_op.attrib.get('PhysicalOp') in {'Clustered Index Scan', 'Clustered Index Seek'}:
-                    table = po_index_scan.find('.//sp:Object', ns).attrib.get('Table').strip("[]")
+                else:
+                    table = po_object.attrib.get('Table').strip("[]")
                     self.clustered_index_usage.append(
                         (table, act_rel_op_elapsed_time, po_cpu_time, po_subtree_cost, rows_read, rows_output))
+
+
+class PlanOperator:
+    """
+    Information collected for a single physical operator while streaming through a plan
+    """
+
+    def __init__(self, node_id, attrib, parent_op=None):
+        self.node_id = node_id
+        self.physical_op = attrib.get('PhysicalOp')
+        self.parent_op = parent_op
+        self.est_sub_tree_cost = float(attrib.get('EstimatedTotalSubtreeCost'))
+        self.est_operator_cost = float(attrib.get('EstimateCPU', 0)) + float(attrib.get('EstimateIO', 0))
+        self.estimate_rows = float(attrib.get('EstimateRows'))
+        self.estimated_rows_read = float(attrib.get('EstimatedRowsRead')) if attrib.get('EstimatedRowsRead') else 0
+        self.is_scan = self.physical_op in scan_operations
+        self.is_lookup = self.physical_op in lookup_operations
+        self.is_maintenance = self.physical_op in maintenance_operations
+        self.index_name = None
+        self.index_kind = None
+        self.table_name = None
+        self.in_index_scan = False
+        self.in_update = False
+        # (index name, index kind) of the indexes a maintenance operator writes to
+        self.maintained_indexes = []
+        self.position = 0
+        self.usage = None
+        # runtime counters, times are in ms. elapsed_time is the max across threads, the other times are summed over
+        # the threads
+        self.rows_read = 0
+        self.elapsed_time = 0
+        self.child_elapsed_time = 0
+        self.thread_elapsed_time = 0
+        self.child_thread_elapsed_time = 0
+        self.actual_cpu_time = 0
+        self.child_actual_cpu_time = 0
+        self.thread_count = 0
+        self.batch_mode = False
+        self.logical_reads = 0
+        self.spill_level = 0
+        self.spill_pages = 0
+
+    def copy_structure(self):
+        """
+        Returns a copy of this operator without the runtime counters
+        """
+        plan_operator = copy.copy(self)
+        plan_operator.usage = None
+        plan_operator.rows_read = 0
+        plan_operator.elapsed_time = 0
+        plan_operator.child_elapsed_time = 0
+        plan_operator.thread_elapsed_time = 0
+        plan_operator.child_thread_elapsed_time = 0
+        plan_operator.actual_cpu_time = 0
+        plan_operator.child_actual_cpu_time = 0
+        plan_operator.thread_count = 0
+        plan_operator.batch_mode = False
+        plan_operator.logical_reads = 0
+        plan_operator.spill_level = 0
+        plan_operator.spill_pages = 0
+        return plan_operator
+
+    def get_exclusive_elapsed_time(self):
+        """
+        Scan operators are leaves, for other operators row mode elapsed time includes the time of the children
+
+        :return: elapsed time spent in this operator in ms
+        """
+        if self.is_scan or self.batch_mode:
+            return self.elapsed_time
+        return max(self.elapsed_time - self.child_elapsed_time, 0)
+
+    def get_exclusive_thread_elapsed_time(self):
+        """
+        :return: elapsed time spent in this operator summed over the threads in ms
+        """
+        if self.is_scan or self.batch_mode:
+            return self.thread_elapsed_time
+        return max(self.thread_elapsed_time - self.child_thread_elapsed_time, 0)
+
+    def get_exclusive_cpu_time(self):
+        """
+        :return: CPU time (ActualCPUms) spent in this operator summed over the threads in ms
+        """
+        if self.is_scan or self.batch_mode:
+            return self.actual_cpu_time
+        return max(self.actual_cpu_time - self.child_actual_cpu_time, 0)
+
+    def get_thread_skew(self):
+        """
+        Max over mean of the per thread elapsed times, 1 when the work is evenly spread or the operator is serial
+        """
+        if self.thread_count <= 1 or self.thread_elapsed_time == 0:
+            return 1
+        return self.elapsed_time / (self.thread_elapsed_time / self.thread_count)
+
+
+class QueryPlanV2:
+    """
+    Single pass version of the QueryPlan. Plan XML is streamed through the parser once, and the runtime counters
+    are attributed to the operators that are open at that point. This gives the same index usage as QueryPlan
+    without building the element tree or re-walking the subtree of each operator.
+
+    Apart from the index and clustered index usage, key/RID lookups and sorts are reported. Lookups and sorts are
+    reported against the table they read, so they can be attributed to the indexes on that table. Memory grant of
+    the statement and the tempdb spills of the operators are read from actual plans. For DML statements the cost of
+    writing to each non-clustered index (or indexed view) is reported as the maintenance usage of the index.
+    """
+
+    def __init__(self, xml_string, structure=None):
+        """
+        :param xml_string: XML plan as a string
+        :param structure: already parsed plan with the same structure, if given only the runtime counters are read
+        """
+        self.estimated_rows = 0
+        self.est_statement_sub_tree_cost = 0
+        self.elapsed_time = 0
+        self.cpu_time = 0
+        self.logical_reads = 0
+        # memory grant of the statement in KB
+        self.granted_memory = 0
+        self.desired_memory = 0
+        self.max_used_memory = 0
+        # number of spill warnings and pages written to tempdb by the spills
+        self.spill_count = 0
+        self.spill_pages = 0
+        self.degree_of_parallelism = 1
+        # highest thread skew among the parallel operators
+        self.thread_skew = 1
+        # thread elapsed time summed over the tracked operators in s
+        self.thread_elapsed_time = 0
+        # ActualCPUms summed over the threads of all operators in ms, 0 if the plan has no per thread CPU counters
+        self.actual_cpu_time = 0
+        self.query_plan_hash = None
+        self.non_clustered_index_usage = []
+        self.clustered_index_usage = []
+        self.lookup_usage = []
+        self.sort_usage = []
+        self.spill_usage = []
+        self.maintenance_usage = []
+        self.operators = []
+        # NodeId of each RelOp -> positions (in operators) of the operators its runtime counters count towards
+        self.runtime_owners = {}
+        # NodeId of each RelOp -> position of the parent operator, if the parent is a tracked non scan operator
+        self.tracked_parents = {}
+        # NodeId of each tracked RelOp -> its position in operators
+        self.operator_nodes = {}
+        # NodeId -> max elapsed time (ms) across threads, and elapsed and CPU times (ms) summed over the threads
+        self.node_elapsed_times = {}
+        self.node_thread_elapsed_times = {}
+        self.node_cpu_times = {}
+
+        if structure is None:
+            self._parse(xml_string)
+        else:
+            self._load_structure(structure)
+            self._read_runtime(xml_string)
+        self._set_index_usage()
+
+    def _parse(self, xml_string):
+        """
+        Streams through the plan and collects statement level information and the physical operators
+
+        :param xml_string: XML plan as a string
+        """
+        parser = ET.XMLParser(target=_PlanStreamTarget(self))
+        parser.feed(xml_string)
+        parser.close()
+
+    def _load_structure(self, structure):
+        """
+        Copy the estimated (structural) part of an already parsed plan
+
+        :param structure: QueryPlanV2 parsed from a plan with the same fingerprint
+        """
+        self.estimated_rows = structure.estimated_rows
+        self.est_statement_sub_tree_cost = structure.est_statement_sub_tree_cost
+        self.query_plan_hash = structure.query_plan_hash
+        self.runtime_owners = structure.runtime_owners
+        self.tracked_parents = structure.tracked_parents
+        self.operator_nodes = structure.operator_nodes
+        self.operators = [plan_operator.copy_structure() for plan_operator in structure.operators]
+
+    def _read_runtime(self, xml_string):
+        """
+        Reads only the runtime counters, query time stats, memory grant and spills. Counters and spills are matched to
+        operators through the NodeId of the RelOp they belong to.
+
+        :param xml_string: XML plan as a string
+        """
+        node_id = None
+        query_stats_found = False
+        memory_grant_found = False
+        for match in RUNTIME_PATTERN.finditer(xml_string):
+            rel_op_node_id, counters, query_stats, memory_grant, spill, spill_details, dop = match.groups()
+            if rel_op_node_id is not None:
+                node_id = rel_op_node_id
+            elif counters is not None:
+                self._add_runtime_counters(node_id, dict(ATTRIBUTE_PATTERN.findall(counters)))
+            elif spill is not None:
+                self._add_spill(node_id, dict(ATTRIBUTE_PATTERN.findall(spill)))
+            elif spill_details is not None:
+                self._add_spill_details(node_id, dict(ATTRIBUTE_PATTERN.findall(spill_details)))
+            elif dop is not None:
+                self.degree_of_parallelism = int(dop)
+            elif memory_grant is not None:
+                if not memory_grant_found:
+                    memory_grant_found = True
+                    self._set_memory_grant(dict(ATTRIBUTE_PATTERN.findall(memory_grant)))
+            elif not query_stats_found:
+                query_stats_found = True
+                attrib = dict(ATTRIBUTE_PATTERN.findall(query_stats))
+                self.cpu_time = attrib.get('CpuTime')
+                self.elapsed_time = float(attrib.get('ElapsedTime')) / 1000
+
+    def _add_runtime_counters(self, node_id, attrib):
+        """
+        Adds the counters of one thread of a RelOp to the operators they count towards
+
+        :param node_id: NodeId of the RelOp the counters belong to
+        :param attrib: attributes of RunTimeCountersPerThread
+        """
+        rows_read = attrib.get('ActualRowsRead')
+        elapsed_time = int(attrib.get('ActualElapsedms', 0))
+        cpu_time = int(attrib.get('ActualCPUms', 0))
+        logical_reads = get_weighted_reads(attrib)
+        self.logical_reads += logical_reads
+        self.actual_cpu_time += cpu_time
+        if node_id in self.tracked_parents:
+            self.node_elapsed_times[node_id] = max(elapsed_time, self.node_elapsed_times.get(node_id, 0))
+            self.node_thread_elapsed_times[node_id] = self.node_thread_elapsed_times.get(node_id, 0) + elapsed_time
+            self.node_cpu_times[node_id] = self.node_cpu_times.get(node_id, 0) + cpu_time
+        for position in self.runtime_owners.get(node_id, ()):
+            plan_operator = self.operators[position]
+            if rows_read is not None:
+                plan_operator.rows_read += int(rows_read)
+            plan_operator.elapsed_time = max(elapsed_time, plan_operator.elapsed_time)
+            plan_operator.thread_elapsed_time += elapsed_time
+            plan_operator.actual_cpu_time += cpu_time
+            plan_operator.thread_count += 1
+            if attrib.get('ActualExecutionMode') == 'Batch':
+                plan_operator.batch_mode = True
+            plan_operator.logical_reads += logical_reads
+
+    def _set_memory_grant(self, attrib):
+        """
+        :param attrib: attributes of MemoryGrantInfo
+        """
+        self.granted_memory = int(attrib.get('GrantedMemory', 0))
+        self.desired_memory = int(attrib.get('DesiredMemory', 0))
+        self.max_used_memory = int(attrib.get('MaxUsedMemory', 0))
+
+    def _add_spill(self, node_id, attrib):
+        """
+        Adds a SpillToTempDb warning of a RelOp, spills of operators we don't track only count for the statement
+
+        :param node_id: NodeId of the RelOp the warning belongs to
+        :param attrib: attributes of SpillToTempDb
+        """
+        self.spill_count += 1
+        if node_id in self.operator_nodes:
+            plan_operator = self.operators[self.operator_nodes[node_id]]
+            plan_operator.spill_level = max(int(attrib.get('SpillLevel', 1)), plan_operator.spill_level)
+
+    def _add_spill_details(self, node_id, attrib):
+        """
+        :param node_id: NodeId of the RelOp the spill details belong to
+        :param attrib: attributes of Sort, Hash or Exchange SpillDetails
+        """
+        spill_pages = int(attrib.get('WritesToTempDb', 0))
+        self.spill_pages += spill_pages
+        if node_id in self.operator_nodes:
+            self.operators[self.operator_nodes[node_id]].spill_pages += spill_pages
+
+    def _set_index_usage(self):
+        """
+        Builds the usage lists from the collected operators. Usage tuples have the same layout as QueryPlan,
+        (index/table, elapsed time, cpu time, cost, rows read, rows output) followed by the logical reads, the actual
+        CPU time and the elapsed time summed over the threads (in s). Scan
+        operators use the sub tree cost and the other operators use their own estimated cost. Spill usage is (table,
+        physical operator, spill level, pages written to tempdb) for the operators that spilled. Maintenance usage has the index name, an operator that writes to several
+        indexes (a narrow DML plan) is split evenly among them.
+        """
+        for node_id, position in self.tracked_parents.items():
+            plan_operator = self.operators[position]
+            plan_operator.child_elapsed_time = max(self.node_elapsed_times.get(node_id, 0),
+                                                   plan_operator.child_elapsed_time)
+            plan_operator.child_thread_elapsed_time += self.node_thread_elapsed_times.get(node_id, 0)
+            plan_operator.child_actual_cpu_time += self.node_cpu_times.get(node_id, 0)
+
+        statement_sub_tree_cost = float(self.est_statement_sub_tree_cost) if self.est_statement_sub_tree_cost else 0
+        for plan_operator in self.operators:
+            rows_read = plan_operator.rows_read if plan_operator.rows_read != 0 else plan_operator.estimated_rows_read
+            cost = plan_operator.est_sub_tree_cost if plan_operator.is_scan else plan_operator.est_operator_cost
+            po_cpu_time = (float(self.cpu_time) / 1000 * (cost / statement_sub_tree_cost) if statement_sub_tree_cost
+                           else 0)
+            thread_elapsed_time = plan_operator.get_exclusive_thread_elapsed_time() / 1000
+            self.thread_elapsed_time += thread_elapsed_time
+            self.thread_skew = max(plan_operator.get_thread_skew(), self.thread_skew)
+            usage = (plan_operator.get_exclusive_elapsed_time() / 1000, po_cpu_time, cost, rows_read,
+                     plan_operator.estimate_rows, plan_operator.logical_reads,
+                     plan_operator.get_exclusive_cpu_time() / 1000, thread_elapsed_time)
+            if plan_operator.is_lookup:
+                plan_operator.usage = (plan_operator.table_name,) + usage
+                self.lookup_usage.append(plan_operator.usage)
+            elif plan_operator.is_maintenance:
+                plan_operator.usage = (plan_operator.table_name,) + usage
+                share = 1 / len(plan_operator.maintained_indexes) if plan_operator.maintained_indexes else 0
+                for index_name, index_kind in plan_operator.maintained_indexes:
+                    if index_name and index_kind not in ('Clustered', 'Heap'):
+                        self.maintenance_usage.append((index_name,) + tuple(value * share for value in usage))
+            elif plan_operator.physical_op in physical_operations and (
+                    plan_operator.physical_op in non_clustered_operations and plan_operator.index_kind != 'Clustered' or
+                    plan_operator.index_kind == VIEW_INDEX_KIND):
+                plan_operator.usage = (plan_operator.index_name,) + usage
+                self.non_clustered_index_usage.append(plan_operator.usage)
+            elif plan_operator.physical_op in physical_operations:
+                plan_operator.usage = (plan_operator.table_name,) + usage
+                self.clustered_index_usage.append(plan_operator.usage)
+            elif plan_operator.physical_op in sort_operations:
+                plan_operator.usage = (plan_operator.table_name,) + usage
+                self.sort_usage.append(plan_operator.usage)
+            if plan_operator.spill_level or plan_operator.spill_pages:
+                self.spill_usage.append((plan_operator.table_name, plan_operator.physical_op, plan_operator.spill_level,
+                                         plan_operator.spill_pages))
+
+
+def get_weighted_reads(attrib):
+    """
+    Page reads of one thread of an operator, logical reads plus the weighted physical reads (PHYSICAL_READ_WEIGHT)
+
+    :param attrib: attributes of RunTimeCountersPerThread
+    :return: number of reads
+    """
+    logical_reads = int(attrib.get('ActualLogicalReads', 0)) + int(attrib.get('ActualLobLogicalReads', 0))
+    if constants.PHYSICAL_READ_WEIGHT:
+        physical_reads = int(attrib.get('ActualPhysicalReads', 0)) + int(attrib.get('ActualReadAheads', 0)) + int(
+            attrib.get('ActualLobPhysicalReads', 0)) + int(attrib.get('ActualLobReadAheads', 0))
+        return logical_reads + constants.PHYSICAL_READ_WEIGHT * physical_reads
+    return logical_reads
+
+
+class _PlanStreamTarget:
+    """
+    Parser target used by QueryPlanV2. Expat calls start and end for each element as the plan is read, so no element
+    tree is built and each element is visited once.
+    """
+
+    def __init__(self, query_plan):
+        self.query_plan = query_plan
+        self.stmt_found = False
+        self.query_stats_found = False
+        self.memory_grant_found = False
+        # (NodeId, operator) for each open RelOp, operator is None for the operators we don't track
+        self.rel_op_stack = []
+        # open scan operators, counters in their subtree count towards them
+        self.open_scans = []
+        # open sorts and joins that don't know their table yet
+        self.open_without_table = []
+        self.scan_depth = 0
+
+    def start(self, tag, attrib):
+        if tag == TAG_REL_OP:
+            self._start_rel_op(attrib)
+        elif tag == TAG_RUNTIME_COUNTERS:
+            if self.rel_op_stack:
+                self.query_plan._add_runtime_counters(self.rel_op_stack[-1][0], attrib)
+        elif tag == TAG_INDEX_SCAN or tag == TAG_TABLE_SCAN:
+            self.scan_depth += 1
+            plan_operator = self.rel_op_stack[-1][1] if self.rel_op_stack else None
+            if plan_operator is not None and plan_operator.is_scan and plan_operator.table_name is None:
+                plan_operator.in_index_scan = True
+                if attrib.get('Lookup') in ('1', 'true'):
+                    plan_operator.is_lookup = True
+        elif tag == TAG_UPDATE:
+            plan_operator = self.rel_op_stack[-1][1] if self.rel_op_stack else None
+            if plan_operator is not None and plan_operator.is_maintenance:
+                plan_operator.in_update = True
+        elif tag == TAG_OBJECT:
+            plan_operator = self.rel_op_stack[-1][1] if self.rel_op_stack else None
+            if plan_operator is not None and plan_operator.in_update:
+                plan_operator.maintained_indexes.append((attrib.get('Index', '').strip("[]"), attrib.get('IndexKind')))
+                if plan_operator.table_name is None:
+                    plan_operator.table_name = attrib.get('Table', '').strip("[]")
+            elif plan_operator is not None and plan_operator.in_index_scan and plan_operator.table_name is None:
+                plan_operator.index_name = attrib.get('Index', '').strip("[]")
+                plan_operator.index_kind = attrib.get('IndexKind')
+                plan_operator.table_name = attrib.get('Table', '').strip("[]")
+            if self.scan_depth > 0 and self.open_without_table:
+                for open_operator in self.open_without_table:
+                    open_operator.table_name = attrib.get('Table', '').strip("[]")
+                self.open_without_table = []
+        elif tag == TAG_SPILL_TO_TEMP_DB:
+            self.query_plan._add_spill(self.rel_op_stack[-1][0] if self.rel_op_stack else None, attrib)
+        elif tag in TAGS_SPILL_DETAILS:
+            self.query_plan._add_spill_details(self.rel_op_stack[-1][0] if self.rel_op_stack else None, attrib)
+        elif tag == TAG_MEMORY_GRANT_INFO and not self.memory_grant_found:
+            self.memory_grant_found = True
+            self.query_plan._set_memory_grant(attrib)
+        elif tag == TAG_QUERY_PLAN and 'DegreeOfParallelism' in attrib:
+            self.query_plan.degree_of_parallelism = int(attrib['DegreeOfParallelism'])
+        elif tag == TAG_STMT_SIMPLE and not self.stmt_found:
+            self.stmt_found = True
+            self.query_plan.estimated_rows = attrib.get('StatementEstRows')
+            self.query_plan.est_statement_sub_tree_cost = attrib.get('StatementSubTreeCost')
+            self.query_plan.query_plan_hash = attrib.get('QueryPlanHash')
+        elif tag == TAG_QUERY_TIME_STATS and not self.query_stats_found:
+            self.query_stats_found = True
+            self.query_plan.cpu_time = attrib.get('CpuTime')
+            self.query_plan.elapsed_time = float(attrib.get('ElapsedTime')) / 1000
+
+    def _start_rel_op(self, attrib):
+        query_plan = self.query_plan
+        node_id = attrib.get('NodeId')
+        parent_node_id, parent_operator = self.rel_op_stack[-1] if self.rel_op_stack else (None, None)
+        plan_operator = None
+        if attrib.get('PhysicalOp') in tracked_operations:
+            plan_operator = PlanOperator(node_id, attrib, parent_operator.physical_op if parent_operator else None)
+            plan_operator.position = len(query_plan.operators)
+            query_plan.operators.append(plan_operator)
+            query_plan.operator_nodes[node_id] = plan_operator.position
+            if plan_operator.is_scan:
+                self.open_scans.append(plan_operator)
+            elif not plan_operator.is_maintenance:
+                self.open_without_table.append(plan_operator)
+        self.rel_op_stack.append((node_id, plan_operator))
+
+        owners = [open_scan.position for open_scan in self.open_scans]
+        if plan_operator is not None and not plan_operator.is_scan:
+            owners.append(plan_operator.position)
+        if owners:
+            query_plan.runtime_owners[node_id] = tuple(owners)
+        if parent_operator is not None and not parent_operator.is_scan:
+            query_plan.tracked_parents[node_id] = parent_operator.position
+
+    def end(self, tag):
+        if tag == TAG_REL_OP:
+            node_id, plan_operator = self.rel_op_stack.pop()
+            if plan_operator is not None:
+                if plan_operator.is_scan:
+                    self.open_scans.pop()
+                elif plan_operator in self.open_without_table:
+                    self.open_without_table.remove(plan_operator)
+        elif tag == TAG_INDEX_SCAN or tag == TAG_TABLE_SCAN:
+            self.scan_depth -= 1
+            plan_operator = self.rel_op_stack[-1][1] if self.rel_op_stack else None
+            if plan_operator is not None:
+                plan_operator.in_index_scan = False
+        elif tag == TAG_UPDATE:
+            plan_operator = self.rel_op_stack[-1][1] if self.rel_op_stack else None
+            if plan_operator is not None:
+                plan_operator.in_update = False
+
+    def close(self):
+        return self.query_plan
@@ -0,0 +1,135 @@
+import os
+import statistics
+import sys
+import time
+
+import constants
+from database.plan_cache import PlanCache
+from database.query_plan import QueryPlan, QueryPlanV2
+
+# Number of times each plan corpus is parsed, best run is reported
+BENCHMARK_REPEATS = 5
+PLAN_FILE_EXTENSIONS = ('.xml', '.sqlplan')
+
+
+def capture_plans(connection, queries, folder, actual=True):
+    """
+    Captures the plans for the given workload queries and saves them in the plan corpus folder
+
+    :param connection: sql_connection
+    :param queries: list of query dictionaries read from the workload file
+    :param folder: folder where the plans are saved
+    :param actual: capture actual (executed) plans if true, estimated plans otherwise
+    :return: number of captured plans
+    """
+    import database.sql_helper_v2 as sql_helper
+
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    captured = 0
+    for query in queries:
+        if actual:
+            plan = sql_helper.get_actual_query_plan(connection, query['query_string'])
+        else:
+            plan = sql_helper.get_query_plan(connection, query['query_string'])
+        if plan:
+            file_name = f"{query['id']}_{captured}.xml"
+            with open(os.path.join(folder, file_name), 'wb') as f:
+                f.write(plan.encode('utf-16') if isinstance(plan, str) else plan)
+            captured += 1
+    return captured
+
+
+def read_plans(folder):
+    """
+    Read all the captured plans in the given folder as raw bytes
+
+    :param folder: plan corpus folder
+    :return: list of XML plans
+    """
+    plans = []
+    for file_name in sorted(os.listdir(folder)):
+        if file_name.lower().endswith(PLAN_FILE_EXTENSIONS):
+            with open(os.path.join(folder, file_name), 'rb') as f:
+                plans.append(f.read())
+    return plans
+
+
+def get_plan_fields(query_plan):
+    non_clustered_index_usage = query_plan.non_clustered_index_usage
+    clustered_index_usage = query_plan.clustered_index_usage
+    if isinstance(query_plan, QueryPlanV2):
+        # QueryPlanV2 reports key lookups separately, QueryPlan reports them as clustered index seeks. Only the
+        # fields QueryPlan has are compared.
+        non_clustered_index_usage = [plan_operator.usage[:6] for plan_operator in query_plan.operators
+                                     if plan_operator.physical_op in {'Index Seek', 'Index Scan'}]
+        clustered_index_usage = [plan_operator.usage[:6] for plan_operator in query_plan.operators
+                                 if plan_operator.physical_op in {'Clustered Index Scan', 'Clustered Index Seek'}]
+    return (query_plan.estimated_rows, query_plan.est_statement_sub_tree_cost, query_plan.elapsed_time,
+            query_plan.cpu_time, non_clustered_index_usage, clustered_index_usage)
+
+
+def time_parser(parser_class, plans, repeats):
+    """
+    Parse the full corpus several times with the given parser
+
+    :param parser_class: QueryPlan, QueryPlanV2 or the get_plan of a plan cache
+    :param plans: list of XML plans
+    :param repeats: number of runs
+    :return: best and median time for a run in seconds
+    """
+    run_times = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        for plan in plans:
+            parser_class(plan)
+        run_times.append(time.perf_counter() - start_time)
+    return min(run_times), statistics.median(run_times)
+
+
+def run_benchmark(plans, repeats=BENCHMARK_REPEATS):
+    """
+    Checks that both parsers give the same fields for every plan and compares the parse times. QueryPlanV2 is also
+    timed through a warm plan cache, which is how the executed plans are parsed: only the runtime counters of a known
+    plan are read.
+
+    :param plans: list of XML plans
+    :param repeats: number of runs
+    :return: dictionary of results
+    """
+    mismatches = 0
+    for plan in plans:
+        if get_plan_fields(QueryPlan(plan)) != get_plan_fields(QueryPlanV2(plan)):
+            mismatches += 1
+    tree_best, tree_median = time_parser(QueryPlan, plans, repeats)
+    stream_best, stream_median = time_parser(QueryPlanV2, plans, repeats)
+    plan_cache = PlanCache(len(plans))
+    for plan in plans:
+        plan_cache.get_plan(plan)
+    cached_best, cached_median = time_parser(plan_cache.get_plan, plans, repeats)
+    return {'plans': len(plans),
+            'kb_per_plan': sum(len(plan) for plan in plans) / 1024 / len(plans),
+            'mismatches': mismatches,
+            'tree_ms_per_plan': 1000 * tree_best / len(plans),
+            'stream_ms_per_plan': 1000 * stream_best / len(plans),
+            'tree_median_s': tree_median,
+            'stream_median_s': stream_median,
+            'cached_ms_per_plan': 1000 * cached_best / len(plans),
+            'cached_median_s': cached_median,
+            'speedup': tree_best / stream_best,
+            'cached_speedup': tree_best / cached_best}
+
+
+if __name__ == "__main__":
+    # plans are captured from the workload into the plan corpus folder, unless a folder of plans is given
+    corpus_folder = sys.argv[1] if len(sys.argv) > 1 else constants.ROOT_DIR + constants.PLAN_CORPUS_FOLDER
+    if not os.path.exists(corpus_folder) or not read_plans(corpus_folder):
+        from database import sql_connection
+        from shared import helper
+        sql_connection_for_capture = sql_connection.get_sql_connection()
+        capture_plans(sql_connection_for_capture, helper.get_queries_v2(), corpus_folder)
+        sql_connection.close_sql_connection(sql_connection_for_capture)
+
+    results = run_benchmark(read_plans(corpus_folder))
+    for key, value in results.items():
+        print(f"{key}: {value}")
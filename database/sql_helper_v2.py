@@ -6,9 +6,16 @@ import subprocess
 import time
 from collections import defaultdict
 import copy
+import decimal
+import re
+import statistics
 
 import constants
-from database.query_plan import QueryPlan
+from bandits.arm_registry import arm_registry
+from database.query_plan import QueryPlan, QueryPlanV2
+from database.index_size import get_size_estimator, index_size_estimator
+from database.plan_cache import query_plan_cache, get_plan_hash
+from database.plan_pool import PlanParserPool
 from database.column import Column
 from database.table import Table
 
@@ -22,11 +29,17 @@ table_scan_times_hyp = copy.deepcopy(constants.TABLE_SCAN_TIMES[benchmark_type])
 table_scan_times = copy.deepcopy(constants.TABLE_SCAN_TIMES[database[:-4]])
 
 tables_global = None
+plan_parser_pool = PlanParserPool(constants.PLAN_PARSE_WORKERS)
 pk_columns_dict = {}
 sel_store = {}
+column_selectivity_store = {}
+column_histogram_store = {}
+compression_ratio_store = {}
+DML_PATTERN = re.compile(r'^\s*(?:with\b.*?\)\s*)?(insert|update|delete|merge)\b', re.IGNORECASE | re.DOTALL)
 
 
-def create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, include_cols=()):
+def create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, include_cols=(), filter_predicate='',
+                    compression=''):
     """
     Create an index on the given table
 
@@ -36,12 +49,18 @@ def create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, incl
     :param col_names: string list of column names
     :param idx_name: name of the index
     :param include_cols: columns that needed to added as includes
+    :param filter_predicate: WHERE clause of a filtered index, empty for a full index
+    :param compression: DATA_COMPRESSION of the index (ROW or PAGE), empty for no compression
     """
     if include_cols:
         query = f"CREATE NONCLUSTERED INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)})" \
             f" INCLUDE ({', '.join(include_cols)})"
     else:
         query = f"CREATE NONCLUSTERED INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)})"
+    if filter_predicate:
+        query += f" WHERE {filter_predicate}"
+    if compression:
+        query += f" WITH (DATA_COMPRESSION = {compression})"
     cursor = connection.cursor()
     cursor.execute("SET STATISTICS XML ON")
     cursor.execute(query)
@@ -51,15 +70,55 @@ def create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, incl
     logging.info(f"Added: {idx_name}")
 
     # Return the current reward
-    query_plan = QueryPlan(stat_xml)
-    if constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_ELAPSED_TIME:
-        return float(query_plan.elapsed_time)
-    elif constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_CPU_TIME:
-        return float(query_plan.cpu_time)
-    elif constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_SUB_TREE_COST:
-        return float(query_plan.est_statement_sub_tree_cost)
-    else:
-        return float(query_plan.est_statement_sub_tree_cost)
+    return get_query_plan_cost(get_creation_plan(stat_xml), constants.COST_TYPE_CURRENT_CREATION)
+
+
+def create_columnstore_index_v1(connection, schema_name, tbl_name, col_names, idx_name):
+    """
+    Create a nonclustered columnstore index on the given table
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param tbl_name: name of the database table
+    :param col_names: string list of column names
+    :param idx_name: name of the index
+    """
+    query = f"CREATE NONCLUSTERED COLUMNSTORE INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)})"
+    cursor = connection.cursor()
+    cursor.execute("SET STATISTICS XML ON")
+    cursor.execute(query)
+    stat_xml = cursor.fetchone()[0]
+    cursor.execute("SET STATISTICS XML OFF")
+    connection.commit()
+    logging.info(f"Added: {idx_name}")
+
+    # Return the current reward
+    return get_query_plan_cost(get_creation_plan(stat_xml), constants.COST_TYPE_CURRENT_CREATION)
+
+
+def create_view_index_v1(connection, schema_name, view_name, view_definition, col_names, idx_name):
+    """
+    Create a schema bound view and its unique clustered index, this materialises the view
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param view_name: name of the view
+    :param view_definition: select statement of the view
+    :param col_names: string list of the group by columns of the view
+    :param idx_name: name of the index
+    """
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE OR ALTER VIEW {schema_name}.{view_name} WITH SCHEMABINDING AS {view_definition}")
+    query = f"CREATE UNIQUE CLUSTERED INDEX {idx_name} ON {schema_name}.{view_name} ({', '.join(col_names)})"
+    cursor.execute("SET STATISTICS XML ON")
+    cursor.execute(query)
+    stat_xml = cursor.fetchone()[0]
+    cursor.execute("SET STATISTICS XML OFF")
+    connection.commit()
+    logging.info(f"Added: {idx_name}")
+
+    # Return the current reward
+    return get_query_plan_cost(get_creation_plan(stat_xml), constants.COST_TYPE_CURRENT_CREATION)
 
 
 """Below 2 functions are used by DTARunner"""
@@ -80,15 +139,7 @@ def create_index_v2(connection, query):
     connection.commit()
 
     # Return the current reward
-    query_plan = QueryPlan(stat_xml)
-    if constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_ELAPSED_TIME:
-        return float(query_plan.elapsed_time)
-    elif constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_CPU_TIME:
-        return float(query_plan.cpu_time)
-    elif constants.COST_TYPE_CURRENT_CREATION == constants.COST_TYPE_SUB_TREE_COST:
-        return float(query_plan.est_statement_sub_tree_cost)
-    else:
-        return float(query_plan.est_statement_sub_tree_cost)
+    return get_query_plan_cost(get_creation_plan(stat_xml), constants.COST_TYPE_CURRENT_CREATION)
 
 
 def create_statistics(connection, query):
@@ -119,9 +170,18 @@ def bulk_create_indexes(connection, schema_name, bandit_arm_list):
     :return: cost (regret)
     """
     cost = {}
-    for index_name, bandit_arm in bandit_arm_list.items():
-        cost[index_name] = create_index_v1(connection, schema_name, bandit_arm.table_name, bandit_arm.index_cols, bandit_arm.index_name,
-                                           bandit_arm.include_cols)
+    for arm_id, bandit_arm in bandit_arm_list.items():
+        if bandit_arm.index_type == constants.INDEX_TYPE_VIEW:
+            cost[arm_id] = create_view_index_v1(connection, schema_name, bandit_arm.table_name,
+                                                bandit_arm.view_definition, bandit_arm.index_cols,
+                                                bandit_arm.index_name)
+        elif bandit_arm.index_type == constants.INDEX_TYPE_COLUMNSTORE:
+            cost[arm_id] = create_columnstore_index_v1(connection, schema_name, bandit_arm.table_name,
+                                                       bandit_arm.index_cols, bandit_arm.index_name)
+        else:
+            cost[arm_id] = create_index_v1(connection, schema_name, bandit_arm.table_name, bandit_arm.index_cols,
+                                           bandit_arm.index_name, bandit_arm.include_cols, bandit_arm.filter_predicate,
+                                           bandit_arm.compression)
         set_arm_size(connection, bandit_arm)
     return cost
 
@@ -144,6 +204,22 @@ def drop_index(connection, schema_name, tbl_name, idx_name):
     logging.debug(query)
 
 
+def drop_view(connection, schema_name, view_name):
+    """
+    Drops the view with the given name, this also drops the indexes of the view
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param view_name: name of the view
+    """
+    query = f"DROP VIEW {schema_name}.{view_name}"
+    cursor = connection.cursor()
+    cursor.execute(query)
+    connection.commit()
+    logging.info(f"removed: {view_name}")
+    logging.debug(query)
+
+
 def bulk_drop_index(connection, schema_name, bandit_arm_list):
     """
     Drops the index for all given bandit arms
@@ -153,8 +229,11 @@ def bulk_drop_index(connection, schema_name, bandit_arm_list):
     :param bandit_arm_list: list of bandit arms
     :return:
     """
-    for index_name, bandit_arm in bandit_arm_list.items():
-        drop_index(connection, schema_name, bandit_arm.table_name, bandit_arm.index_name)
+    for bandit_arm in bandit_arm_list.values():
+        if bandit_arm.index_type == constants.INDEX_TYPE_VIEW:
+            drop_view(connection, schema_name, bandit_arm.table_name)
+        else:
+            drop_index(connection, schema_name, bandit_arm.table_name, bandit_arm.index_name)
 
 
 def simple_execute(connection, query):
@@ -181,27 +260,102 @@ def execute_query_v1(connection, query):
     :param query: query that need to be executed
     :return: time taken for the query
     """
+    cost, query_plan = execute_query_v2(connection, query)
+    if query_plan is None:
+        return 0, [], []
+    return cost, query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
+
+
+def execute_query_v2(connection, query):
+    """
+    Same as execute_query_v1, but returns the parsed plan so that the lookup and sort usage can be used as well
+
+    :param connection: sql_connection
+    :param query: query that need to be executed
+    :return: cost of the query (based on COST_TYPE_CURRENT_EXECUTION), QueryPlanV2 (None if the execution failed)
+    """
     try:
-        cursor = connection.cursor()
-        cursor.execute("CHECKPOINT;")
-        cursor.execute("DBCC DROPCLEANBUFFERS;")
-        cursor.execute("SET STATISTICS XML ON")
-        cursor.execute(query)
-        cursor.nextset()
-        stat_xml = cursor.fetchone()[0]
-        cursor.execute("SET STATISTICS XML OFF")
-        query_plan = QueryPlan(stat_xml)
-        if constants.COST_TYPE_CURRENT_EXECUTION == constants.COST_TYPE_ELAPSED_TIME:
-            return float(query_plan.elapsed_time), query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
-        elif constants.COST_TYPE_CURRENT_EXECUTION == constants.COST_TYPE_CPU_TIME:
-            return float(query_plan.cpu_time), query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
-        elif constants.COST_TYPE_CURRENT_EXECUTION == constants.COST_TYPE_SUB_TREE_COST:
-            return float(query_plan.est_statement_sub_tree_cost), query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
-        else:
-            return float(query_plan.est_statement_sub_tree_cost), query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
+        stat_xml = get_actual_query_plan(connection, query)
+        query_plan = query_plan_cache.get_plan(stat_xml)
+        return get_query_plan_cost(query_plan, constants.COST_TYPE_CURRENT_EXECUTION), query_plan
     except:
         print("Exception when executing query: ", query)
-        return 0, [], []
+        return 0, None
+
+
+def execute_query_async(connection, query):
+    """
+    Executes the given query (same as execute_query_v2), parsing of the plan is handed over to the plan parser pool
+
+    :param connection: sql_connection
+    :param query: query that need to be executed
+    :return: future of the parsed plan (PlanUsage), None if the execution failed
+    """
+    try:
+        stat_xml = get_actual_query_plan(connection, query)
+    except:
+        print("Exception when executing query: ", query)
+        return None
+    return plan_parser_pool.submit(stat_xml)
+
+
+def get_plan_result(plan_future, query):
+    """
+    Wait for a plan handed over to the plan parser pool
+
+    :param plan_future: future returned by execute_query_async
+    :param query: query the plan belongs to
+    :return: PlanUsage, None if the execution or the parsing failed
+    """
+    if plan_future is None:
+        return None
+    try:
+        return plan_future.result()
+    except Exception as e:
+        print("Exception when parsing the plan of query: ", query)
+        logging.error(f"Exception when parsing the plan: {e}")
+        return None
+
+
+def get_creation_plan(stat_xml):
+    """
+    Parse the plan of an index creation statement. Creation plans are parsed once and not cached, so the legacy
+    QueryPlan is used. It is faster than QueryPlanV2 on a plan it sees for the first time, QueryPlanV2 is only used
+    when the creation cost type is one that QueryPlan doesn't report (logical reads, actual CPU time and thread elapsed
+    time).
+
+    :param stat_xml: XML plan of the statement
+    :return: QueryPlan or QueryPlanV2
+    """
+    if constants.COST_TYPE_CURRENT_CREATION in (constants.COST_TYPE_LOGICAL_READS, constants.COST_TYPE_ACTUAL_CPU_TIME,
+                                                constants.COST_TYPE_THREAD_ELAPSED_TIME):
+        return QueryPlanV2(stat_xml)
+    return QueryPlan(stat_xml)
+
+
+def get_query_plan_cost(query_plan, cost_type):
+    """
+    Statement level cost of a plan for the given cost type
+
+    :param query_plan: QueryPlanV2, or QueryPlan for the cost types it reports
+    :param cost_type: one of the COST_TYPE constants
+    :return: cost as a float, times are in seconds
+    """
+    if cost_type == constants.COST_TYPE_ELAPSED_TIME:
+        return float(query_plan.elapsed_time)
+    elif cost_type == constants.COST_TYPE_CPU_TIME:
+        return float(query_plan.cpu_time) / 1000
+    elif cost_type == constants.COST_TYPE_SUB_TREE_COST:
+        return float(query_plan.est_statement_sub_tree_cost)
+    elif cost_type == constants.COST_TYPE_LOGICAL_READS:
+        return float(query_plan.logical_reads)
+    elif cost_type == constants.COST_TYPE_ACTUAL_CPU_TIME:
+        # CPU time measured per thread, plans without per thread CPU counters fall back to the CpuTime of the statement
+        return float(query_plan.actual_cpu_time or query_plan.cpu_time) / 1000
+    elif cost_type == constants.COST_TYPE_THREAD_ELAPSED_TIME:
+        return float(query_plan.thread_elapsed_time)
+    else:
+        return float(query_plan.est_statement_sub_tree_cost)
 
 
 def get_table_row_count(connection, schema_name, tbl_name):
@@ -238,12 +392,34 @@ def create_query_drop_v3(connection, schema_name, bandit_arm_list, arm_list_to_a
     arm_rewards = {}
     if tables_global is None:
         get_tables(connection)
+    # Plans are parsed in the plan parser pool while the next queries are executed
+    pending_plans = []
+    skipped_count = 0
     for query in queries:
-        time, non_clustered_index_usage, clustered_index_usage = execute_query_v1(connection, query.query_string)
-        non_clustered_index_usage = merge_index_use(non_clustered_index_usage)
-        clustered_index_usage = merge_index_use(clustered_index_usage)
+        if constants.EXECUTION_SKIPPING and is_plan_unchanged(connection, query):
+            skipped_count += 1
+            pending_plans.append((query, None, True))
+        else:
+            pending_plans.append((query, execute_query_async(connection, query.query_string), False))
+    for query, plan_future, is_skipped in pending_plans:
+        if is_skipped:
+            query.skipped_executions += 1
+            query_plan = query.last_plan
+        else:
+            query_plan = get_plan_result(plan_future, query.query_string)
+            if constants.EXECUTION_SKIPPING:
+                set_last_plan(query, query_plan)
+        time = get_query_plan_cost(query_plan, constants.COST_TYPE_CURRENT_EXECUTION) if query_plan else 0
         logging.info(f"Query {query.id} cost: {time}")
         execute_cost += time
+        if query_plan is None:
+            continue
+        non_clustered_index_usage = merge_index_use(query_plan.non_clustered_index_usage)
+        clustered_index_usage = merge_index_use(query_plan.clustered_index_usage)
+        lookup_costs = get_table_costs(query_plan.lookup_usage, constants.COST_TYPE_CURRENT_EXECUTION)
+        sort_costs = get_table_costs(query_plan.sort_usage, constants.COST_TYPE_CURRENT_EXECUTION)
+        query.spill_pages = get_table_spills(query_plan.spill_usage)
+        query.memory_grant = query_plan.granted_memory
         current_clustered_index_scans = {}
         if clustered_index_usage:
             for index_scan in clustered_index_usage:
@@ -252,18 +428,28 @@ def create_query_drop_v3(connection, schema_name, bandit_arm_list, arm_list_to_a
                 if len(query.table_scan_times[table_name]) < constants.TABLE_SCAN_TIME_LENGTH:
                     query.table_scan_times[table_name].append(index_scan[constants.COST_TYPE_CURRENT_EXECUTION])
                     table_scan_times[table_name].append(index_scan[constants.COST_TYPE_CURRENT_EXECUTION])
+        table_counts = {}
         if non_clustered_index_usage:
-            table_counts = {}
             for index_use in non_clustered_index_usage:
-                index_name = index_use[0]
-                table_name = bandit_arm_list[index_name].table_name
+                arm_id = arm_registry.get_id_by_name(index_use[0])
+                if bandit_arm_list[arm_id].index_type == constants.INDEX_TYPE_VIEW:
+                    continue
+                table_name = bandit_arm_list[arm_id].table_name
                 if table_name in table_counts:
                     table_counts[table_name] += 1
                 else:
                     table_counts[table_name] = 1
             for index_use in non_clustered_index_usage:
-                index_name = index_use[0]
-                table_name = bandit_arm_list[index_name].table_name
+                arm_id = arm_registry.get_id_by_name(index_use[0])
+                if bandit_arm_list[arm_id].index_type == constants.INDEX_TYPE_VIEW:
+                    # an indexed view replaces the reads of its base tables
+                    temp_reward = get_view_reward(bandit_arm_list[arm_id],
+                                                  index_use[constants.COST_TYPE_CURRENT_EXECUTION],
+                                                  query.table_scan_times, table_scan_times,
+                                                  current_clustered_index_scans)
+                    arm_rewards.setdefault(arm_id, [0, 0])[0] += temp_reward
+                    continue
+                table_name = bandit_arm_list[arm_id].table_name
                 if len(query.table_scan_times[table_name]) < constants.TABLE_SCAN_TIME_LENGTH:
                     query.index_scan_times[table_name].append(index_use[constants.COST_TYPE_CURRENT_EXECUTION])
                 table_scan_time = query.table_scan_times[table_name]
@@ -278,10 +464,22 @@ def create_query_drop_v3(connection, schema_name, bandit_arm_list, arm_list_to_a
                     raise Exception
                 if table_name in current_clustered_index_scans:
                     temp_reward -= current_clustered_index_scans[table_name]/table_counts[table_name]
-                if index_name not in arm_rewards:
-                    arm_rewards[index_name] = [temp_reward, 0]
+                temp_reward += get_lookup_sort_reward(query, table_name, lookup_costs, sort_costs) / table_counts[
+                    table_name]
+                if arm_id not in arm_rewards:
+                    arm_rewards[arm_id] = [temp_reward, 0]
                 else:
-                    arm_rewards[index_name][0] += temp_reward
+                    arm_rewards[arm_id][0] += temp_reward
+        if constants.DML_MAINTENANCE_COST:
+            # writes of a DML statement to the indexes are a cost of their arms
+            for maintenance_use in merge_index_use(query_plan.maintenance_usage):
+                arm_id = arm_registry.get_id_by_name(maintenance_use[0])
+                if arm_id in bandit_arm_list:
+                    arm_rewards.setdefault(arm_id, [0, 0])[0] -= maintenance_use[constants.COST_TYPE_CURRENT_EXECUTION]
+        # sorts done without a non-clustered index on the table are the sort cost that an index order can save
+        for table_name, sort_cost in sort_costs.items():
+            if table_name not in table_counts and len(query.sort_times[table_name]) < constants.TABLE_SCAN_TIME_LENGTH:
+                query.sort_times[table_name].append(sort_cost)
 
     for key in creation_cost:
         if key in arm_rewards:
@@ -290,9 +488,128 @@ def create_query_drop_v3(connection, schema_name, bandit_arm_list, arm_list_to_a
             arm_rewards[key] = [0, -1 * creation_cost[key]]
     logging.info(f"Index creation cost: {sum(creation_cost.values())}")
     logging.info(f"Time taken to run the queries: {execute_cost}")
+    if skipped_count:
+        logging.info(f"Skipped the execution of {skipped_count} queries with unchanged plans")
     return execute_cost, creation_cost, arm_rewards
 
 
+def is_plan_unchanged(connection, query):
+    """
+    Checks if the last measured plan of the query can be reused instead of executing it. The measured costs of the
+    plan must be stable, the query is executed again after EXECUTION_REFRESH_ROUNDS skips, and the estimated plan under
+    the current configuration must have the same plan hash.
+
+    :param connection: sql_connection
+    :param query: query object
+    :return: True if the execution can be skipped
+    """
+    if query.last_plan is None or query.last_plan.query_plan_hash is None:
+        return False
+    if query.skipped_executions >= constants.EXECUTION_REFRESH_ROUNDS:
+        return False
+    if len(query.last_plan_costs) < constants.EXECUTION_HISTORY_LENGTH:
+        return False
+    mean_cost = statistics.mean(query.last_plan_costs)
+    if mean_cost > 0 and statistics.pstdev(query.last_plan_costs) / mean_cost > constants.EXECUTION_VARIANCE_BOUND:
+        return False
+    try:
+        return get_plan_hash(get_query_plan(connection, query.query_string)) == query.last_plan.query_plan_hash
+    except Exception as e:
+        logging.error(f"Exception when getting the estimated plan of query {query.id}: {e}")
+        return False
+
+
+def set_last_plan(query, query_plan):
+    """
+    Keeps the plan of an execution, measured costs are collected while the plan hash stays the same
+
+    :param query: query object
+    :param query_plan: PlanUsage of the execution, None if the execution failed
+    """
+    query.skipped_executions = 0
+    if query_plan is None:
+        query.last_plan = None
+        query.last_plan_costs = []
+        return
+    if query.last_plan is None or query.last_plan.query_plan_hash != query_plan.query_plan_hash:
+        query.last_plan_costs = []
+    query.last_plan = query_plan
+    query.last_plan_costs.append(get_query_plan_cost(query_plan, constants.COST_TYPE_CURRENT_EXECUTION))
+    query.last_plan_costs = query.last_plan_costs[-constants.EXECUTION_HISTORY_LENGTH:]
+
+
+def get_table_costs(table_uses, cost_type):
+    """
+    Sum the cost of lookup or sort operators per table, operators without a known table are ignored
+
+    :param table_uses: usage tuples (table, elapsed time, cpu time, cost, rows read, rows output)
+    :param cost_type: one of the COST_TYPE constants, used as the position in the tuple
+    :return: dictionary of costs with table name as the key
+    """
+    table_costs = {}
+    for table_use in table_uses:
+        if table_use[0] in table_scan_times:
+            table_costs[table_use[0]] = table_costs.get(table_use[0], 0) + table_use[cost_type]
+    return table_costs
+
+
+def get_table_spills(spill_usage):
+    """
+    Sum the pages spilled to tempdb per table, spills of operators without a known table are ignored
+
+    :param spill_usage: spill tuples (table, physical operator, spill level, pages written to tempdb)
+    :return: dictionary of spilled pages with table name as the key
+    """
+    table_spills = {}
+    for spill_use in spill_usage:
+        if spill_use[0] in table_scan_times:
+            table_spills[spill_use[0]] = table_spills.get(spill_use[0], 0) + spill_use[3]
+    return table_spills
+
+
+def get_lookup_sort_reward(query, table_name, lookup_costs, sort_costs):
+    """
+    Reward adjustment for a non-clustered index on the given table. Lookups on the table are the cost of the index not
+    being covering. A sort on the table is a cost that the index did not avoid, while a sort seen for this query when
+    the table was read without an index is credited to the index when it is avoided.
+
+    :param query: query object
+    :param table_name: table of the index
+    :param lookup_costs: lookup costs of the current execution per table
+    :param sort_costs: sort costs of the current execution per table
+    :return: reward adjustment (to be shared among the indexes used on the table)
+    """
+    reward = -1 * lookup_costs.get(table_name, 0)
+    if table_name in sort_costs:
+        reward -= sort_costs[table_name]
+    elif query.sort_times[table_name]:
+        reward += max(query.sort_times[table_name])
+    return reward
+
+
+def get_view_reward(bandit_arm, view_cost, query_scan_times, global_scan_times, current_table_scans):
+    """
+    Reward of an indexed view used in a plan, this is the scans of its base tables the view saves less the cost of
+    reading the view. Base tables that are still scanned in the plan are not credited to the view.
+
+    :param bandit_arm: bandit arm of the view
+    :param view_cost: cost of reading the view in the plan
+    :param query_scan_times: table scan times of the query
+    :param global_scan_times: table scan times of all the queries, used when the query has none for a table
+    :param current_table_scans: dictionary of the tables scanned in the plan
+    :return: reward
+    """
+    reward = -1 * view_cost
+    for table_name in bandit_arm.base_tables:
+        if table_name in current_table_scans:
+            continue
+        if len(query_scan_times[table_name]) > 0:
+            reward += max(query_scan_times[table_name])
+        elif len(global_scan_times[table_name]) > 0:
+            reward += max(global_scan_times[table_name])
+    return reward
+
+
 def merge_index_use(index_uses):
     d = defaultdict(list)
     for index_use in index_uses:
@@ -309,9 +626,10 @@ def get_selectivity_list(query_obj_list):
     return selectivity_list
 
 
-def hyp_create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, include_cols=()):
+def hyp_create_index_v1(connection, schema_name, tbl_name, col_names, idx_name, include_cols=(), filter_predicate=''):
     """
-    Create an hypothetical index on the given table
+    Create an hypothetical index on the given table. Hypothetical indexes have no data, so compressed arms are created
+    without compression and what-if plans do not see the effect of compression.
 
     :param connection: sql_connection
     :param schema_name: name of the database schema
@@ -319,13 +637,34 @@ def hyp_create_index_v1(connection, schema_name, tbl_name, col_names, idx_name,
     :param col_names: string list of column names
     :param idx_name: name of the index
     :param include_cols: columns that needed to be added as includes
+    :param filter_predicate: WHERE clause of a filtered index, empty for a full index
     """
+    query = f"CREATE NONCLUSTERED INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)}) "
     if include_cols:
-        query = f"CREATE NONCLUSTERED INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)}) " \
-                f"INCLUDE ({', '.join(include_cols)}) WITH STATISTICS_ONLY = -1"
-    else:
-        query = f"CREATE NONCLUSTERED INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)}) " \
-                f"WITH STATISTICS_ONLY = -1"
+        query += f"INCLUDE ({', '.join(include_cols)}) "
+    if filter_predicate:
+        query += f"WHERE {filter_predicate} "
+    query += "WITH STATISTICS_ONLY = -1"
+    cursor = connection.cursor()
+    cursor.execute(query)
+    connection.commit()
+    logging.debug(query)
+    logging.info(f"Added HYP: {idx_name}")
+    return 0
+
+
+def hyp_create_columnstore_index_v1(connection, schema_name, tbl_name, col_names, idx_name):
+    """
+    Create an hypothetical nonclustered columnstore index on the given table
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param tbl_name: name of the database table
+    :param col_names: string list of column names
+    :param idx_name: name of the index
+    """
+    query = f"CREATE NONCLUSTERED COLUMNSTORE INDEX {idx_name} ON {schema_name}.{tbl_name} ({', '.join(col_names)}) " \
+            f"WITH STATISTICS_ONLY = -1"
     cursor = connection.cursor()
     cursor.execute(query)
     connection.commit()
@@ -334,6 +673,28 @@ def hyp_create_index_v1(connection, schema_name, tbl_name, col_names, idx_name,
     return 0
 
 
+def hyp_create_view_index_v1(connection, schema_name, view_name, view_definition, col_names, idx_name):
+    """
+    Create a schema bound view and an hypothetical unique clustered index on it
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param view_name: name of the view
+    :param view_definition: select statement of the view
+    :param col_names: string list of the group by columns of the view
+    :param idx_name: name of the index
+    """
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE OR ALTER VIEW {schema_name}.{view_name} WITH SCHEMABINDING AS {view_definition}")
+    query = f"CREATE UNIQUE CLUSTERED INDEX {idx_name} ON {schema_name}.{view_name} ({', '.join(col_names)}) " \
+            f"WITH STATISTICS_ONLY = -1"
+    cursor.execute(query)
+    connection.commit()
+    logging.debug(query)
+    logging.info(f"Added HYP: {idx_name}")
+    return 0
+
+
 def hyp_bulk_create_indexes(connection, schema_name, bandit_arm_list):
     """
     This uses hyp_create_index method to create multiple indexes at once. This is used when a super arm is pulled
@@ -344,9 +705,18 @@ def hyp_bulk_create_indexes(connection, schema_name, bandit_arm_list):
     :return: index name list
     """
     cost = {}
-    for index_name, bandit_arm in bandit_arm_list.items():
-        cost[index_name] = hyp_create_index_v1(connection, schema_name, bandit_arm.table_name, bandit_arm.index_cols,
-                                               bandit_arm.index_name, bandit_arm.include_cols)
+    for arm_id, bandit_arm in bandit_arm_list.items():
+        if bandit_arm.index_type == constants.INDEX_TYPE_VIEW:
+            cost[arm_id] = hyp_create_view_index_v1(connection, schema_name, bandit_arm.table_name,
+                                                    bandit_arm.view_definition, bandit_arm.index_cols,
+                                                    bandit_arm.index_name)
+        elif bandit_arm.index_type == constants.INDEX_TYPE_COLUMNSTORE:
+            cost[arm_id] = hyp_create_columnstore_index_v1(connection, schema_name, bandit_arm.table_name,
+                                                           bandit_arm.index_cols, bandit_arm.index_name)
+        else:
+            cost[arm_id] = hyp_create_index_v1(connection, schema_name, bandit_arm.table_name, bandit_arm.index_cols,
+                                               bandit_arm.index_name, bandit_arm.include_cols,
+                                               bandit_arm.filter_predicate)
     return cost
         
         
@@ -384,7 +754,7 @@ def hyp_execute_query(connection, query):
     cursor.execute(query)
     stat_xml = cursor.fetchone()[0]
     cursor.execute("SET AUTOPILOT OFF")
-    query_plan = QueryPlan(stat_xml)
+    query_plan = query_plan_cache.get_plan(stat_xml)
     return float(query_plan.est_statement_sub_tree_cost), query_plan.non_clustered_index_usage, query_plan.clustered_index_usage
 
 
@@ -418,8 +788,9 @@ def hyp_create_query_drop_v1(connection, schema_name, bandit_arm_list, arm_list_
 
         if index_seeks:
             for index_seek in index_seeks:
-                table_scan_time_hyp = table_scan_times_hyp[bandit_arm_list[index_seek[0]].table_name]
-                arm_rewards[index_seek[0]] = max(table_scan_time_hyp) - index_seek[3]
+                arm_id = arm_registry.get_id_by_name(index_seek[0])
+                table_scan_time_hyp = table_scan_times_hyp[bandit_arm_list[arm_id].table_name]
+                arm_rewards[arm_id] = max(table_scan_time_hyp) - index_seek[3]
 
     for key in creation_cost:
         creation_cost[key] = max(table_scan_times_hyp[bandit_arm_list[key].table_name])
@@ -456,16 +827,24 @@ def hyp_create_query_drop_v2(connection, schema_name, bandit_arm_list, arm_list_
     for query in queries:
         time, non_clustered_index_usage, clustered_index_usage = hyp_execute_query(connection, query.query_string)
         execute_cost += time
+        current_clustered_index_scans = {}
         if clustered_index_usage:
             for index_scan in clustered_index_usage:
                 table_name = index_scan[0]
+                current_clustered_index_scans[table_name] = index_scan[constants.COST_TYPE_SUB_TREE_COST]
                 if len(query.table_scan_times_hyp[table_name]) < constants.TABLE_SCAN_TIME_LENGTH:
                     query.table_scan_times_hyp[table_name].append(index_scan[constants.COST_TYPE_SUB_TREE_COST])
                     table_scan_times_hyp[table_name].append(index_scan[constants.COST_TYPE_SUB_TREE_COST])
         if non_clustered_index_usage:
             for index_use in non_clustered_index_usage:
-                index_name = index_use[0]
-                table_name = bandit_arm_list[index_name].table_name
+                arm_id = arm_registry.get_id_by_name(index_use[0])
+                if bandit_arm_list[arm_id].index_type == constants.INDEX_TYPE_VIEW:
+                    temp_reward = get_view_reward(bandit_arm_list[arm_id], index_use[constants.COST_TYPE_SUB_TREE_COST],
+                                                  query.table_scan_times_hyp, table_scan_times_hyp,
+                                                  current_clustered_index_scans)
+                    arm_rewards.setdefault(arm_id, [0, 0])[0] += temp_reward
+                    continue
+                table_name = bandit_arm_list[arm_id].table_name
                 if len(query.table_scan_times_hyp[table_name]) < constants.TABLE_SCAN_TIME_LENGTH:
                     query.index_scan_times_hyp[table_name].append(index_use[constants.COST_TYPE_SUB_TREE_COST])
                 table_scan_time = query.table_scan_times_hyp[table_name]
@@ -476,10 +855,10 @@ def hyp_create_query_drop_v2(connection, schema_name, bandit_arm_list, arm_list_
                 else:
                     logging.error(f"Queries without index scan information {query.id}")
                     raise Exception
-                if index_name not in arm_rewards:
-                    arm_rewards[index_name] = [temp_reward, 0]
+                if arm_id not in arm_rewards:
+                    arm_rewards[arm_id] = [temp_reward, 0]
                 else:
-                    arm_rewards[index_name][0] += temp_reward
+                    arm_rewards[arm_id][0] += temp_reward
 
     for key in creation_cost:
         if key in arm_rewards:
@@ -568,6 +947,201 @@ def get_primary_key(connection, schema_name, table_name):
     return pk_columns
 
 
+def get_column_selectivity(connection, schema_name, table_name, column_name):
+    """
+    Equality selectivity of a column, this is the density (1 / distinct values) of the statistics that lead with the
+    column. Returns 1 if there are no such statistics.
+
+    :param connection: SQL Connection
+    :param schema_name: schema name of table
+    :param table_name: table name
+    :param column_name: column name
+    :return: selectivity between 0 and 1
+    """
+    column_id = Column.construct_id(table_name, column_name)
+    if column_id in column_selectivity_store:
+        return column_selectivity_store[column_id]
+    selectivity = 1
+    query = f"""SELECT TOP 1 s.name
+                FROM sys.stats s, sys.stats_columns sc
+                WHERE s.object_id = sc.object_id AND s.stats_id = sc.stats_id AND sc.stats_column_id = 1
+                AND s.object_id = OBJECT_ID('{schema_name}.{table_name}')
+                AND COL_NAME(sc.object_id, sc.column_id) = '{column_name}'"""
+    cursor = connection.cursor()
+    cursor.execute(query)
+    result = cursor.fetchone()
+    if result:
+        cursor.execute(f"DBCC SHOW_STATISTICS ('{schema_name}.{table_name}', [{result[0]}]) WITH DENSITY_VECTOR")
+        density_row = cursor.fetchone()
+        if density_row and density_row[0] is not None:
+            selectivity = min(float(density_row[0]), 1)
+    column_selectivity_store[column_id] = selectivity
+    return selectivity
+
+
+def get_column_histogram(connection, schema_name, table_name, column_name):
+    """
+    Histogram of the statistics that lead with the column
+
+    :param connection: SQL Connection
+    :param schema_name: schema name of table
+    :param table_name: table name
+    :param column_name: column name
+    :return: list of (RANGE_HI_KEY, RANGE_ROWS, EQ_ROWS, AVG_RANGE_ROWS), None if there are no such statistics
+    """
+    column_id = Column.construct_id(table_name, column_name)
+    if column_id in column_histogram_store:
+        return column_histogram_store[column_id]
+    histogram = None
+    query = f"""SELECT TOP 1 s.name
+                FROM sys.stats s, sys.stats_columns sc
+                WHERE s.object_id = sc.object_id AND s.stats_id = sc.stats_id AND sc.stats_column_id = 1
+                AND s.object_id = OBJECT_ID('{schema_name}.{table_name}')
+                AND COL_NAME(sc.object_id, sc.column_id) = '{column_name}'"""
+    cursor = connection.cursor()
+    cursor.execute(query)
+    result = cursor.fetchone()
+    if result:
+        cursor.execute(f"DBCC SHOW_STATISTICS ('{schema_name}.{table_name}', [{result[0]}]) WITH HISTOGRAM")
+        histogram = [(row[0], float(row[1]), float(row[2]), float(row[4])) for row in cursor.fetchall()
+                     if row[0] is not None]
+    column_histogram_store[column_id] = histogram or None
+    return column_histogram_store[column_id]
+
+
+def get_filter_selectivity(connection, schema_name, table_name, filter_terms):
+    """
+    Share of the rows of a table that pass the filter of a filtered index, estimated from the histograms of the filter
+    columns. Terms on the same column are combined as a range, columns are taken as independent. Terms that can not be
+    estimated count as selectivity 1.
+
+    :param connection: SQL Connection
+    :param schema_name: schema name of table
+    :param table_name: table name
+    :param filter_terms: tuple of (column, operator, literal)
+    :return: selectivity between 0 and 1
+    """
+    column_terms = {}
+    for column_name, operator, literal in filter_terms:
+        column_terms.setdefault(column_name, []).append((operator, literal))
+    selectivity = 1
+    for column_name, terms in column_terms.items():
+        histogram = get_column_histogram(connection, schema_name, table_name, column_name)
+        if histogram is None:
+            continue
+        term_selectivities = [get_histogram_selectivity(histogram, operator, literal) for operator, literal in terms]
+        # lower bound of the conjunction, exact for the two sides of a range
+        column_selectivity = max(sum(term_selectivities) - (len(term_selectivities) - 1), 0)
+        total_rows = sum(range_rows + eq_rows for _, range_rows, eq_rows, _ in histogram)
+        selectivity *= max(min([column_selectivity] + term_selectivities), 1 / max(total_rows, 1))
+    return selectivity
+
+
+def get_histogram_selectivity(histogram, operator, literal):
+    """
+    Selectivity of a comparison of a column with a literal, rows inside a histogram step are taken as uniform
+
+    :param histogram: histogram from get_column_histogram
+    :param operator: comparison operator
+    :param literal: SQL text of the literal
+    :return: selectivity between 0 and 1, 1 if the literal does not match the type of the histogram
+    """
+    value = get_histogram_value(literal, histogram[0][0])
+    if value is None:
+        return 1
+    total_rows = sum(range_rows + eq_rows for _, range_rows, eq_rows, _ in histogram)
+    if total_rows == 0:
+        return 1
+    if operator in ('=', '<>'):
+        rows = 0
+        for hi_key, range_rows, eq_rows, avg_range_rows in histogram:
+            if value == hi_key:
+                rows = eq_rows
+                break
+            if value < hi_key:
+                rows = avg_range_rows if range_rows > 0 else 0
+                break
+        selectivity = rows / total_rows
+        return 1 - selectivity if operator == '<>' else selectivity
+
+    compare = {'<': lambda key: key < value, '<=': lambda key: key <= value,
+               '>': lambda key: key > value, '>=': lambda key: key >= value}[operator]
+    is_upper_bound = operator in ('<', '<=')
+    rows = 0
+    lower_key = None
+    for hi_key, range_rows, eq_rows, _ in histogram:
+        if compare(hi_key):
+            rows += eq_rows
+        # the range of a step holds the values between the previous and this high key
+        if is_upper_bound and hi_key <= value or not is_upper_bound and lower_key is not None and lower_key >= value:
+            rows += range_rows
+        elif (lower_key is None or lower_key < value) and value < hi_key:
+            rows += range_rows / 2
+        lower_key = hi_key
+    return min(rows / total_rows, 1)
+
+
+def get_histogram_value(literal, hi_key):
+    """
+    :param literal: SQL text of the literal
+    :param hi_key: a key of the histogram, gives the type the literal is converted to
+    :return: literal as a value comparable with the histogram keys, None if it can not be converted
+    """
+    text = literal[1:-1] if literal.startswith("'") else literal
+    try:
+        if isinstance(hi_key, datetime.datetime):
+            return datetime.datetime.fromisoformat(text)
+        if isinstance(hi_key, datetime.date):
+            return datetime.date.fromisoformat(text[:10])
+        if isinstance(hi_key, bool):
+            return None
+        if isinstance(hi_key, int):
+            return int(decimal.Decimal(text))
+        if isinstance(hi_key, float):
+            return float(text)
+        if isinstance(hi_key, decimal.Decimal):
+            return decimal.Decimal(text)
+        if isinstance(hi_key, str):
+            return text
+    except (ValueError, decimal.InvalidOperation):
+        return None
+    return None
+
+
+def get_compression_ratio(connection, schema_name, table_name, compression):
+    """
+    Ratio of the compressed to the current size of the table, from sp_estimate_data_compression_savings on the
+    clustered index (or the heap). Indexes of the table are assumed to compress as well as the table does, the size
+    model learns the difference from the built indexes.
+
+    :param connection: SQL Connection
+    :param schema_name: schema name of table
+    :param table_name: table name
+    :param compression: ROW or PAGE
+    :return: ratio between 0 and 1, 1 if the savings can not be estimated
+    """
+    if (table_name, compression) in compression_ratio_store:
+        return compression_ratio_store[(table_name, compression)]
+    ratio = 1
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXEC sp_estimate_data_compression_savings '{schema_name}', '{table_name}', NULL, NULL, "
+                       f"'{compression}'")
+        current_size = 0
+        compressed_size = 0
+        # columns: object, schema, index id, partition, current size (KB), requested size (KB), sample sizes (KB)
+        for result in cursor.fetchall():
+            if result[2] <= 1:
+                current_size += result[4]
+                compressed_size += result[5]
+        if current_size > 0:
+            ratio = min(compressed_size / current_size, 1)
+    except Exception as e:
+        logging.error(f"Exception when estimating the {compression} compression of {table_name}: {e}")
+    compression_ratio_store[(table_name, compression)] = ratio
+    return ratio
+
+
 def get_column_data_length_v2(connection, table_name, col_names):
     """
     get the data length of given set of columns
@@ -695,6 +1269,33 @@ def get_estimated_size_of_index_v1(connection, schema_name, tbl_name, col_names)
     return estimated_size
 
 
+def get_estimated_size_of_index_v2(connection, schema_name, tbl_name, col_names):
+    """
+    Same estimate as get_estimated_size_of_index_v1, using the column width arrays of the index size estimator
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param tbl_name: name of the database table
+    :param col_names: string list of column names
+    :return: estimated size in MB
+    """
+    return float(get_estimated_sizes_of_indexes(connection, schema_name, tbl_name, [col_names])[0])
+
+
+def get_estimated_sizes_of_indexes(connection, schema_name, tbl_name, col_names_list):
+    """
+    Estimated sizes for a batch of indexes on the same table, sized together in one pass
+
+    :param connection: sql_connection
+    :param schema_name: name of the database schema
+    :param tbl_name: name of the database table
+    :param col_names_list: list of column name tuples, one per index
+    :return: numpy array of estimated sizes in MB
+    """
+    table = get_tables(connection)[tbl_name]
+    return index_size_estimator.get_estimated_sizes(table, col_names_list)
+
+
 def get_max_column_data_length_v2(connection, table_name, col_names):
     tables = get_tables(connection)
     column_data_length = 0
@@ -720,6 +1321,38 @@ def get_query_plan(connection, query):
     return query_plan
 
 
+def get_actual_query_plan(connection, query):
+    """
+    This clears the cache, executes the given query and returns the actual (statistics) XML plan
+
+    :param connection: sql_connection
+    :param query: sql query that need to be executed
+    :return: XML query plan as a String
+    """
+    cursor = connection.cursor()
+    cursor.execute("CHECKPOINT;")
+    cursor.execute("DBCC DROPCLEANBUFFERS;")
+    cursor.execute("SET STATISTICS XML ON")
+    cursor.execute(query)
+    cursor.nextset()
+    stat_xml = cursor.fetchone()[0]
+    cursor.execute("SET STATISTICS XML OFF")
+    if is_dml_statement(query):
+        if constants.DML_ROLLBACK:
+            connection.rollback()
+        else:
+            connection.commit()
+    return stat_xml
+
+
+def is_dml_statement(query):
+    """
+    :param query: sql statement
+    :return: True if the statement is an INSERT, UPDATE, DELETE or MERGE
+    """
+    return DML_PATTERN.match(query) is not None
+
+
 def get_selectivity_v3(connection, query, predicates):
     """
     Return the selectivity of the given query
@@ -734,7 +1367,7 @@ def get_selectivity_v3(connection, query, predicates):
     read_rows = {}
     selectivity = {}
     if query_plan_string != "":
-        query_plan = QueryPlan(query_plan_string)
+        query_plan = query_plan_cache.get_plan(query_plan_string)
 
         tables = predicates.keys()
         for table in tables:
@@ -756,18 +1389,21 @@ def get_selectivity_v3(connection, query, predicates):
 
 def remove_all_non_clustered(connection, schema_name):
     """
-    Removes all non-clustered indexes from the database
+    Removes all non-clustered indexes and the indexed views of the arms from the database
     :param connection: SQL Connection
     :param schema_name: schema name related to the index
     """
     query = """select i.name as index_name, t.name as table_name
                 from sys.indexes i, sys.tables t
-                where i.object_id = t.object_id and i.type_desc = 'NONCLUSTERED'"""
+                where i.object_id = t.object_id and i.type_desc in ('NONCLUSTERED', 'NONCLUSTERED COLUMNSTORE')"""
     cursor = connection.cursor()
     cursor.execute(query)
     results = cursor.fetchall()
     for result in results:
         drop_index(connection, schema_name, result[1], result[0])
+    cursor.execute("select name from sys.views where name like 'VW[_]%'")
+    for result in cursor.fetchall():
+        drop_view(connection, schema_name, result[0])
 
 
 def get_table_scan_times(connection, query_string):
@@ -806,7 +1442,15 @@ def drop_statistic(connection, table_name, stat_name):
 
 
 def set_arm_size(connection, bandit_arm):
-    query = f"""SELECT (SUM(s.[used_page_count]) * 8)/1024 AS IndexSizeMB
+    """
+    Sets the memory of the arm to the size of the built index. The first measurement of an arm is added to the size
+    model of its index type.
+
+    :param connection: sql_connection
+    :param bandit_arm: bandit arm of the built index
+    :return: bandit arm
+    """
+    query = f"""SELECT (SUM(s.[used_page_count]) * 8)/1024.0 AS IndexSizeMB
                 FROM sys.dm_db_partition_stats AS s
                 INNER JOIN sys.indexes AS i ON s.[object_id] = i.[object_id]
                     AND s.[index_id] = i.[index_id]
@@ -817,7 +1461,11 @@ def set_arm_size(connection, bandit_arm):
     cursor = connection.cursor()
     cursor.execute(query)
     result = cursor.fetchone()
-    bandit_arm.memory = result[0]
+    bandit_arm.memory = float(result[0])
+    if not bandit_arm.is_memory_measured:
+        get_size_estimator(bandit_arm.index_type, bandit_arm.compression).add_measurement(
+            bandit_arm.table_name, bandit_arm.estimated_memory, bandit_arm.memory)
+        bandit_arm.is_memory_measured = True
     return bandit_arm
 
 
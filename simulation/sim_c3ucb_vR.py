@@ -8,6 +8,7 @@ from typing import Dict
 import numpy
 from pandas import DataFrame
 
+import bandits.arm_consolidation as arm_consolidation
 import bandits.bandit_c3ucb_v2 as bandits
 import bandits.bandit_helper_v2 as bandit_helper
 import constants as constants
@@ -15,9 +16,15 @@ import database.sql_connection as sql_connection
 import database.sql_helper_v2 as sql_helper
 import shared.configs_v2 as configs
 import shared.helper as helper
+from bandits.arm_hierarchy import ArmHierarchy
+from bandits.arm_retirement import ArmRetirement
 from bandits.experiment_report import ExpReport
+from bandits.filtered_arms import LiteralStats
 from bandits.oracle_v2 import OracleV7 as Oracle
+from bandits.query_arm_index import QueryArmIndex
 from bandits.query_v5 import Query
+from bandits.workload_sketch import WorkloadSketch
+from database.index_size import compressed_size_estimator
 
 
 # Simulation built on vQ to collect the super arm performance
@@ -68,6 +75,12 @@ class Simulator(BaseSimulator):
         configs.max_memory -= int(sql_helper.get_current_pds_size(self.connection))
         oracle = Oracle(configs.max_memory)
         c3ucb_bandit = bandits.C3UCB(context_size, configs.input_alpha, configs.input_lambda, oracle)
+        query_arm_index = QueryArmIndex(bandit_helper.get_bandit_arms, bandit_helper.bandit_arm_store,
+                                        bandit_helper.get_arm_specs_batch)
+        arm_hierarchy = ArmHierarchy(constants.HIERARCHY_TOP_COLUMNS, constants.HIERARCHY_ALPHA)
+        arm_retirement = ArmRetirement(constants.RETIREMENT_UNUSED_PLAYS)
+        literal_stats = LiteralStats(constants.FILTERED_INDEX_HISTORY)
+        workload_sketch = WorkloadSketch(constants.SKETCH_WIDTH, constants.SKETCH_DEPTH, constants.SKETCH_HEAVY_HITTERS)
 
         # Running the bandit for T rounds and gather the reward
         arm_selection_count = {}
@@ -106,6 +119,10 @@ class Simulator(BaseSimulator):
                 # for each query, transform and append to the query_obj_store
                 query = queries_current_batch[n]  # a dict of query info
                 query_id = query['id']
+                if constants.FILTERED_INDEXES:
+                    literal_stats.add_query(query_id, query['query_string'], query['predicates'])
+                if constants.WORKLOAD_SKETCH:
+                    workload_sketch.add_query(query['predicates'], query['payload'])
                 if query_id in self.query_obj_store:
                     query_obj_in_store = self.query_obj_store[query_id]
                     query_obj_in_store.frequency += 1
@@ -138,25 +155,73 @@ class Simulator(BaseSimulator):
                 # if the former term > the latter term:
                 workload_change = len(query_obj_additions) / len(query_obj_list_past)
                 c3ucb_bandit.workload_change_trigger(workload_change)
+                if constants.ARM_HIERARCHY:
+                    arm_hierarchy.workload_change_trigger(workload_change)
 
             # this rounds new will be the additions for the next round
             query_obj_additions = query_obj_list_new
 
-            # Get the predicates for queries and Generate index arms for each query
+            # Get the predicates for queries and Generate index arms for each query, arms are only generated for the
+            # queries that are new or changed
             index_arms = {}
-            for i in range(len(query_obj_list_past)):  # for each previously seen query
-                bandit_arms_tmp = bandit_helper.gen_arms_from_predicates_v2(self.connection, query_obj_list_past[i])
-                for key, index_arm in bandit_arms_tmp.items():
-                    if key not in index_arms:
-                        index_arm.query_ids = set()
-                        index_arm.query_ids_backup = set()
-                        index_arm.clustered_index_time = 0
-                        index_arms[key] = index_arm
-                    index_arm.clustered_index_time += max(
-                        query_obj_list_past[i].table_scan_times[index_arm.table_name]) if \
-                        query_obj_list_past[i].table_scan_times[index_arm.table_name] else 0
-                    index_arms[key].query_ids.add(index_arm.query_id)
-                    index_arms[key].query_ids_backup.add(index_arm.query_id)
+            # arms built in the database are kept in the arm store, the other arms can be evicted from now on
+            bandit_helper.bandit_arm_store.start_round(chosen_arms_last_round.keys())
+            if constants.WORKLOAD_SKETCH:
+                # arms for the heavy hitter predicate sets of the stream, given to the queries they serve
+                active_arms, arm_query_ids = bandit_helper.get_sketch_arm_query_ids(
+                    bandit_helper.gen_arms_from_sketch(self.connection, workload_sketch), query_obj_list_past)
+            else:
+                query_arm_index.set_active_queries(self.connection, query_obj_list_past)
+                active_arms, arm_query_ids = query_arm_index.active_arms, query_arm_index.arm_query_ids
+            if constants.FILTERED_INDEXES:
+                # filtered index arms for the frequent literal predicates of the queries
+                filtered_arms, filtered_arm_query_ids = bandit_helper.gen_filtered_arms(
+                    self.connection, query_obj_list_past, literal_stats)
+                active_arms, arm_query_ids = dict(active_arms), dict(arm_query_ids)
+                for arm_id, filtered_arm in filtered_arms.items():
+                    active_arms[arm_id] = filtered_arm
+                    arm_query_ids[arm_id] = arm_query_ids.get(arm_id, set()) | filtered_arm_query_ids[arm_id]
+            if constants.COLUMNSTORE_INDEXES:
+                # columnstore arms compete with the rowstore arms of the same queries under the same memory budget
+                columnstore_arms, columnstore_arm_query_ids = bandit_helper.gen_columnstore_arms(
+                    self.connection, query_obj_list_past)
+                active_arms, arm_query_ids = dict(active_arms), dict(arm_query_ids)
+                active_arms.update(columnstore_arms)
+                arm_query_ids.update(columnstore_arm_query_ids)
+            if constants.INDEXED_VIEWS:
+                # indexed views for the recurring join-aggregate queries
+                view_arms, view_arm_query_ids = bandit_helper.gen_view_arms(self.connection, query_obj_list_past)
+                active_arms, arm_query_ids = dict(active_arms), dict(arm_query_ids)
+                active_arms.update(view_arms)
+                arm_query_ids.update(view_arm_query_ids)
+            if constants.ARM_HIERARCHY:
+                # composite and covering arms only under the promising columns of each table
+                active_arms = arm_hierarchy.get_expanded_arms(active_arms)
+            if constants.ARM_CONSOLIDATION:
+                # near duplicate arms are merged into broader arms that serve the queries of all of them
+                active_arms, arm_query_ids, served_arm_ids = arm_consolidation.consolidate_arms(
+                    self.connection, active_arms, arm_query_ids, bandit_helper.bandit_arm_store)
+                logging.info(f"Consolidated {sum(len(arm_ids) for arm_ids in served_arm_ids.values())} arms into "
+                             f"{len(active_arms)} arms")
+            if constants.INDEX_COMPRESSION:
+                # compressed variants trade CPU for a smaller size under the memory budget
+                compressed_arms, compressed_arm_query_ids = bandit_helper.gen_compressed_arms(
+                    self.connection, active_arms, arm_query_ids)
+                active_arms, arm_query_ids = dict(active_arms), dict(arm_query_ids)
+                active_arms.update(compressed_arms)
+                arm_query_ids.update(compressed_arm_query_ids)
+            if constants.ARM_RETIREMENT:
+                active_arms = arm_retirement.get_active_arms(active_arms, arm_query_ids)
+            for key, index_arm in active_arms.items():
+                index_arm.query_ids = set(arm_query_ids[key])
+                index_arm.query_ids_backup = set(index_arm.query_ids)
+                index_arm.clustered_index_time = 0
+                for query_id in index_arm.query_ids:
+                    for table_name in index_arm.base_tables:
+                        table_scan_times = self.query_obj_store[query_id].table_scan_times[table_name]
+                        index_arm.clustered_index_time += max(table_scan_times) if table_scan_times else 0
+                index_arms[key] = index_arm
+            bandit_helper.calibrate_arm_sizes(index_arms)
 
             # set the index arms at the bandit
             if t == configs.hyp_rounds and configs.hyp_rounds != 0:
@@ -189,7 +254,7 @@ class Simulator(BaseSimulator):
                 chosen_arms = {}
                 for arm in chosen_arm_ids:
                     index_name = index_arm_list[arm].index_name
-                    chosen_arms[index_name] = index_arm_list[arm]
+                    chosen_arms[index_arm_list[arm].arm_id] = index_arm_list[arm]
                     used_memory = used_memory + index_arm_list[arm].memory
                     if index_name in arm_selection_count:
                         arm_selection_count[index_name] += 1
@@ -207,9 +272,9 @@ class Simulator(BaseSimulator):
             key_intersection = keys_last_round & keys_this_round
             key_additions = keys_this_round - key_intersection
             key_deletions = keys_last_round - key_intersection
-            logging.info(f"Selected: {keys_this_round}")
-            logging.debug(f"Added: {key_additions}")
-            logging.debug(f"Removed: {key_deletions}")
+            logging.info(f"Selected: {set(chosen_arms[key].index_name for key in keys_this_round)}")
+            logging.debug(f"Added: {set(chosen_arms[key].index_name for key in key_additions)}")
+            logging.debug(f"Removed: {set(chosen_arms_last_round[key].index_name for key in key_deletions)}")
 
             added_arms = {}
             deleted_arms = {}
@@ -238,6 +303,10 @@ class Simulator(BaseSimulator):
                 arm_selection_count = {}
 
             c3ucb_bandit.update_v4(chosen_arm_ids, arm_rewards)
+            if constants.ARM_HIERARCHY:
+                arm_hierarchy.update([index_arm_list[arm] for arm in chosen_arm_ids], arm_rewards)
+            if constants.ARM_RETIREMENT:
+                arm_retirement.update([index_arm_list[arm] for arm in chosen_arm_ids], arm_rewards, index_arms)
             super_arm_id = frozenset(chosen_arm_ids)
             if t >= configs.hyp_rounds:
                 if super_arm_id in super_arm_scores:
@@ -251,6 +320,9 @@ class Simulator(BaseSimulator):
 
             # keeping track of queries that we saw last time
             chosen_arms_last_round = chosen_arms
+            if constants.WORKLOAD_SKETCH:
+                # the sketch counts follow the stream, older rounds weigh less
+                workload_sketch.decay(constants.SKETCH_DECAY)
 
             if t == (configs.rounds + configs.hyp_rounds - 1):
                 sql_helper.bulk_drop_index(self.connection, constants.SCHEMA_NAME, chosen_arms)
@@ -284,6 +356,20 @@ class Simulator(BaseSimulator):
         logging.info("Time taken by bandit for " + str(configs.rounds) + " rounds: " + str(total_time))
         logging.info("\n\nIndex Usage Counts:\n" + pp.pformat(
             sorted(arm_selection_count.items(), key=operator.itemgetter(1), reverse=True)))
+        sql_helper.query_plan_cache.log_stats()
+        bandit_helper.bandit_arm_store.log_stats()
+        sql_helper.index_size_estimator.log_stats()
+        if constants.COLUMNSTORE_INDEXES:
+            bandit_helper.columnstore_size_estimator.log_stats()
+        if constants.INDEXED_VIEWS:
+            bandit_helper.view_size_estimator.log_stats()
+        if constants.INDEX_COMPRESSION:
+            logging.info(f"Compressed index size model: {compressed_size_estimator.get_stats()}")
+        arm_retirement.log_stats()
+        if constants.WORKLOAD_SKETCH:
+            workload_sketch.log_stats()
+        sql_helper.plan_parser_pool.shutdown()
+        bandit_helper.arm_generation_pool.shutdown()
         sql_helper.restart_sql_server()
         return results, total_time
 
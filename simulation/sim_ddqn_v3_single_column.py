@@ -126,6 +126,8 @@ class Simulator(BaseSimulator):
 
             # Get the predicates for queries and Generate index arms for each query
             index_arms = {}
+            # arms built in the database are kept in the arm store, the other arms can be evicted from now on
+            bandit_helper.bandit_arm_store.start_round(chosen_arms_last_round.keys())
             for i in range(len(query_obj_list_past)):
                 bandit_arms_tmp = bandit_helper.gen_arms_from_predicates_single(self.connection, query_obj_list_past[i])
                 for key, index_arm in bandit_arms_tmp.items():
@@ -170,7 +172,7 @@ class Simulator(BaseSimulator):
                 chosen_arms = {}
                 for arm in chosen_arm_ids:
                     index_name = index_arm_list[arm].index_name
-                    chosen_arms[index_name] = index_arm_list[arm]
+                    chosen_arms[index_arm_list[arm].arm_id] = index_arm_list[arm]
                     used_memory = used_memory + index_arm_list[arm].memory
                     if index_name in arm_selection_count:
                         arm_selection_count[index_name] += 1
@@ -188,9 +190,9 @@ class Simulator(BaseSimulator):
             key_intersection = keys_last_round & keys_this_round
             key_additions = keys_this_round - key_intersection
             key_deletions = keys_last_round - key_intersection
-            logging.info(f"Selected: {keys_this_round}")
-            logging.debug(f"Added: {key_additions}")
-            logging.debug(f"Removed: {key_deletions}")
+            logging.info(f"Selected: {set(chosen_arms[key].index_name for key in keys_this_round)}")
+            logging.debug(f"Added: {set(chosen_arms[key].index_name for key in key_additions)}")
+            logging.debug(f"Removed: {set(chosen_arms_last_round[key].index_name for key in key_deletions)}")
 
             added_arms = {}
             deleted_arms = {}
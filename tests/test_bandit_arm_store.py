@@ -0,0 +1,50 @@
+import unittest
+
+from bandits.arm_registry import arm_registry
+from bandits.bandit_arm import BanditArm
+from bandits.bandit_arm_store import BanditArmStore
+
+
+def get_arms(count, table_name='STORE_TEST'):
+    return [BanditArm((f'C_{i}',), table_name, 10, 1000) for i in range(count)]
+
+
+class BanditArmStoreTest(unittest.TestCase):
+
+    def test_arms_in_use_are_not_evicted(self):
+        # capacity below the number of arms used in the round
+        arm_store = BanditArmStore(3, 8)
+        arm_store.start_round([])
+        bandit_arms = get_arms(5)
+        for bandit_arm in bandit_arms:
+            arm_store[bandit_arm.arm_id] = bandit_arm
+        self.assertEqual(len(arm_store), 5)
+        self.assertEqual(arm_store.evictions, 0)
+        for bandit_arm in bandit_arms:
+            self.assertIn(bandit_arm.arm_id, arm_store)
+            self.assertEqual(arm_registry.get_id_by_name(bandit_arm.index_name), bandit_arm.arm_id)
+        arm_store.clear()
+
+    def test_unused_arms_are_evicted_in_the_next_round(self):
+        arm_store = BanditArmStore(3, 8)
+        arm_store.start_round([])
+        bandit_arms = get_arms(5, 'STORE_TEST_NEXT')
+        for bandit_arm in bandit_arms:
+            arm_store[bandit_arm.arm_id] = bandit_arm
+        # the first arm is built in the database and the last arm is used again in the new round
+        arm_store.start_round([bandit_arms[0].arm_id])
+        self.assertIs(arm_store[bandit_arms[4].arm_id], bandit_arms[4])
+        self.assertEqual(len(arm_store), 3)
+        self.assertIn(bandit_arms[0].arm_id, arm_store)
+        self.assertIn(bandit_arms[4].arm_id, arm_store)
+        self.assertEqual(bandit_arms[0].index_name, 'IX_STORE_TEST_NEXT_c_0')
+        evicted_arms = [bandit_arm for bandit_arm in bandit_arms if bandit_arm.arm_id not in arm_store]
+        self.assertEqual(len(evicted_arms), 2)
+        for bandit_arm in evicted_arms:
+            # evicted arms are released from the registry
+            self.assertIsNone(BanditArm.find_arm_id(bandit_arm.index_cols, bandit_arm.table_name))
+        arm_store.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
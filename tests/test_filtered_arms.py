@@ -0,0 +1,55 @@
+import unittest
+
+from bandits.filtered_arms import LiteralStats, get_literal_terms
+
+PREDICATES = {'lineitem': ['l_discount', 'l_quantity']}
+
+
+def get_query(discount, quantity):
+    return f"SELECT SUM(l_extendedprice * l_discount) FROM lineitem " \
+        f"WHERE l_discount = {discount} AND l_quantity < {quantity}"
+
+
+class LiteralTermsTest(unittest.TestCase):
+
+    def test_number_followed_by_arithmetic_is_skipped(self):
+        # 44 + 1 is not a literal, it must not be matched as the literal 4
+        literal_terms = get_literal_terms("SELECT * FROM part WHERE p_size = 44 + 1", {'part': ['p_size']})
+        self.assertEqual(literal_terms, {})
+
+    def test_numbers_and_strings(self):
+        literal_terms = get_literal_terms("SELECT * FROM part WHERE p_size = 44 AND p_brand = 'Brand#23'",
+                                          {'part': ['p_size', 'p_brand']})
+        self.assertEqual(literal_terms, {('part', 'p_size'): (('p_size', '=', '44'),),
+                                         ('part', 'p_brand'): (('p_brand', '=', "'Brand#23'"),)})
+
+    def test_between(self):
+        literal_terms = get_literal_terms("SELECT * FROM lineitem WHERE l_discount BETWEEN 0.05 AND 0.07",
+                                          {'lineitem': ['l_discount']})
+        self.assertEqual(literal_terms, {('lineitem', 'l_discount'): (('l_discount', '<=', '0.07'),
+                                                                      ('l_discount', '>=', '0.05'))})
+
+
+class LiteralStatsTest(unittest.TestCase):
+
+    def test_share_of_the_joint_terms(self):
+        # each of the terms is in 3 of the 10 instances, but they are only together in 2 of them
+        literal_stats = LiteralStats(10)
+        values = [(0.06, 24), (0.06, 24), (0.06, 25), (0.05, 24)] + [(0.01 * i, 30 + i) for i in range(6)]
+        for discount, quantity in values:
+            literal_stats.add_query(6, get_query(discount, quantity), PREDICATES)
+        table_filters = literal_stats.get_frequent_filters(6, 2, 0.1)
+        self.assertEqual(table_filters, {'lineitem': ((('l_discount', '=', '0.06'), ('l_quantity', '<', '24')), 0.2)})
+
+    def test_min_share(self):
+        literal_stats = LiteralStats(10)
+        for discount, quantity in [(0.06, 24), (0.06, 24), (0.05, 24), (0.06, 25), (0.04, 24)]:
+            literal_stats.add_query(6, get_query(discount, quantity), PREDICATES)
+        self.assertEqual(literal_stats.get_frequent_filters(6, 2, 0.5), {})
+        self.assertEqual(literal_stats.get_frequent_filters(6, 3, 0.1), {})
+        self.assertEqual(literal_stats.get_frequent_filters(6, 2, 0.4),
+                         {'lineitem': ((('l_discount', '=', '0.06'), ('l_quantity', '<', '24')), 0.4)})
+
+
+if __name__ == '__main__':
+    unittest.main()